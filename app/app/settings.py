@@ -115,6 +115,26 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Passwords are hashed with PBKDF2 and PASSWORD_HASH_ITERATIONS
+# iterations, in a pool of PASSWORD_HASHING_WORKERS threads per process
+# (see core/hashers.py). At most PASSWORD_HASHING_QUEUE more hashes wait
+# for a thread, beyond that logins and sign-ups get a 429 instead of
+# holding up the request threads of every other endpoint. 0 workers
+# hashes in the request thread, without a limit. Hashes are upgraded
+# when their user next logs in after the iterations change.
+PASSWORD_HASHERS = [
+    'core.hashers.BoundedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+PASSWORD_HASH_ITERATIONS = int(
+    os.environ.get('PASSWORD_HASH_ITERATIONS', 320000)
+)
+PASSWORD_HASHING_WORKERS = int(os.environ.get('PASSWORD_HASHING_WORKERS', 2))
+PASSWORD_HASHING_QUEUE = int(os.environ.get('PASSWORD_HASHING_QUEUE', 2))
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
@@ -134,11 +154,22 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/3.2/howto/static-files/
 
 STATIC_URL = '/static/static/'
-MEDIA_URL = '/static/media/'
+# Media is served by recipe.views.RecipeMediaView, to the users whose
+# recipes use each file.
+MEDIA_URL = '/api/recipe/media/'
 
 MEDIA_ROOT = '/vol/web/media'
 STATIC_ROOT = '/vol/web/static'
 
+# Internal location of the proxy that serves MEDIA_ROOT (see
+# proxy/default.conf.tpl). The media view only checks access and hands
+# the file over to it with X-Accel-Redirect. Empty sends the files
+# from Django, for development without the proxy.
+MEDIA_ACCEL_REDIRECT_LOCATION = os.environ.get(
+    'MEDIA_ACCEL_REDIRECT_LOCATION',
+    '' if DEBUG else '/protected-media/'
+)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -150,6 +181,114 @@ REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
 
+# Default and maximum number of recipes returned per page. Clients can
+# ask for a different page size with ?page_size= up to the maximum.
+RECIPE_PAGE_SIZE = int(os.environ.get('RECIPE_PAGE_SIZE', 50))
+RECIPE_MAX_PAGE_SIZE = int(os.environ.get('RECIPE_MAX_PAGE_SIZE', 200))
+
+# Most recipes that can be created, updated or deleted with one request
+# to /api/recipe/recipes/bulk/.
+RECIPE_BULK_MAX_ITEMS = int(os.environ.get('RECIPE_BULK_MAX_ITEMS', 1000))
+
+# Recipes loaded per query (and held in memory) by the streaming export
+# at /api/recipe/recipes/export/.
+RECIPE_EXPORT_CHUNK_SIZE = int(
+    os.environ.get('RECIPE_EXPORT_CHUNK_SIZE', 1000)
+)
+
+# Serve the recipe, tag and ingredient lists from QuerySet.values() rows
+# instead of model instances (see recipe/values.py).
+RECIPE_VALUES_READ_PATH = bool(
+    int(os.environ.get('RECIPE_VALUES_READ_PATH', 0))
+)
+
+# Rendered list responses are cached per user (see recipe/cache.py).
+# Local memory is per process; point RESPONSE_CACHE_BACKEND at a shared
+# backend (e.g. django.core.cache.backends.redis.RedisCache) in
+# production so every worker sees the same entries.
+RECIPE_RESPONSE_CACHE = bool(
+    int(os.environ.get('RECIPE_RESPONSE_CACHE', 1))
+)
+RESPONSE_CACHE_ALIAS = 'responses'
+
+# Uploaded recipe images are scaled down to fit in RECIPE_IMAGE_MAX_SIZE
+# pixels, stripped of metadata and re-encoded at this JPEG quality.
+# Images with more than RECIPE_IMAGE_MAX_PIXELS pixels are rejected.
+RECIPE_IMAGE_MAX_SIZE = int(os.environ.get('RECIPE_IMAGE_MAX_SIZE', 2560))
+RECIPE_IMAGE_MAX_PIXELS = int(
+    os.environ.get('RECIPE_IMAGE_MAX_PIXELS', 64000000)
+)
+RECIPE_IMAGE_UPLOAD_QUALITY = int(
+    os.environ.get('RECIPE_IMAGE_UPLOAD_QUALITY', 85)
+)
+
+# Chunked image uploads (see recipe/uploads.py): the size of each chunk,
+# the largest file accepted and how many seconds an upload that receives
+# no chunks is kept before clear_expired_uploads removes it.
+RECIPE_UPLOAD_CHUNK_SIZE = int(
+    os.environ.get('RECIPE_UPLOAD_CHUNK_SIZE', 1024 * 1024)
+)
+RECIPE_UPLOAD_MAX_SIZE = int(
+    os.environ.get('RECIPE_UPLOAD_MAX_SIZE', 50 * 1024 * 1024)
+)
+RECIPE_UPLOAD_EXPIRY = int(os.environ.get('RECIPE_UPLOAD_EXPIRY', 86400))
+
+# Resized copies of each uploaded recipe image (see recipe/images.py):
+# the longest side in pixels of each variant, the formats they are
+# encoded in and the encoder quality. They are made by a pool of
+# RECIPE_IMAGE_WORKERS threads per process after the upload commits; 0
+# makes them in the request instead.
+RECIPE_IMAGE_VARIANTS = {
+    'thumbnail': 160,
+    'medium': 640,
+    'large': 1280,
+}
+RECIPE_IMAGE_FORMATS = ['webp', 'jpeg']
+RECIPE_IMAGE_QUALITY = int(os.environ.get('RECIPE_IMAGE_QUALITY', 80))
+RECIPE_IMAGE_WORKERS = int(os.environ.get('RECIPE_IMAGE_WORKERS', 2))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    RESPONSE_CACHE_ALIAS: {
+        'BACKEND': os.environ.get(
+            'RESPONSE_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('RESPONSE_CACHE_LOCATION', 'responses'),
+        'TIMEOUT': int(os.environ.get('RESPONSE_CACHE_TIMEOUT', 300)),
+    },
+}
+
+# Tokens authenticated in the last TOKEN_AUTH_CACHE_TTL seconds are
+# accepted without a query (see core/authentication.py), for up to
+# TOKEN_AUTH_CACHE_SIZE tokens per process. Set TOKEN_AUTH_SHARED_CACHE
+# to a cache alias to share them between processes as well. Changes to
+# a user or token reach other processes within TOKEN_AUTH_CACHE_TTL.
+TOKEN_AUTH_CACHE_SIZE = int(os.environ.get('TOKEN_AUTH_CACHE_SIZE', 10000))
+TOKEN_AUTH_CACHE_TTL = int(os.environ.get('TOKEN_AUTH_CACHE_TTL', 10))
+TOKEN_AUTH_SHARED_CACHE = os.environ.get('TOKEN_AUTH_SHARED_CACHE', '')
+TOKEN_AUTH_SHARED_CACHE_TTL = int(
+    os.environ.get('TOKEN_AUTH_SHARED_CACHE_TTL', 300)
+)
+
+# Keys signing access tokens (see core/access_tokens.py), as
+# "<key id>:<secret>,...". Tokens are signed with the first key; keep
+# the previous one listed after a rotation until its tokens expire.
+ACCESS_TOKEN_KEYS = dict(
+    item.split(':', 1)
+    for item in os.environ.get('ACCESS_TOKEN_KEYS', '').split(',') if item
+) or {'default': SECRET_KEY}
+ACCESS_TOKEN_SIGNING_KEY_ID = next(iter(ACCESS_TOKEN_KEYS))
+# Lifetime in seconds of the access tokens and of the refresh tokens
+# they are renewed with. Unless TOKEN_AUTH_SHARED_CACHE is set, revoked
+# access tokens keep working until they expire.
+ACCESS_TOKEN_LIFETIME = int(os.environ.get('ACCESS_TOKEN_LIFETIME', 300))
+REFRESH_TOKEN_LIFETIME = int(
+    os.environ.get('REFRESH_TOKEN_LIFETIME', 14 * 24 * 3600)
+)
+
 SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True,
 }
@@ -15,8 +15,6 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from django.conf.urls.static import static  # this is for serving media files
-from django.conf import settings  # this is for serving media files
 
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 
@@ -32,9 +30,3 @@ urlpatterns = [
     path('api/user/', include('user.urls')),
     path('api/recipe/', include('recipe.urls')),
 ]
-
-if settings.DEBUG:
-    urlpatterns += static(
-        settings.MEDIA_URL,
-        document_root=settings.MEDIA_ROOT,
-    )
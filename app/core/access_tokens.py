@@ -0,0 +1,158 @@
+"""
+Short-lived access tokens signed with HMAC, and the refresh tokens they
+are renewed with
+
+An access token is "<key id>.<payload>.<signature>": the payload holds
+the user id, the user's token_version and the expiry time, so it is
+checked without the database. Refresh tokens are stored, and each one
+can be used once.
+"""
+import base64
+import hashlib
+import json
+import secrets
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from core.models import RefreshToken
+
+SALT = 'core.access_tokens'
+VERSION_KEY_PREFIX = 'token-version:'
+# Published as the version of inactive users, which no token carries.
+INACTIVE = -1
+
+
+class InvalidToken(Exception):
+    """The token is malformed, forged, expired or revoked"""
+
+
+def _encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def _decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def _signature(key_id, payload):
+    """Return the signature of a payload with one of the signing keys"""
+    mac = salted_hmac(
+        SALT,
+        f'{key_id}.{payload}',
+        secret=settings.ACCESS_TOKEN_KEYS[key_id],
+        algorithm='sha256',
+    )
+    return _encode(mac.digest())
+
+
+def create_access_token(user):
+    """Return an access token for `user`"""
+    key_id = settings.ACCESS_TOKEN_SIGNING_KEY_ID
+    claims = {
+        'uid': user.pk,
+        'ver': user.token_version,
+        'exp': int(time.time()) + settings.ACCESS_TOKEN_LIFETIME,
+    }
+    payload = _encode(json.dumps(claims, separators=(',', ':')).encode())
+    return f'{key_id}.{payload}.{_signature(key_id, payload)}'
+
+
+def verify_access_token(token):
+    """Return the claims of a valid access token"""
+    try:
+        key_id, payload, signature = token.split('.')
+    except ValueError:
+        raise InvalidToken('Malformed token.')
+    if key_id not in settings.ACCESS_TOKEN_KEYS:
+        raise InvalidToken('Unknown signing key.')
+    if not constant_time_compare(signature, _signature(key_id, payload)):
+        raise InvalidToken('Invalid signature.')
+    claims = json.loads(_decode(payload))
+    if claims['exp'] <= time.time():
+        raise InvalidToken('Token expired.')
+    current = current_token_version(claims['uid'])
+    if current is not None and current != claims['ver']:
+        raise InvalidToken('Token revoked.')
+    return claims
+
+
+def _shared_cache():
+    """Return the cache shared by every process, or None"""
+    alias = settings.TOKEN_AUTH_SHARED_CACHE
+    return caches[alias] if alias else None
+
+
+def current_token_version(user_id):
+    """
+    Return the token_version a user last changed to, or None when it is
+    not known without the database
+    """
+    shared = _shared_cache()
+    if shared is None:
+        return None
+    return shared.get(VERSION_KEY_PREFIX + str(user_id))
+
+
+def publish_token_version(user):
+    """
+    Make the token_version of `user` known to every process once the
+    current transaction commits, revoking the tokens of other versions
+    """
+    shared = _shared_cache()
+    if shared is None:
+        return
+    version = user.token_version if user.is_active else INACTIVE
+    # Older access tokens have expired by the time the entry does.
+    transaction.on_commit(lambda: shared.set(
+        VERSION_KEY_PREFIX + str(user.pk), version,
+        settings.ACCESS_TOKEN_LIFETIME))
+
+
+def _hash(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def create_refresh_token(user):
+    """Store and return a refresh token for `user`"""
+    token = secrets.token_urlsafe(32)
+    RefreshToken.objects.create(
+        key_hash=_hash(token),
+        user=user,
+        token_version=user.token_version,
+        expires_at=timezone.now() + timedelta(
+            seconds=settings.REFRESH_TOKEN_LIFETIME),
+    )
+    return token
+
+
+def use_refresh_token(token):
+    """Consume a refresh token and return its user"""
+    refresh = RefreshToken.objects.select_related('user').filter(
+        key_hash=_hash(token),
+        expires_at__gt=timezone.now(),
+    ).first()
+    if refresh is None:
+        raise InvalidToken('Invalid refresh token.')
+    # Only one of two requests using the same token deletes it.
+    deleted, _ = RefreshToken.objects.filter(pk=refresh.pk).delete()
+    user = refresh.user
+    if not deleted or refresh.token_version != user.token_version or \
+            not user.is_active:
+        raise InvalidToken('Invalid refresh token.')
+    return user
+
+
+def issue_tokens(user):
+    """Return a new access token and refresh token for `user`"""
+    return {
+        'access': create_access_token(user),
+        'refresh': create_refresh_token(user),
+        'token_type': 'Bearer',
+        'expires_in': settings.ACCESS_TOKEN_LIFETIME,
+    }
@@ -0,0 +1,220 @@
+"""
+Token authentication that remembers recently seen tokens, and
+authentication with signed access tokens
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from drf_spectacular.extensions import OpenApiAuthenticationExtension
+from drf_spectacular.plumbing import build_bearer_security_scheme_object
+from rest_framework.authentication import (
+    BaseAuthentication,
+    TokenAuthentication,
+    get_authorization_header,
+)
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from core import access_tokens
+
+CACHE_KEY_PREFIX = 'auth-token:'
+
+
+class TokenCache:
+    """
+    Per-process LRU of token -> (expiry, snapshot), in front of an
+    optional shared cache. Snapshots are the column values of the token
+    and its user, but the password, so every request builds model
+    instances of its own.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _shared(self):
+        """Return the shared cache, or None"""
+        alias = settings.TOKEN_AUTH_SHARED_CACHE
+        return caches[alias] if alias else None
+
+    def get(self, key):
+        """Return the snapshot of a token, or None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    return entry[1]
+                del self._entries[key]
+        shared = self._shared()
+        if shared is None:
+            return None
+        snapshot = shared.get(CACHE_KEY_PREFIX + key)
+        if snapshot is not None:
+            self._remember(key, snapshot)
+        return snapshot
+
+    def _remember(self, key, snapshot):
+        """Keep a snapshot in this process for TOKEN_AUTH_CACHE_TTL"""
+        with self._lock:
+            self._entries[key] = (
+                time.monotonic() + settings.TOKEN_AUTH_CACHE_TTL, snapshot)
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.TOKEN_AUTH_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def set(self, key, snapshot):
+        """Remember the snapshot of a token"""
+        self._remember(key, snapshot)
+        shared = self._shared()
+        if shared is not None:
+            shared.set(
+                CACHE_KEY_PREFIX + key, snapshot,
+                settings.TOKEN_AUTH_SHARED_CACHE_TTL)
+
+    def delete(self, keys):
+        """Forget tokens, in this process and the shared cache"""
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+        shared = self._shared()
+        if shared is not None:
+            shared.delete_many([CACHE_KEY_PREFIX + key for key in keys])
+
+    def clear(self):
+        """Forget every token this process remembers"""
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache()
+
+
+def cache_key(token_key):
+    """Return the key a token is cached under, not the token itself"""
+    return hashlib.sha256(token_key.encode()).hexdigest()
+
+
+# Columns left out of snapshots, so password hashes aren't copied into
+# the shared cache. They are deferred on the instances built from them.
+UNCACHED_FIELDS = {'password'}
+
+
+def _snapshot_fields(model):
+    """Return the names of the columns kept in a snapshot"""
+    return [
+        field.attname for field in model._meta.concrete_fields
+        if field.attname not in UNCACHED_FIELDS
+    ]
+
+
+def _values(obj):
+    """Return the column values of a model instance for a snapshot"""
+    return [getattr(obj, name) for name in _snapshot_fields(type(obj))]
+
+
+def _from_values(model, values):
+    """Return a model instance as if loaded with these column values"""
+    return model.from_db('default', _snapshot_fields(model), values)
+
+
+def invalidate_tokens(token_keys):
+    """
+    Forget cached tokens once the current transaction commits. Other
+    processes may still use their copy for TOKEN_AUTH_CACHE_TTL seconds.
+    """
+    keys = [cache_key(token_key) for token_key in token_keys]
+    if keys:
+        # Deleted again after the commit, in case a request cached the
+        # old rows in the meantime.
+        token_cache.delete(keys)
+        transaction.on_commit(lambda: token_cache.delete(keys))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication without the token and user query on requests
+    whose token was seen in the last few seconds.
+    """
+
+    def authenticate_credentials(self, key):
+        key_hash = cache_key(key)
+        snapshot = token_cache.get(key_hash)
+        if snapshot is None:
+            token, user = self._load(key)
+            snapshot = (_values(token), _values(user))
+            token_cache.set(key_hash, snapshot)
+        else:
+            token = _from_values(Token, snapshot[0])
+            user = _from_values(get_user_model(), snapshot[1])
+        token.user = user
+
+        if not user.is_active:
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        return (user, token)
+
+    def _load(self, key):
+        """Return the token and its user from the database"""
+        try:
+            token = Token.objects.select_related('user').defer(
+                *(f'user__{name}' for name in UNCACHED_FIELDS)
+            ).get(key=key)
+        except Token.DoesNotExist:
+            raise AuthenticationFailed(_('Invalid token.'))
+        return token, token.user
+
+
+class AccessTokenAuthentication(BaseAuthentication):
+    """
+    Authenticate "Bearer <access token>" headers without the database
+    (see core/access_tokens.py). The user has only its id loaded, its
+    other fields are read when first used.
+    """
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise AuthenticationFailed(_('Invalid token header.'))
+
+        try:
+            claims = access_tokens.verify_access_token(auth[1].decode())
+        except UnicodeError:
+            raise AuthenticationFailed(_('Invalid token header.'))
+        except access_tokens.InvalidToken as exc:
+            raise AuthenticationFailed(str(exc))
+        loaded = {
+            'id': claims['uid'],
+            'is_active': True,
+            'token_version': claims['ver'],
+        }
+        model = get_user_model()
+        names = [
+            field.attname for field in model._meta.concrete_fields
+            if field.attname in loaded
+        ]
+        user = model.from_db('default', names, [loaded[n] for n in names])
+        return (user, claims)
+
+    def authenticate_header(self, request):
+        return self.keyword
+
+
+class AccessTokenScheme(OpenApiAuthenticationExtension):
+    """Describe access token authentication in the API schema"""
+    target_class = 'core.authentication.AccessTokenAuthentication'
+    name = 'accessTokenAuth'
+
+    def get_security_definition(self, auto_schema):
+        return build_bearer_security_scheme_object(
+            header_name='Authorization', token_prefix='Bearer')
@@ -0,0 +1,99 @@
+"""
+Helpers shared by the benchmark management commands
+"""
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import override_settings
+
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+
+
+@contextmanager
+def benchmark_database(in_place=False):
+    """
+    Run the enclosed block against a throwaway copy of the database.
+
+    The copy is created and migrated the same way the test runner does
+    it, so benchmarks never write into the real database. Pass
+    in_place=True to use the current database instead (e.g. from tests,
+    which already run inside a test database).
+    """
+    # APIClient sends requests to 'testserver', which has to be an
+    # allowed host when DEBUG is off. Benchmarks repeat the same request,
+    # so the response cache is off to measure the database path.
+    with override_settings(ALLOWED_HOSTS=['testserver'],
+                           RECIPE_RESPONSE_CACHE=False):
+        if in_place:
+            yield
+            return
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=0,
+            autoclobber=True,
+            serialize=False,
+        )
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def create_benchmark_user(email='benchmark@example.com'):
+    """Create a user without paying for a password hash"""
+    return get_user_model().objects.create_user(email=email)
+
+
+def authenticated_client(user):
+    """Return an API client logged in as `user`"""
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+def seed_recipes(user, count, batch_size=10000, **fields):
+    """Insert `count` bare recipes for `user` in large batches"""
+    defaults = {
+        'title': 'Benchmark recipe',
+        'time_minutes': 10,
+        'price': '5.00',
+    }
+    defaults.update(fields)
+    created = 0
+    while created < count:
+        size = min(batch_size, count - created)
+        Recipe.objects.bulk_create(
+            Recipe(user=user, **defaults) for _ in range(size)
+        )
+        created += size
+
+
+def measure(func, repeat):
+    """Call `func` `repeat` times and return the timings in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def summarize(timings):
+    """Return p50/p95/p99/mean of a list of timings, in milliseconds"""
+    ordered = sorted(timings)
+
+    def percentile(pct):
+        index = round(pct / 100 * (len(ordered) - 1))
+        return ordered[index] * 1000
+
+    return {
+        'p50': percentile(50),
+        'p95': percentile(95),
+        'p99': percentile(99),
+        'mean': statistics.mean(ordered) * 1000,
+    }
@@ -0,0 +1,116 @@
+"""
+Password hashing in a bounded pool of threads
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import Throttled
+
+logger = logging.getLogger(__name__)
+
+
+class HashingBusy(Throttled):
+    """Every worker of the hashing pool is busy and its queue is full"""
+    default_detail = _('Too many logins at once, try again shortly.')
+    default_code = 'password_hashing_busy'
+
+
+class HashingPool:
+    """
+    Runs password hashes in PASSWORD_HASHING_WORKERS threads, with up to
+    PASSWORD_HASHING_QUEUE more waiting for a thread. Hashes beyond that
+    are refused at once with HashingBusy (a 429), so a burst of logins
+    can't hold every request thread. hashlib releases the GIL while it
+    hashes, so the other threads keep serving requests.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._config = None
+        self.running = self.queued = self.max_queued = 0
+        self.completed = self.rejected = 0
+
+    def _pool(self):
+        """Return the executor and slots, following the settings"""
+        config = (
+            settings.PASSWORD_HASHING_WORKERS,
+            settings.PASSWORD_HASHING_QUEUE,
+        )
+        with self._lock:
+            if config != self._config:
+                if self._executor is not None:
+                    self._executor.shutdown(wait=False)
+                workers, queue = config
+                self._executor = ThreadPoolExecutor(
+                    max_workers=workers,
+                    thread_name_prefix='password-hashing',
+                ) if workers else None
+                # Held from submission to completion, by running and
+                # queued hashes alike.
+                self._slots = threading.BoundedSemaphore(workers + queue)
+                self._config = config
+            return self._executor, self._slots
+
+    def run(self, func, *args):
+        """Return func(*args), computed in the pool"""
+        executor, slots = self._pool()
+        if executor is None:
+            return func(*args)
+        if not slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            logger.warning('Password hashing saturated: %s', self.stats())
+            raise HashingBusy(wait=1)
+        try:
+            with self._lock:
+                self.queued += 1
+                self.max_queued = max(self.max_queued, self.queued)
+            return executor.submit(self._call, func, args).result()
+        finally:
+            slots.release()
+
+    def _call(self, func, args):
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+
+    def stats(self):
+        """Return the counters of the pool in this process"""
+        with self._lock:
+            return {
+                'workers': settings.PASSWORD_HASHING_WORKERS,
+                'running': self.running,
+                'queued': self.queued,
+                'max_queued': self.max_queued,
+                'completed': self.completed,
+                'rejected': self.rejected,
+            }
+
+
+hashing_pool = HashingPool()
+
+
+class BoundedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    Django's PBKDF2 hasher with PASSWORD_HASH_ITERATIONS iterations,
+    computed in the hashing pool. Hashes with other iterations are
+    rehashed by Django when their user next logs in.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS
+
+    def encode(self, password, salt, iterations=None):
+        return hashing_pool.run(super().encode, password, salt, iterations)
@@ -0,0 +1,183 @@
+"""
+Bulk loading of recipes with their tags and ingredients
+"""
+import io
+
+from django.db import connection
+
+from core.models import (
+    ContentVersion,
+    Recipe,
+    Tag,
+    Ingredient
+)
+
+# Recipe columns written by the loader, search_vector is filled in by
+# its trigger.
+RECIPE_COLUMNS = [
+    'user_id',
+    'title',
+    'description',
+    'time_minutes',
+    'price',
+    'link',
+]
+
+
+def _copy_value(value):
+    """Format a value for COPY ... FROM STDIN in text format"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, int):
+        # Ids and counts, most of what's copied, need no escaping.
+        return str(value)
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace('\t', '\\t')
+        .replace('\n', '\\n')
+        .replace('\r', '\\r')
+    )
+
+
+class RecipeLoader:
+    """
+    Insert recipes, tags, ingredients and their links in large batches.
+
+    Records are dicts with the RECIPE_COLUMNS plus 'tags' and
+    'ingredients' lists of names. Each call to load() writes one batch
+    with a fixed number of statements: on PostgreSQL rows are streamed
+    with COPY, elsewhere they are inserted with bulk_create(). Call it
+    inside a transaction, the loader caches the ids of the names it has
+    resolved.
+    """
+    # Most (user, name) ids kept between batches.
+    max_cached_names = 100000
+
+    def __init__(self, use_copy=None):
+        if use_copy is None:
+            use_copy = connection.vendor == 'postgresql'
+        self.use_copy = use_copy
+        self._ids = {Tag: {}, Ingredient: {}}
+
+    def load(self, records):
+        """Insert a batch of records and return the new recipe ids"""
+        if not records:
+            return []
+        tag_ids = self._resolve(Tag, records, 'tags')
+        ingredient_ids = self._resolve(Ingredient, records, 'ingredients')
+        if self.use_copy:
+            recipe_ids = self._copy_recipes(records)
+        else:
+            recipe_ids = [recipe.id for recipe in Recipe.objects.bulk_create(
+                Recipe(**{column: record[column]
+                          for column in RECIPE_COLUMNS})
+                for record in records
+            )]
+        self._insert_links(
+            Recipe.tags.through, 'tag_id', records, recipe_ids,
+            'tags', tag_ids)
+        self._insert_links(
+            Recipe.ingredients.through, 'ingredient_id', records,
+            recipe_ids, 'ingredients', ingredient_ids)
+        # Nothing here sends signals, bump each owner once per batch.
+        ContentVersion.objects.bump(
+            *{record['user_id'] for record in records})
+        return recipe_ids
+
+    def _resolve(self, model, records, key):
+        """Return {(user_id, name): id}, creating missing names"""
+        ids = self._ids[model]
+        wanted = {
+            (record['user_id'], name)
+            for record in records for name in record[key]
+        }
+        resolved = {pair: ids[pair] for pair in wanted if pair in ids}
+        missing = wanted - resolved.keys()
+        if missing:
+            found = self._select(model, missing)
+            # Names that other requests create at the same time are
+            # skipped by the unique (user, name) constraint and picked
+            # up by the second select.
+            model.objects.bulk_create(
+                (model(user_id=user_id, name=name)
+                 for user_id, name in sorted(missing - found.keys())),
+                batch_size=10000,
+                ignore_conflicts=True,
+            )
+            found.update(self._select(model, missing - found.keys()))
+            resolved.update(found)
+            if len(ids) + len(found) > self.max_cached_names:
+                ids.clear()
+            ids.update(found)
+        return resolved
+
+    def _select(self, model, pairs):
+        """Return {(user_id, name): id} for the existing pairs"""
+        if not pairs:
+            return {}
+        rows = model.objects.filter(
+            user_id__in={user_id for user_id, _ in pairs},
+            name__in={name for _, name in pairs},
+        ).values_list('user_id', 'name', 'id')
+        # The filter matches every user/name combination, keep the
+        # pairs that were asked for.
+        return {
+            (user_id, name): pk
+            for user_id, name, pk in rows if (user_id, name) in pairs
+        }
+
+    def _copy(self, table, columns, rows):
+        """Stream rows into a table with COPY"""
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write('\t'.join(_copy_value(value) for value in row))
+            buffer.write('\n')
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY {connection.ops.quote_name(table)} '
+                f'({", ".join(map(connection.ops.quote_name, columns))}) '
+                'FROM STDIN',
+                buffer,
+            )
+
+    def _copy_recipes(self, records):
+        """COPY recipes with ids taken from their sequence up front"""
+        table = Recipe._meta.db_table
+        with connection.cursor() as cursor:
+            # COPY doesn't return the generated ids, so reserve them
+            # first; the links need them.
+            cursor.execute(
+                'SELECT nextval(pg_get_serial_sequence(%s, %s)) '
+                'FROM generate_series(1, %s)',
+                [table, 'id', len(records)],
+            )
+            recipe_ids = [row[0] for row in cursor.fetchall()]
+        self._copy(
+            table,
+            ['id'] + RECIPE_COLUMNS,
+            ([recipe_id] + [record[column] for column in RECIPE_COLUMNS]
+             for recipe_id, record in zip(recipe_ids, records)),
+        )
+        return recipe_ids
+
+    def _insert_links(self, through, column, records, recipe_ids, key,
+                      ids):
+        """Insert the through rows linking recipes to tags/ingredients"""
+        links = [
+            (recipe_id, ids[(record['user_id'], name)])
+            for recipe_id, record in zip(recipe_ids, records)
+            # A name listed twice is only linked once.
+            for name in dict.fromkeys(record[key])
+        ]
+        if not links:
+            return
+        if self.use_copy:
+            self._copy(through._meta.db_table, ['recipe_id', column], links)
+        else:
+            through.objects.bulk_create(
+                (through(**{'recipe_id': recipe_id, column: pk})
+                 for recipe_id, pk in links),
+                batch_size=10000,
+            )
@@ -0,0 +1,114 @@
+"""
+Django command to compare single recipe posts with one bulk post
+"""
+import time
+
+from django.db import connection
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from core import benchmark
+from core.models import Recipe
+
+RECIPES_URL = reverse('recipe:recipe-list')
+BULK_URL = reverse('recipe:recipe-bulk')
+
+
+def recipe_payload(i, tags, ingredients):
+    """Return the payload of the i-th recipe"""
+    return {
+        'title': f'Benchmark recipe {i}',
+        'time_minutes': i % 120,
+        'price': '5.00',
+        # Names repeat across recipes, like a real import.
+        'tags': [{'name': f'Tag {(i + n) % 40}'} for n in range(tags)],
+        'ingredients': [
+            {'name': f'Ingredient {(i * 7 + n) % 300}'}
+            for n in range(ingredients)
+        ],
+    }
+
+
+class Command(BaseCommand):
+    """Django command to benchmark creating recipes in bulk"""
+    help = (
+        'Create the same recipes with one POST each and with one POST to '
+        'the bulk endpoint, and compare time and queries.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--tags', type=int, default=3)
+        parser.add_argument('--ingredients', type=int, default=8)
+        parser.add_argument(
+            '--in-place',
+            action='store_true',
+            help='Use the configured database instead of a throwaway copy',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        with benchmark.benchmark_database(options['in_place']):
+            self._run(
+                options['recipes'],
+                options['tags'],
+                options['ingredients'],
+            )
+
+    def _timed(self, func):
+        """Run `func` and return (seconds, number of queries)"""
+        queries = []
+
+        def count(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        # Counting with a wrapper rather than CaptureQueriesContext keeps
+        # the overhead of the measurement out of the timings.
+        with connection.execute_wrapper(count):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+        return elapsed, len(queries)
+
+    def _run(self, count, tags, ingredients):
+        """Create the recipes both ways and print the comparison"""
+        payloads = [
+            recipe_payload(i, tags, ingredients) for i in range(count)
+        ]
+
+        single_user = benchmark.create_benchmark_user('single@example.com')
+        single_client = benchmark.authenticated_client(single_user)
+
+        def single_posts():
+            for payload in payloads:
+                res = single_client.post(RECIPES_URL, payload, format='json')
+                if res.status_code != 201:
+                    raise CommandError(f'POST failed: {res.data}')
+
+        bulk_user = benchmark.create_benchmark_user('bulk@example.com')
+        bulk_client = benchmark.authenticated_client(bulk_user)
+
+        def bulk_post():
+            res = bulk_client.post(
+                BULK_URL, {'create': payloads}, format='json')
+            if res.status_code != 200:
+                raise CommandError(f'Bulk POST failed: {res.data}')
+
+        self.stdout.write(
+            f'Creating {count} recipes with {tags} tags and '
+            f'{ingredients} ingredients each...'
+        )
+        results = [
+            ('single posts', single_posts, single_user),
+            ('bulk post', bulk_post, bulk_user),
+        ]
+        for label, func, user in results:
+            elapsed, queries = self._timed(func)
+            created = Recipe.objects.filter(user=user).count()
+            if created != count:
+                raise CommandError(f'{label} created {created} recipes')
+            self.stdout.write(
+                f'{label:<14} {elapsed * 1000:>10.1f} ms '
+                f'{queries:>8} queries {count / elapsed:>10.0f} recipes/sec'
+            )
@@ -0,0 +1,276 @@
+"""
+Django command to benchmark every public API endpoint against a baseline
+"""
+import io
+import json
+import platform
+import tempfile
+import tracemalloc
+from itertools import count
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import benchmark
+from core.models import Recipe
+
+# Metrics compared with the baseline, with the smallest change that
+# counts as a regression whatever the threshold: timings under a
+# millisecond apart and small allocations are noise.
+COMPARED_METRICS = {
+    'p50': 1.0,
+    'p95': 1.0,
+    'queries': 0,
+    'peak_kib': 64,
+}
+
+
+def _image():
+    """Return a small JPEG to upload"""
+    image_file = io.BytesIO()
+    Image.new('RGB', (64, 64)).save(image_file, format='JPEG')
+    image_file.seek(0)
+    image_file.name = 'benchmark.jpg'
+    return image_file
+
+
+def compare(results, baseline, threshold):
+    """Return a description of each metric that regressed"""
+    regressions = []
+    for name, base in baseline['endpoints'].items():
+        current = results['endpoints'].get(name)
+        if current is None:
+            continue
+        for metric, noise in COMPARED_METRICS.items():
+            # Query counts are deterministic, any increase is a change.
+            limit = base[metric] if metric == 'queries' else \
+                base[metric] * (1 + threshold)
+            if current[metric] > limit and \
+                    current[metric] - base[metric] > noise:
+                regressions.append(
+                    f'{name} {metric}: {base[metric]:.1f} -> '
+                    f'{current[metric]:.1f}'
+                )
+    return regressions
+
+
+class Command(BaseCommand):
+    """Django command to benchmark the API endpoints"""
+    help = (
+        'Seed a fixed dataset and drive every public endpoint in-process, '
+        'recording latency percentiles, queries per request and peak '
+        'allocations. Results can be written to JSON and compared with '
+        'a baseline written by an earlier run.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--recipes-per-user', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument(
+            '--endpoint',
+            action='append',
+            dest='endpoints',
+            help='Only run this endpoint, can be repeated',
+        )
+        parser.add_argument('--output', help='Write the results to a file')
+        parser.add_argument(
+            '--compare',
+            help='Baseline results to compare with, fails on regressions',
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=0.2,
+            help='Allowed slowdown over the baseline, 0.2 for 20%%',
+        )
+        parser.add_argument(
+            '--in-place',
+            action='store_true',
+            help='Use the configured database instead of a throwaway copy',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        baseline = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as f:
+                baseline = json.load(f)
+
+        with benchmark.benchmark_database(options['in_place']), \
+                tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=media_root):
+            results = self._run(options)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+                f.write('\n')
+        if baseline is not None:
+            regressions = compare(results, baseline, options['threshold'])
+            if regressions:
+                raise CommandError(
+                    'Regressions against the baseline:\n' +
+                    '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS(
+                'No regressions against the baseline'))
+
+    def _seed(self, options):
+        """Seed the dataset and return the busiest user"""
+        self.stdout.write(
+            f'Seeding {options["users"]} users with '
+            f'{options["recipes_per_user"]} recipes each on average...')
+        call_command(
+            'seed_data',
+            users=options['users'],
+            recipes_per_user=options['recipes_per_user'],
+            email_prefix='endpoints',
+            seed=0,
+            stdout=io.StringIO(),
+        )
+        return get_user_model().objects.filter(
+            email__startswith='endpoints').annotate(
+            recipe_count=Count('recipe')).order_by('-recipe_count').first()
+
+    def _scenarios(self, user):
+        """Return {name: (method, url, data function, authenticated)}"""
+        recipe = Recipe.objects.filter(user=user).order_by('id').first()
+        if recipe is None:
+            raise CommandError('The seeded user has no recipes.')
+        detail_url = reverse('recipe:recipe-detail', args=[recipe.id])
+        numbers = count()
+
+        def new_recipe():
+            n = next(numbers)
+            return {
+                'title': f'Benchmark recipe {n}',
+                'time_minutes': 30,
+                'price': '7.50',
+                'tags': [{'name': 'Dinner'}, {'name': f'Tag {n % 10}'}],
+                'ingredients': [{'name': 'Rice'}, {'name': 'Garlic'}],
+            }
+
+        def new_user():
+            n = next(numbers)
+            return {
+                'email': f'endpoints-new-{n}@example.com',
+                'password': 'password123',
+                'name': f'New user {n}',
+            }
+
+        return {
+            'recipe-list': (
+                'get', reverse('recipe:recipe-list'), None, True),
+            'recipe-detail': ('get', detail_url, None, True),
+            'recipe-create': (
+                'post', reverse('recipe:recipe-list'), new_recipe, True),
+            'recipe-update': (
+                'patch', detail_url,
+                lambda: {'title': f'Updated {next(numbers)}',
+                         'tags': [{'name': 'Dinner'}]},
+                True),
+            'recipe-upload-image': (
+                'post',
+                reverse('recipe:recipe-upload-image', args=[recipe.id]),
+                lambda: {'image': _image()},
+                True),
+            'tag-list': ('get', reverse('recipe:tag-list'), None, True),
+            'ingredient-list': (
+                'get', reverse('recipe:ingredient-list'), None, True),
+            'user-create': ('post', reverse('user:create'), new_user, False),
+            'user-token': (
+                'post', reverse('user:token'),
+                lambda: {'email': user.email, 'password': 'password'},
+                False),
+            'user-me': ('get', reverse('user:me'), None, True),
+            'health-check': ('get', reverse('health-check'), None, False),
+            'schema': ('get', reverse('api-schema'), None, False),
+        }
+
+    def _run(self, options):
+        """Seed the data, benchmark each endpoint and return the results"""
+        user = self._seed(options)
+        scenarios = self._scenarios(user)
+        unknown = set(options['endpoints'] or []) - scenarios.keys()
+        if unknown:
+            raise CommandError(
+                f'Unknown endpoints: {", ".join(sorted(unknown))}')
+
+        token = Token.objects.create(user=user)
+        authenticated = APIClient()
+        # A real token, so authentication is part of every request.
+        authenticated.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        anonymous = APIClient()
+
+        self.stdout.write(
+            f'{"endpoint":<22} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} '
+            f'{"queries":>8} {"peak KiB":>9}'
+        )
+        endpoints = {}
+        for name, (method, url, data, auth) in scenarios.items():
+            if options['endpoints'] and name not in options['endpoints']:
+                continue
+            client = authenticated if auth else anonymous
+
+            def request():
+                kwargs = {}
+                if data is not None:
+                    kwargs['data'] = data()
+                    # Uploads are multipart, everything else JSON.
+                    if 'image' not in kwargs['data']:
+                        kwargs['format'] = 'json'
+                response = getattr(client, method)(url, **kwargs)
+                if response.status_code >= 400:
+                    raise CommandError(
+                        f'{name} returned {response.status_code}: '
+                        f'{response.content[:200]!r}')
+                return response
+
+            endpoints[name] = self._measure(request, options)
+            result = endpoints[name]
+            self.stdout.write(
+                f'{name:<22} {result["p50"]:>9.2f} {result["p95"]:>9.2f} '
+                f'{result["p99"]:>9.2f} {result["queries"]:>8} '
+                f'{result["peak_kib"]:>9.0f}'
+            )
+
+        return {
+            'dataset': {
+                'users': options['users'],
+                'recipes_per_user': options['recipes_per_user'],
+                'recipes': Recipe.objects.filter(user=user).count(),
+            },
+            'repeat': options['repeat'],
+            'python': platform.python_version(),
+            'endpoints': endpoints,
+        }
+
+    def _measure(self, request, options):
+        """Return the latency, queries and allocations of a request"""
+        for _ in range(options['warmup']):
+            request()
+        # Tracing slows down every allocation, so timings, queries and
+        # memory are measured in separate passes.
+        result = benchmark.summarize(
+            benchmark.measure(request, options['repeat']))
+        with CaptureQueriesContext(connection) as queries:
+            request()
+        result['queries'] = len(queries)
+        tracemalloc.start()
+        try:
+            request()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        result['peak_kib'] = peak / 1024
+        return result
@@ -0,0 +1,86 @@
+"""
+Django command to measure the throughput of the image variant workers
+"""
+import io
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from PIL import Image
+
+from recipe.images import image_formats, save_variants
+
+
+def photo(width, height):
+    """Return JPEG bytes of a photo-like image, gradients plus noise"""
+    gradient = Image.linear_gradient('L').resize((width, height))
+    noise = Image.effect_noise((width, height), 40)
+    image = Image.merge('RGB', [gradient, noise, gradient.rotate(180)])
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    """Django command to benchmark making image variants"""
+    help = (
+        'Resize a batch of uploaded photos into every variant and format '
+        'with 1, 2, 4... worker threads and report images/sec.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--images', type=int, default=20)
+        parser.add_argument('--width', type=int, default=4000)
+        parser.add_argument('--height', type=int, default=3000)
+        parser.add_argument(
+            '--workers',
+            default='1,2,4',
+            help='Comma separated numbers of worker threads to compare',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        try:
+            workers = [int(n) for n in options['workers'].split(',')]
+        except ValueError:
+            raise CommandError('--workers must be numbers, e.g. 1,2,4')
+        if not workers or min(workers) < 1:
+            raise CommandError('--workers must be at least 1')
+
+        with tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=media_root):
+            self._run(options, workers)
+
+    def _run(self, options, workers):
+        """Upload the photos and time resizing them"""
+        content = photo(options['width'], options['height'])
+        sources = [
+            default_storage.save(f'benchmark/{i}.jpg', ContentFile(content))
+            for i in range(options['images'])
+        ]
+        variants = len(settings.RECIPE_IMAGE_VARIANTS) * len(image_formats())
+        self.stdout.write(
+            f'{options["images"]} photos of {options["width"]}x'
+            f'{options["height"]} ({len(content) // 1024} KiB), '
+            f'{variants} files each'
+        )
+        self.stdout.write(
+            f'{"workers":>8} {"seconds":>9} {"images/sec":>11} '
+            f'{"files/sec":>10}'
+        )
+        for count in workers:
+            with ThreadPoolExecutor(max_workers=count) as executor:
+                start = time.perf_counter()
+                list(executor.map(save_variants, sources))
+                elapsed = time.perf_counter() - start
+            rate = len(sources) / elapsed
+            self.stdout.write(
+                f'{count:>8} {elapsed:>9.2f} {rate:>11.1f} '
+                f'{rate * variants:>10.1f}'
+            )
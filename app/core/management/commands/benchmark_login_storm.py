@@ -0,0 +1,111 @@
+"""
+Django command to measure recipe list latency during a burst of logins
+"""
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import benchmark
+
+
+class Command(BaseCommand):
+    """Django command to benchmark the recipe list under a login storm"""
+    help = (
+        'Time listing recipes while threads log in as fast as they can, '
+        'with password hashing in the bounded pool and in the request '
+        'threads without a limit. Request threads are not limited here as '
+        'they are by uWSGI, so this measures the CPU the hashes take from '
+        'the other endpoints.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=200)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument(
+            '--logins',
+            type=int,
+            default=16,
+            help='Number of threads logging in at the same time',
+        )
+        parser.add_argument(
+            '--in-place',
+            action='store_true',
+            help='Use the configured database instead of a throwaway copy',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        with benchmark.benchmark_database(options['in_place']):
+            self._run(options)
+
+    def _run(self, options):
+        """Seed the data and print the timings of each scenario"""
+        user = benchmark.create_benchmark_user()
+        user.set_password('benchmark123')
+        user.save()
+        benchmark.seed_recipes(user, options['recipes'])
+        client = benchmark.authenticated_client(user)
+        list_url = reverse('recipe:recipe-list')
+
+        scenarios = [
+            ('no logins', 0, {}),
+            ('logins, unbounded', options['logins'],
+             {'PASSWORD_HASHING_WORKERS': 0}),
+            (f'logins, {settings.PASSWORD_HASHING_WORKERS} workers',
+             options['logins'], {}),
+        ]
+        self.stdout.write(
+            f'{"scenario":<22} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} '
+            f'{"logins/sec":>11} {"429s":>6}'
+        )
+        for name, logins, overrides in scenarios:
+            with override_settings(**overrides):
+                timings, statuses, elapsed = self._storm(
+                    user.email, logins,
+                    lambda: client.get(list_url), options['repeat'])
+            result = benchmark.summarize(timings)
+            answered = sum(
+                count for code, count in statuses.items() if code != 429)
+            self.stdout.write(
+                f'{name:<22} {result["p50"]:>9.2f} {result["p95"]:>9.2f} '
+                f'{result["p99"]:>9.2f} {answered / elapsed:>11.1f} '
+                f'{statuses[429]:>6}'
+            )
+
+    def _storm(self, email, logins, request, repeat):
+        """
+        Time `request` while `logins` threads log in, and return the
+        timings, the status codes of the logins and the seconds taken
+        """
+        stop = threading.Event()
+        statuses = Counter()
+        lock = threading.Lock()
+
+        def log_in():
+            client = APIClient()
+            payload = {'email': email, 'password': 'benchmark123'}
+            try:
+                while not stop.is_set():
+                    res = client.post(reverse('user:token'), payload)
+                    with lock:
+                        statuses[res.status_code] += 1
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=log_in) for _ in range(logins)]
+        for thread in threads:
+            thread.start()
+        try:
+            timings = benchmark.measure(request, repeat)
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+        return timings, statuses, max(sum(timings), 1e-9)
@@ -0,0 +1,87 @@
+"""
+Django command to compare cursor and OFFSET pagination of recipes
+"""
+from django.core.management.base import BaseCommand
+
+from rest_framework.pagination import Cursor
+from rest_framework.test import APIRequestFactory
+from rest_framework.request import Request
+
+from core import benchmark
+from core.models import Recipe
+from recipe.pagination import RecipeCursorPagination
+
+RECIPES_PATH = '/api/recipe/recipes/'
+
+
+class Command(BaseCommand):
+    """Django command to benchmark recipe list pagination"""
+    help = (
+        'Seed a user with many recipes and time fetching pages at '
+        'increasing depth with cursor and OFFSET pagination.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000)
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--in-place',
+            action='store_true',
+            help='Use the configured database instead of a throwaway copy',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        with benchmark.benchmark_database(options['in_place']):
+            self._run(options['rows'], options['page_size'],
+                      options['repeat'])
+
+    def _cursor_url(self, position):
+        """Build the list URL for the page that follows `position`"""
+        paginator = RecipeCursorPagination()
+        paginator.base_url = Request(
+            APIRequestFactory().get(RECIPES_PATH)
+        ).build_absolute_uri()
+        return paginator.encode_cursor(
+            Cursor(offset=0, reverse=False, position=str(position))
+        )
+
+    def _run(self, rows, page_size, repeat):
+        """Seed the data and print timings for each depth"""
+        user = benchmark.create_benchmark_user()
+        self.stdout.write(f'Seeding {rows} recipes...')
+        benchmark.seed_recipes(user, rows)
+
+        client = benchmark.authenticated_client(user)
+        queryset = Recipe.objects.filter(user=user).order_by('-id')
+        ids = queryset.values_list('id', flat=True)
+
+        self.stdout.write(
+            f'{"depth":>10} {"cursor api p50":>16} '
+            f'{"cursor sql p50":>16} {"offset sql p50":>16}'
+        )
+        for fraction in (0, 0.1, 0.5, 0.9, 0.99):
+            depth = int((rows - page_size) * fraction)
+            if depth:
+                # The cursor for a page stores the id of the last
+                # recipe on the page before it.
+                position = ids[depth - 1]
+                url = self._cursor_url(position)
+                keyset = queryset.filter(id__lt=position)
+            else:
+                url = RECIPES_PATH
+                keyset = queryset
+            url = f'{url}{"&" if "?" in url else "?"}page_size={page_size}'
+
+            api = benchmark.measure(lambda: client.get(url), repeat)
+            cursor = benchmark.measure(
+                lambda: list(keyset[:page_size]), repeat)
+            offset = benchmark.measure(
+                lambda: list(queryset[depth:depth + page_size]), repeat)
+            self.stdout.write(
+                f'{depth:>10} '
+                f'{benchmark.summarize(api)["p50"]:>13.2f} ms '
+                f'{benchmark.summarize(cursor)["p50"]:>13.2f} ms '
+                f'{benchmark.summarize(offset)["p50"]:>13.2f} ms'
+            )
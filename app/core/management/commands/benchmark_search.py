@@ -0,0 +1,99 @@
+"""
+Django command to compare full-text search with icontains matching
+"""
+import random
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from core import benchmark
+from core.models import Recipe
+
+WORDS = [
+    'chicken', 'beef', 'pork', 'tofu', 'salmon', 'prawn', 'rice', 'noodle',
+    'pasta', 'bread', 'potato', 'tomato', 'onion', 'garlic', 'ginger',
+    'chilli', 'lemon', 'lime', 'basil', 'coriander', 'mint', 'butter',
+    'cream', 'cheese', 'egg', 'mushroom', 'spinach', 'pepper', 'carrot',
+    'bean', 'lentil', 'coconut', 'curry', 'soup', 'salad', 'stew', 'roast',
+    'grill', 'bake', 'fry', 'steam', 'braise', 'spicy', 'sweet', 'sour',
+    'smoky', 'crispy', 'quick', 'easy', 'weeknight', 'sunday', 'summer',
+]
+SEARCH_TERMS = ['curry', 'smoky salmon', 'coconut lentil soup', 'rhubarb']
+
+
+class Command(BaseCommand):
+    """Django command to benchmark recipe search"""
+    help = (
+        'Seed a corpus of recipes and time ranked full-text search '
+        'against icontains substring matching.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=200000)
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--in-place',
+            action='store_true',
+            help='Use the configured database instead of a throwaway copy',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        with benchmark.benchmark_database(options['in_place']):
+            self._run(options)
+
+    def _seed(self, user, count, rng):
+        """Insert recipes with random titles and descriptions"""
+        batch = []
+        for _ in range(count):
+            title = rng.choices(WORDS, k=rng.randint(2, 5))
+            description = rng.choices(WORDS, k=rng.randint(10, 40))
+            batch.append(Recipe(
+                user=user,
+                title=' '.join(title),
+                description=' '.join(description),
+                time_minutes=rng.randint(5, 120),
+                price='5.00',
+            ))
+            if len(batch) == 10000:
+                Recipe.objects.bulk_create(batch)
+                batch = []
+        Recipe.objects.bulk_create(batch)
+
+    def _run(self, options):
+        """Seed the corpus and print timings for each search term"""
+        page_size = options['page_size']
+        repeat = options['repeat']
+        user = benchmark.create_benchmark_user()
+        self.stdout.write(f'Seeding {options["recipes"]} recipes...')
+        self._seed(user, options['recipes'], random.Random(options['seed']))
+
+        client = benchmark.authenticated_client(user)
+        recipes = Recipe.objects.filter(user=user)
+
+        self.stdout.write(
+            f'{"term":<22} {"matches":>8} {"search api p50":>16} '
+            f'{"icontains p50":>16}'
+        )
+        for term in SEARCH_TERMS:
+            params = {'search': term, 'page_size': page_size}
+            # Every word of the term has to appear, like websearch does.
+            contains = Q()
+            for word in term.split():
+                contains &= (
+                    Q(title__icontains=word) |
+                    Q(description__icontains=word)
+                )
+            matching = recipes.filter(contains).order_by('-id')
+
+            api = benchmark.measure(
+                lambda: client.get('/api/recipe/recipes/', params), repeat)
+            icontains = benchmark.measure(
+                lambda: list(matching[:page_size]), repeat)
+            self.stdout.write(
+                f'{term:<22} {matching.count():>8} '
+                f'{benchmark.summarize(api)["p50"]:>13.2f} ms '
+                f'{benchmark.summarize(icontains)["p50"]:>13.2f} ms'
+            )
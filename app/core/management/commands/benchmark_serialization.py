@@ -0,0 +1,91 @@
+"""
+Django command to compare the serializer and values() read paths
+"""
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rest_framework.renderers import JSONRenderer
+
+from core import benchmark
+from core.models import Recipe, Tag, Ingredient
+from recipe.prefetch import optimize_queryset
+from recipe.serializers import RecipeSerializer
+from recipe.values import ValuesReader
+
+
+class Command(BaseCommand):
+    """Django command to benchmark serializing the recipe list"""
+    help = (
+        'Seed recipes with tags and ingredients and compare rows/sec of '
+        'RecipeSerializer with the values() read path.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument(
+            '--in-place',
+            action='store_true',
+            help='Use the configured database instead of a throwaway copy',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        with benchmark.benchmark_database(options['in_place']):
+            self._run(options['recipes'], options['repeat'])
+
+    def _seed(self, user, count):
+        """Create recipes with a few tags and ingredients each"""
+        rng = random.Random(0)
+        tags = Tag.objects.bulk_create(
+            Tag(user=user, name=f'Tag {i}') for i in range(50))
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(user=user, name=f'Ingredient {i}') for i in range(200))
+        benchmark.seed_recipes(user, count)
+        recipe_ids = Recipe.objects.filter(user=user).values_list(
+            'id', flat=True)
+        Recipe.tags.through.objects.bulk_create(
+            (Recipe.tags.through(recipe_id=recipe_id, tag=tag)
+             for recipe_id in recipe_ids
+             for tag in rng.sample(tags, 3)),
+            batch_size=10000,
+        )
+        Recipe.ingredients.through.objects.bulk_create(
+            (Recipe.ingredients.through(recipe_id=recipe_id,
+                                        ingredient=ingredient)
+             for recipe_id in recipe_ids
+             for ingredient in rng.sample(ingredients, 8)),
+            batch_size=10000,
+        )
+
+    def _run(self, count, repeat):
+        """Seed the data and print rows/sec for both paths"""
+        user = benchmark.create_benchmark_user()
+        self.stdout.write(f'Seeding {count} recipes...')
+        self._seed(user, count)
+
+        queryset = Recipe.objects.filter(user=user).order_by('-id')
+        serializer = RecipeSerializer()
+        reader = ValuesReader.build(serializer)
+        renderer = JSONRenderer()
+
+        def serializer_path():
+            recipes = optimize_queryset(queryset, serializer)
+            return renderer.render(RecipeSerializer(recipes, many=True).data)
+
+        def values_path():
+            rows = reader.rows(queryset)
+            return renderer.render(reader.to_representation(rows))
+
+        if serializer_path() != values_path():
+            raise CommandError('The two paths returned different output')
+
+        for label, func in [('serializer', serializer_path),
+                            ('values', values_path)]:
+            timings = benchmark.measure(func, repeat)
+            mean = benchmark.summarize(timings)['mean'] / 1000
+            self.stdout.write(
+                f'{label:<12} {mean * 1000:>10.1f} ms '
+                f'{count / mean:>12.0f} rows/sec'
+            )
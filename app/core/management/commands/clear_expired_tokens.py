@@ -0,0 +1,22 @@
+"""
+Django command to delete refresh tokens that have expired
+"""
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import RefreshToken
+
+
+class Command(BaseCommand):
+    """Django command to delete expired refresh tokens"""
+    help = (
+        'Delete the refresh tokens older than REFRESH_TOKEN_LIFETIME. '
+        'Run it periodically, e.g. daily from cron.'
+    )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        deleted, _ = RefreshToken.objects.filter(
+            expires_at__lte=timezone.now()
+        ).delete()
+        self.stdout.write(f'Deleted {deleted} expired refresh tokens.')
@@ -0,0 +1,56 @@
+"""
+Django command to delete chunked image uploads that have expired
+"""
+import os
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import ImageUpload
+from recipe import uploads
+
+
+def _upload_ids(names):
+    """Return the names that are upload ids"""
+    ids = []
+    for name in names:
+        try:
+            ids.append(uuid.UUID(name))
+        except ValueError:
+            pass
+    return ids
+
+
+class Command(BaseCommand):
+    """Django command to delete abandoned uploads"""
+    help = (
+        'Delete chunked image uploads that received no chunk for '
+        'RECIPE_UPLOAD_EXPIRY seconds, and chunks left without an upload. '
+        'Run it periodically, e.g. hourly from cron.'
+    )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        expired, _ = ImageUpload.objects.filter(
+            expires_at__lte=timezone.now()
+        ).delete()
+
+        # Also finds the chunks of uploads deleted with their recipe or
+        # user, which nothing else cleans up.
+        try:
+            names = set(os.listdir(uploads.uploads_root()))
+        except FileNotFoundError:
+            names = set()
+        live = {
+            str(upload_id) for upload_id in ImageUpload.objects.filter(
+                id__in=_upload_ids(names)
+            ).values_list('id', flat=True)
+        }
+        for name in names - live:
+            uploads.discard(name)
+
+        self.stdout.write(
+            f'Deleted {expired} expired uploads and the chunks of '
+            f'{len(names - live)} uploads.'
+        )
@@ -0,0 +1,99 @@
+"""
+Django command to print the query plans behind the API endpoints
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+
+class Command(BaseCommand):
+    """Django command to EXPLAIN the queries run by each endpoint"""
+    help = (
+        'Call every read endpoint as the given user and print the '
+        'EXPLAIN plan of each query it runs.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'email',
+            help='User whose data the endpoints are called with',
+        )
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='Run EXPLAIN ANALYZE, which executes the queries',
+        )
+
+    def _endpoints(self, user):
+        """Return (label, url, params) for each endpoint to explain"""
+        recipes_url = reverse('recipe:recipe-list')
+        endpoints = [
+            ('recipe list', recipes_url, {}),
+            ('recipe search', recipes_url, {'search': 'dinner'}),
+            ('tag list', reverse('recipe:tag-list'), {}),
+            ('tag list, assigned only', reverse('recipe:tag-list'),
+             {'assigned_only': 1}),
+            ('ingredient list', reverse('recipe:ingredient-list'), {}),
+            ('ingredient list, assigned only',
+             reverse('recipe:ingredient-list'), {'assigned_only': 1}),
+        ]
+
+        recipe = Recipe.objects.filter(user=user).order_by('-id').first()
+        if recipe:
+            endpoints.append((
+                'recipe detail',
+                reverse('recipe:recipe-detail', args=[recipe.id]),
+                {},
+            ))
+        tag = Tag.objects.filter(user=user).first()
+        ingredient = Ingredient.objects.filter(user=user).first()
+        if tag and ingredient:
+            filters = {'tags': tag.id, 'ingredients': ingredient.id}
+            endpoints += [
+                ('recipe list, filtered', recipes_url, filters),
+                ('recipe list, filtered, match all', recipes_url,
+                 {**filters, 'match': 'all'}),
+            ]
+        return endpoints
+
+    def _explain(self, sql, analyze):
+        """Return the plan of an SQL statement as text"""
+        prefix = 'EXPLAIN ANALYZE' if analyze else 'EXPLAIN'
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}')
+            return '\n'.join(row[0] for row in cursor.fetchall())
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'No user with email {options["email"]}')
+
+        client = APIClient()
+        client.force_authenticate(user)
+
+        for label, url, params in self._endpoints(user):
+            # APIClient sends requests to 'testserver'. Cached responses
+            # run no queries worth explaining.
+            with override_settings(ALLOWED_HOSTS=['testserver'],
+                                   RECIPE_RESPONSE_CACHE=False), \
+                    CaptureQueriesContext(connection) as ctx:
+                res = client.get(url, params)
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'== {label}: GET {url} {params or ""} '
+                f'[{res.status_code}, {len(ctx)} queries]'
+            ))
+            for query in ctx.captured_queries:
+                sql = query['sql']
+                self.stdout.write(self.style.SQL_KEYWORD(sql))
+                if sql.lstrip().upper().startswith('SELECT'):
+                    self.stdout.write(
+                        self._explain(sql, options['analyze']))
+                self.stdout.write('')
@@ -0,0 +1,164 @@
+"""
+Django command to delete media files no recipe references
+"""
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.models import Recipe
+
+# Every stored file a recipe references: its image and the files of its
+# image variants. Sorted byte by byte, like walk_sorted().
+REFERENCED_SQL = '''
+SELECT name FROM (
+    SELECT image AS name FROM {table} WHERE image <> ''
+    UNION
+    SELECT file.value FROM {table},
+        jsonb_each(image_variants -> 'variants') AS variant,
+        jsonb_each_text(variant.value) AS file
+    WHERE file.key NOT IN ('width', 'height')
+) AS referenced
+WHERE name LIKE %s
+ORDER BY name COLLATE "C"
+'''
+
+
+def walk_sorted(root, prefix):
+    """
+    Yield (name, stat) for the files under `prefix` in `root` in the
+    order of their names, listing one directory at a time.
+    """
+    try:
+        entries = list(os.scandir(os.path.join(root, prefix)))
+    except FileNotFoundError:
+        return
+    # A directory's files sort as if their names were compared whole,
+    # 'a/b' after 'a-c'.
+    entries.sort(
+        key=lambda entry: entry.name + ('/' if entry.is_dir() else ''))
+    for entry in entries:
+        name = f'{prefix}/{entry.name}'
+        if entry.is_dir(follow_symlinks=False):
+            yield from walk_sorted(root, name)
+        elif entry.is_file(follow_symlinks=False):
+            yield name, entry.stat(follow_symlinks=False)
+
+
+def referenced_names(prefix):
+    """Yield the referenced file names under `prefix`, in order"""
+    escaped = prefix.replace('\\', '\\\\').replace('%', r'\%').replace(
+        '_', r'\_')
+    # A server side cursor, so the names are streamed in batches.
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(
+            REFERENCED_SQL.format(table=Recipe._meta.db_table),
+            [escaped + '/%'],
+        )
+        for (name,) in cursor:
+            yield name
+
+
+def unreferenced(files, references):
+    """
+    Yield the (name, stat) of files not in `references`, merging the
+    two sorted streams.
+    """
+    reference = next(references, None)
+    for name, stat in files:
+        while reference is not None and reference < name:
+            reference = next(references, None)
+        if reference != name:
+            yield name, stat
+
+
+class Command(BaseCommand):
+    """Django command to garbage collect media files"""
+    help = (
+        'Delete the files under MEDIA_ROOT/<prefix> that no recipe '
+        'references, in batches. Files younger than --min-age seconds are '
+        'kept, as uploads in progress have not committed theirs yet.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default='uploads/recipe')
+        parser.add_argument('--min-age', type=int, default=3600)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would be deleted without deleting it',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        prefix = options['prefix'].strip('/')
+        if not prefix:
+            raise CommandError('--prefix must name a directory')
+        self.dry_run = options['dry_run']
+        self.cutoff = time.time() - options['min_age']
+        self.scanned = self.deleted = self.freed = 0
+        self.start = time.perf_counter()
+
+        batch = []
+        files = unreferenced(
+            self._count(walk_sorted(settings.MEDIA_ROOT, prefix)),
+            referenced_names(prefix),
+        )
+        for name, stat in files:
+            if stat.st_mtime > self.cutoff:
+                continue
+            batch.append((name, stat.st_size))
+            if len(batch) >= options['batch_size']:
+                self._delete(batch)
+                batch = []
+        if batch:
+            self._delete(batch)
+
+        elapsed = time.perf_counter() - self.start
+        verb = 'Would delete' if self.dry_run else 'Deleted'
+        self.stdout.write(
+            f'Scanned {self.scanned} files in {elapsed:.1f}s '
+            f'({self.scanned / max(elapsed, 1e-9):.0f} files/sec). '
+            f'{verb} {self.deleted} files ({self.freed / 2 ** 20:.1f} MiB).'
+        )
+
+    def _count(self, files):
+        """Count the files scanned"""
+        for item in files:
+            self.scanned += 1
+            yield item
+
+    def _delete(self, batch):
+        """Delete a batch of files still unreferenced"""
+        # Referenced since the scan started, by an upload of the same
+        # photo.
+        names = [name for name, _ in batch]
+        referenced = set(
+            Recipe.objects.filter(image__in=names).values_list(
+                'image', flat=True))
+        for name, size in batch:
+            if name in referenced:
+                continue
+            path = os.path.join(settings.MEDIA_ROOT, name)
+            if not self.dry_run:
+                try:
+                    # Stored again since the scan.
+                    if os.stat(path).st_mtime > self.cutoff:
+                        continue
+                    os.unlink(path)
+                except FileNotFoundError:
+                    continue
+            self.deleted += 1
+            self.freed += size
+
+        elapsed = time.perf_counter() - self.start
+        self.stdout.write(
+            f'{self.scanned} files scanned, {self.deleted} deleted '
+            f'({self.freed / 2 ** 20:.1f} MiB), '
+            f'{self.deleted / max(elapsed, 1e-9):.0f} files/sec'
+        )
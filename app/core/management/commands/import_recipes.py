@@ -0,0 +1,174 @@
+"""
+Django command to bulk import recipes from NDJSON or CSV files
+"""
+import csv
+import json
+import os
+import time
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.loader import RECIPE_COLUMNS, RecipeLoader
+from core.models import ImportCheckpoint, Recipe
+
+FORMATS = ['ndjson', 'csv']
+
+
+def read_records(path, file_format):
+    """Yield the raw records of a file, one at a time"""
+    with open(path, newline='', encoding='utf-8') as source:
+        if file_format == 'csv':
+            yield from csv.DictReader(source)
+            return
+        for line in source:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _names(value):
+    """Return the tag or ingredient names of a record field"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        # CSV exports list names separated by semicolons.
+        value = value.split(';')
+    names = [
+        (item.get('name', '') if isinstance(item, dict) else str(item))
+        for item in value
+    ]
+    return [name.strip() for name in names if name.strip()]
+
+
+class Command(BaseCommand):
+    """Django command to import recipes in bulk"""
+    help = (
+        'Load recipes with their tags and ingredients from an NDJSON or '
+        'CSV file (e.g. one written by the export endpoint), in batches. '
+        'An interrupted import resumes after the last committed batch.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='NDJSON or CSV file to import')
+        parser.add_argument(
+            '--format',
+            dest='file_format',
+            choices=FORMATS,
+            help='File format, guessed from the extension by default',
+        )
+        parser.add_argument(
+            '--user',
+            help='Email of the owner of records without a "user" field',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--checkpoint',
+            help='Name of the checkpoint to resume from, defaults to the '
+                 'absolute path of the file',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Ignore the checkpoint and import from the first record',
+        )
+        parser.add_argument(
+            '--no-copy',
+            action='store_true',
+            help='Insert with bulk_create() instead of COPY',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        path = options['path']
+        file_format = options['file_format'] or \
+            os.path.splitext(path)[1].lstrip('.').lower()
+        if file_format not in FORMATS:
+            raise CommandError(
+                f'Unknown format {file_format!r}, use --format.')
+        self._users = {}
+        self._default_user = None
+        if options['user']:
+            self._default_user = self._user_id(options['user'])
+
+        checkpoint, _ = ImportCheckpoint.objects.get_or_create(
+            source=options['checkpoint'] or os.path.abspath(path))
+        if options['restart']:
+            checkpoint.records = 0
+            checkpoint.save()
+        skip = checkpoint.records
+        if skip:
+            self.stdout.write(f'Resuming after {skip} records...')
+
+        loader = RecipeLoader(use_copy=False if options['no_copy'] else None)
+        records = islice(read_records(path, file_format), skip, None)
+        imported = 0
+        start = time.perf_counter()
+        while True:
+            raw = list(islice(records, options['batch_size']))
+            if not raw:
+                break
+            batch = [
+                self._record(data, skip + imported + i + 1)
+                for i, data in enumerate(raw)
+            ]
+            # The batch and the checkpoint are committed together.
+            with transaction.atomic():
+                loader.load(batch)
+                imported += len(batch)
+                checkpoint.records = skip + imported
+                checkpoint.save()
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f'{skip + imported} records '
+                f'({imported / elapsed:.0f} recipes/sec)'
+            )
+
+        elapsed = time.perf_counter() - start
+        rate = imported / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported} recipes in {elapsed:.1f}s '
+            f'({rate:.0f} recipes/sec)'
+        ))
+
+    def _user_id(self, email):
+        """Return the id of the user with `email`, cached"""
+        if email not in self._users:
+            try:
+                self._users[email] = get_user_model().objects.values_list(
+                    'id', flat=True).get(email=email)
+            except get_user_model().DoesNotExist:
+                raise CommandError(f'No user with email {email}')
+        return self._users[email]
+
+    def _record(self, data, number):
+        """Validate a raw record and return it in the loader's format"""
+        if data.get('user'):
+            user_id = self._user_id(data['user'])
+        elif self._default_user is not None:
+            user_id = self._default_user
+        else:
+            raise CommandError(
+                f'Record {number} has no "user" and no --user was given')
+        record = {
+            'user_id': user_id,
+            'tags': _names(data.get('tags')),
+            'ingredients': _names(data.get('ingredients')),
+        }
+        for column in RECIPE_COLUMNS[1:]:
+            field = Recipe._meta.get_field(column)
+            value = data.get(column)
+            if value is None and field.blank:
+                value = ''
+            try:
+                # The same checks as model validation, without building
+                # a model instance.
+                record[column] = field.clean(value, None)
+            except ValidationError as error:
+                raise CommandError(
+                    f'Record {number} has an invalid {column}: '
+                    f'{" ".join(error.messages)}'
+                )
+        return record
@@ -0,0 +1,41 @@
+"""
+Django command to make the image variants that were never made
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from core.models import Recipe
+from recipe import images
+
+
+class Command(BaseCommand):
+    """Django command to make missing image variants"""
+    help = (
+        'Make the variants of recipe images that have none. Variants are '
+        'made by in-process workers after the upload commits, so a worker '
+        'restarted meanwhile loses them and the original is served '
+        'instead. Run it at startup and periodically, e.g. hourly from '
+        'cron.'
+    )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        missing = Recipe.objects.exclude(
+            Q(image='') | Q(image__isnull=True)
+        ).filter(
+            Q(image_variants__isnull=True) | Q(image_variants__variants={})
+        ).values_list('id', 'user_id', 'image')
+
+        made = failed = 0
+        for recipe_id, user_id, source in missing.iterator():
+            try:
+                images.create_variants(recipe_id, user_id, source)
+            except Exception:
+                images.logger.exception(
+                    'Could not create the variants of %s', source)
+                failed += 1
+            else:
+                made += 1
+
+        self.stdout.write(
+            f'Made the variants of {made} images, {failed} failed.')
@@ -0,0 +1,202 @@
+"""
+Django command to generate realistic synthetic data for load testing
+"""
+import math
+import random
+import time
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.loader import RecipeLoader
+
+WORDS = [
+    'chicken', 'beef', 'pork', 'tofu', 'salmon', 'prawn', 'rice', 'noodle',
+    'pasta', 'bread', 'potato', 'tomato', 'onion', 'garlic', 'ginger',
+    'chilli', 'lemon', 'lime', 'basil', 'coriander', 'mint', 'butter',
+    'cream', 'cheese', 'egg', 'mushroom', 'spinach', 'pepper', 'carrot',
+    'bean', 'lentil', 'coconut', 'curry', 'soup', 'salad', 'stew', 'roast',
+    'grill', 'bake', 'fry', 'steam', 'braise', 'spicy', 'sweet', 'sour',
+    'smoky', 'crispy', 'quick', 'easy', 'weeknight', 'sunday', 'summer',
+]
+TAG_WORDS = [
+    'Dinner', 'Lunch', 'Breakfast', 'Vegetarian', 'Vegan', 'Quick',
+    'Thai', 'Italian', 'Indian', 'Mexican', 'Dessert', 'Baking',
+    'Gluten free', 'Healthy', 'Comfort food', 'Party', 'Summer', 'Winter',
+]
+INGREDIENT_WORDS = [
+    'Salt', 'Olive oil', 'Garlic', 'Onion', 'Butter', 'Flour', 'Egg',
+    'Sugar', 'Milk', 'Rice', 'Tomato', 'Lemon', 'Chicken', 'Ginger',
+    'Basil', 'Cheese', 'Potato', 'Carrot', 'Chilli', 'Coconut milk',
+]
+# Exponent of the Zipf distribution of tag and ingredient popularity.
+ZIPF_EXPONENT = 1.1
+# Spread of the log-normal number of recipes per user: a few users own
+# many times the average, most own a handful.
+RECIPES_SIGMA = 1.2
+
+
+def vocabulary(words, size):
+    """Return `size` names, most popular first"""
+    return [
+        words[rank % len(words)] +
+        (f' {rank // len(words)}' if rank >= len(words) else '')
+        for rank in range(size)
+    ]
+
+
+def zipf_weights(size, exponent=ZIPF_EXPONENT):
+    """Return cumulative Zipf weights for ranks 1 to `size`"""
+    return list(accumulate(1 / rank ** exponent
+                           for rank in range(1, size + 1)))
+
+
+class Command(BaseCommand):
+    """Django command to seed the database with synthetic data"""
+    help = (
+        'Generate users and recipes with their tags and ingredients for '
+        'load and scale testing. Tag and ingredient popularity follows a '
+        'Zipf distribution and recipes per user a heavy-tailed one; the '
+        'same --seed generates the same data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument(
+            '--recipes-per-user',
+            type=int,
+            default=100,
+            help='Average number of recipes per user',
+        )
+        parser.add_argument(
+            '--tags',
+            type=int,
+            default=200,
+            help='Number of distinct tag names',
+        )
+        parser.add_argument(
+            '--ingredients',
+            type=int,
+            default=1000,
+            help='Number of distinct ingredient names',
+        )
+        parser.add_argument('--tags-per-recipe', type=int, default=3)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument(
+            '--email-prefix',
+            default='seed',
+            help='Users are created as <prefix><n>@example.com',
+        )
+        parser.add_argument(
+            '--password',
+            default='password',
+            help='Password of every generated user',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        if options['tags'] < 1 or options['ingredients'] < 1:
+            raise CommandError('--tags and --ingredients must be positive.')
+        rng = random.Random(options['seed'])
+        start = time.perf_counter()
+
+        user_ids = self._create_users(options)
+        self.stdout.write(
+            f'Created {len(user_ids)} users '
+            f'in {time.perf_counter() - start:.1f}s'
+        )
+
+        self._tags = vocabulary(TAG_WORDS, options['tags'])
+        self._tag_weights = zipf_weights(options['tags'])
+        self._ingredients = vocabulary(
+            INGREDIENT_WORDS, options['ingredients'])
+        self._ingredient_weights = zipf_weights(options['ingredients'])
+
+        loader = RecipeLoader()
+        created = 0
+        batch = []
+        for user_id in user_ids:
+            for _ in range(self._recipe_count(rng, options)):
+                batch.append(self._record(rng, user_id, options))
+                if len(batch) == options['batch_size']:
+                    created += self._load(loader, batch, start, created)
+                    batch = []
+        if batch:
+            created += self._load(loader, batch, start, created)
+
+        elapsed = time.perf_counter() - start
+        rate = created / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(user_ids)} users and {created} recipes in '
+            f'{elapsed:.1f}s ({rate:.0f} recipes/sec)'
+        ))
+
+    def _create_users(self, options):
+        """Create the users in batches and return their ids"""
+        User = get_user_model()
+        emails = [
+            f'{options["email_prefix"]}{n}@example.com'
+            for n in range(options['users'])
+        ]
+        if User.objects.filter(email__in=emails[:1]).exists():
+            raise CommandError(
+                f'{emails[0]} already exists, use another --email-prefix.')
+        # Hashing is deliberately slow: hash the password once and give
+        # every user the same hash.
+        password = make_password(options['password'])
+        user_ids = []
+        for offset in range(0, len(emails), options['batch_size']):
+            with transaction.atomic():
+                users = User.objects.bulk_create(
+                    User(email=email, name=email.split('@')[0],
+                         password=password)
+                    for email in emails[offset:offset + options['batch_size']]
+                )
+            user_ids.extend(user.id for user in users)
+        return user_ids
+
+    def _recipe_count(self, rng, options):
+        """Return the number of recipes of the next user"""
+        mean = options['recipes_per_user']
+        if mean <= 0:
+            return 0
+        # Log-normal with the requested mean.
+        mu = math.log(mean) - RECIPES_SIGMA ** 2 / 2
+        return int(rng.lognormvariate(mu, RECIPES_SIGMA))
+
+    def _record(self, rng, user_id, options):
+        """Return a random recipe in the loader's format"""
+        return {
+            'user_id': user_id,
+            'title': ' '.join(rng.choices(WORDS, k=rng.randint(2, 5))),
+            'description': ' '.join(
+                rng.choices(WORDS, k=rng.randint(0, 40))),
+            'time_minutes': rng.randint(5, 180),
+            'price': f'{rng.randint(50, 5000) / 100:.2f}',
+            'link': '',
+            'tags': rng.choices(
+                self._tags,
+                cum_weights=self._tag_weights,
+                k=rng.randint(0, 2 * options['tags_per_recipe']),
+            ),
+            'ingredients': rng.choices(
+                self._ingredients,
+                cum_weights=self._ingredient_weights,
+                k=rng.randint(0, 2 * options['ingredients_per_recipe']),
+            ),
+        }
+
+    def _load(self, loader, batch, start, created):
+        """Load a batch of records and report progress"""
+        with transaction.atomic():
+            loader.load(batch)
+        created += len(batch)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f'{created} recipes ({created / elapsed:.0f} recipes/sec)')
+        return len(batch)
@@ -0,0 +1,52 @@
+# Generated by Django 4.0.10 on 2026-10-18 02:14
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+# Reverse lookups on the through tables (tag/ingredient -> recipes), used
+# by the EXISTS and match=all filters on the recipe list. Django only
+# creates (recipe_id, <target>_id) unique indexes for these tables.
+THROUGH_INDEXES = [
+    ('core_recipe_tags', 'tag_id', 'core_recipe_tags_tag_recipe_idx'),
+    (
+        'core_recipe_ingredients',
+        'ingredient_id',
+        'core_recipe_ingredients_ingredient_recipe_idx',
+    ),
+]
+
+
+def through_index_operations():
+    """Create and drop the through table indexes without locking writes"""
+    return [
+        migrations.RunSQL(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} '
+            f'ON {table} ({column}, recipe_id);',
+            f'DROP INDEX CONCURRENTLY IF EXISTS {name};',
+        )
+        for table, column, name in THROUGH_INDEXES
+    ]
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('core', '0006_recipe_search_vector'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='ingredient',
+            index=models.Index(fields=['user', '-name'], name='ingredient_user_name_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='recipe',
+            index=models.Index(fields=['user', '-id'], name='recipe_user_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='tag',
+            index=models.Index(fields=['user', '-name'], name='tag_user_name_idx'),
+        ),
+    ] + through_index_operations()
@@ -0,0 +1,39 @@
+# Generated by Django 4.0.10 on 2026-10-18 02:19
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def create_content_versions(apps, schema_editor):
+    """Create a content version for every existing user"""
+    User = apps.get_model('core', 'User')
+    ContentVersion = apps.get_model('core', 'ContentVersion')
+    ContentVersion.objects.bulk_create(
+        (ContentVersion(user_id=user_id)
+         for user_id in User.objects.values_list('id', flat=True).iterator()),
+        batch_size=10000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentVersion',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='content_version', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('modified_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RunPython(
+            create_content_versions,
+            migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,110 @@
+# Generated by Django 4.0.10 on 2026-10-18 09:12
+
+from django.contrib.postgres.operations import RemoveIndexConcurrently
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+# (table, constraint) of each unique (user, name) constraint.
+UNIQUE_NAMES = [
+    ('core_tag', 'tag_user_name_unique'),
+    ('core_ingredient', 'ingredient_user_name_unique'),
+]
+
+
+def merge_duplicates(apps, model_name, relation, column):
+    """Merge rows sharing a (user, name), keeping the oldest one"""
+    Model = apps.get_model('core', model_name)
+    Recipe = apps.get_model('core', 'Recipe')
+    Through = Recipe._meta.get_field(relation).remote_field.through
+    duplicates = Model.objects.values('user_id', 'name').annotate(
+        keep=Min('id'),
+        count=Count('id'),
+    ).filter(count__gt=1)
+    for group in duplicates.iterator():
+        keep = group['keep']
+        others = list(Model.objects.filter(
+            user_id=group['user_id'],
+            name=group['name'],
+        ).exclude(id=keep).values_list('id', flat=True))
+        for other in others:
+            # Recipes already linked to the kept row just lose the link
+            # to the duplicate, the others are moved over.
+            linked = Through.objects.filter(
+                **{column: keep}).values('recipe_id')
+            Through.objects.filter(
+                **{column: other}, recipe_id__in=linked).delete()
+            Through.objects.filter(**{column: other}).update(
+                **{column: keep})
+        Model.objects.filter(id__in=others).delete()
+
+
+def unique_name_operations():
+    """
+    Build the unique indexes without locking writes, then turn them into
+    constraints, which only takes a brief lock. A failed build leaves an
+    INVALID index behind, so whatever a previous run left is dropped
+    first and the migration can simply be run again.
+    """
+    return [
+        migrations.RunSQL(
+            [
+                f'ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {name};',
+                f'DROP INDEX CONCURRENTLY IF EXISTS {name};',
+                f'CREATE UNIQUE INDEX CONCURRENTLY {name} '
+                f'ON {table} (user_id, name);',
+                f'ALTER TABLE {table} ADD CONSTRAINT {name} '
+                f'UNIQUE USING INDEX {name};',
+            ],
+            [
+                f'ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {name};',
+                f'DROP INDEX CONCURRENTLY IF EXISTS {name};',
+            ],
+        )
+        for table, name in UNIQUE_NAMES
+    ]
+
+
+def merge_duplicate_names(apps, schema_editor):
+    """Merge duplicate tags and ingredients before adding constraints"""
+    merge_duplicates(apps, 'Tag', 'tags', 'tag_id')
+    merge_duplicates(apps, 'Ingredient', 'ingredients', 'ingredient_id')
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('core', '0008_contentversion'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_names,
+            migrations.RunPython.noop,
+            atomic=True,
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=unique_name_operations(),
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name='tag',
+                    constraint=models.UniqueConstraint(fields=('user', 'name'), name='tag_user_name_unique'),
+                ),
+                migrations.AddConstraint(
+                    model_name='ingredient',
+                    constraint=models.UniqueConstraint(fields=('user', 'name'), name='ingredient_user_name_unique'),
+                ),
+            ],
+        ),
+        # The unique (user, name) indexes serve the lists ordered by
+        # -name as well.
+        RemoveIndexConcurrently(
+            model_name='tag',
+            name='tag_user_name_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='ingredient',
+            name='ingredient_user_name_idx',
+        ),
+    ]
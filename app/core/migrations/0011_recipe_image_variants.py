@@ -0,0 +1,28 @@
+# Generated by Django 4.0.10 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+# Existing images are served as they are until their variants are made.
+SET_SOURCE_SQL = '''
+UPDATE core_recipe
+SET image_variants = jsonb_build_object(
+    'source', image, 'variants', '{}'::jsonb
+)
+WHERE image IS NOT NULL AND image <> '';
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_importcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_variants',
+            field=models.JSONField(editable=False, null=True),
+        ),
+        migrations.RunSQL(SET_SOURCE_SQL, migrations.RunSQL.noop),
+    ]
@@ -5,25 +5,30 @@ import uuid
 import os
 
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import F
+from django.utils import timezone
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
     PermissionsMixin
 )
 
+from core.storage import image_storage
+
 
 def recipe_image_file_path(instance, filename):
     """
     Generate file path for new recipe image
     """
-    # get the extension of the file
-    ext = os.path.splitext(filename)[1]
-    # create the filename
-    filename = f'{uuid.uuid4()}{ext}'
+    # get the extension of the file, the storage names the file after
+    # its content (see core/storage.py)
+    ext = os.path.splitext(filename)[1].lower()
 
     # return the path
-    return os.path.join('uploads', 'recipe', filename)
+    return os.path.join('uploads', 'recipe', f'image{ext}')
 
 
 class UserManager(BaseUserManager):
@@ -54,12 +59,21 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # Carried by every signed access token, bumping it revokes them (see
+    # core/access_tokens.py).
+    token_version = models.PositiveIntegerField(default=0)
 
     # this is required for django to work with our custom user model
     objects = UserManager()
 
     USERNAME_FIELD = 'email'
 
+    def revoke_tokens(self):
+        """Revoke the access and refresh tokens issued to the user"""
+        self.token_version += 1
+        self.save(update_fields=['token_version'])
+        self.refresh_tokens.all().delete()
+
 
 class Recipe(models.Model):
     """Recipe object"""
@@ -77,7 +91,30 @@ class Recipe(models.Model):
     # this is a string because the Tag model is defined below
     tags = models.ManyToManyField('Tag')
     ingredients = models.ManyToManyField('Ingredient')
-    image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    image = models.ImageField(
+        null=True,
+        upload_to=recipe_image_file_path,
+        storage=image_storage
+    )
+    # Resized copies of the image, made after upload (see
+    # recipe/images.py): {'source': image name, 'variants': {name:
+    # {'width', 'height', <format>: file name}}}. The source is kept
+    # here so the serializer can fall back to it without the image
+    # column.
+    image_variants = models.JSONField(null=True, editable=False)
+    # Weighted tsvector of the title (A) and description (B). It is
+    # maintained by a database trigger (see migration 0006) so it stays
+    # current for bulk inserts and updates as well as save().
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # The recipe list filters on the user and pages on -id.
+            models.Index(fields=['user', '-id'], name='recipe_user_id_idx'),
+            # Finds the other recipes sharing a stored image.
+            models.Index(fields=['image'], name='recipe_image_idx'),
+            GinIndex(fields=['search_vector'], name='recipe_search_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -93,6 +130,18 @@ class Tag(models.Model):
         on_delete=models.CASCADE
     )
 
+    class Meta:
+        constraints = [
+            # Names are looked up per user when recipes are saved, and
+            # concurrent saves must not create the same tag twice. The
+            # tag list filters on the user and orders by -name, which
+            # the index behind this also serves, scanned backwards.
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='tag_user_name_unique',
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -107,5 +156,133 @@ class Ingredient(models.Model):
         on_delete=models.CASCADE
     )
 
+    class Meta:
+        constraints = [
+            # Names are looked up per user when recipes are saved, and
+            # concurrent saves must not create the same ingredient twice. The
+            # ingredient list filters on the user and orders by -name, which
+            # the index behind this also serves, scanned backwards.
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='ingredient_user_name_unique',
+            ),
+        ]
+
     def __str__(self):
         return self.name
+
+
+class ContentVersionManager(models.Manager):
+    """Manager for per-user content versions"""
+
+    def for_user(self, user):
+        """Return the user's content version, version 0 if it has none"""
+        # Read only: the user of a valid access token may have been
+        # deleted, and inserting its row would break the foreign key.
+        try:
+            return self.get(user_id=user.pk)
+        except self.model.DoesNotExist:
+            return self.model(user_id=user.pk)
+
+    def bump(self, *user_ids):
+        """Record that the users' recipes, tags or ingredients changed"""
+        # A plain UPDATE: if the row doesn't exist yet, no client can
+        # hold a validator for the old data, so there is nothing to bump.
+        return self.filter(user_id__in=user_ids).update(
+            version=F('version') + 1,
+            modified_at=timezone.now()
+        )
+
+
+class ContentVersion(models.Model):
+    """
+    Version of a user's recipe data, bumped on every write to their
+    recipes, tags, ingredients and the links between them. Used to
+    answer conditional GET requests with a single primary key lookup.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='content_version'
+    )
+    version = models.PositiveBigIntegerField(default=0)
+    modified_at = models.DateTimeField(default=timezone.now)
+
+    objects = ContentVersionManager()
+
+    def __str__(self):
+        return f'{self.user_id} v{self.version}'
+
+
+class ImportCheckpoint(models.Model):
+    """
+    Number of records of an import source already loaded. Saved in the
+    same transaction as each batch, so an interrupted import resumes
+    exactly after the last batch that was committed.
+    """
+    source = models.CharField(max_length=255, unique=True)
+    records = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.source}: {self.records}'
+
+
+class ImageUpload(models.Model):
+    """
+    Session of a chunked recipe image upload. The chunks are stored in
+    a directory of their own under MEDIA_ROOT (see recipe/uploads.py)
+    until the upload is finalized or expires.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='image_uploads'
+    )
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    # Hex SHA-256 of the whole file, checked when it is finalized.
+    sha256 = models.CharField(max_length=64)
+    chunk_size = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Pushed back by every chunk, so only abandoned uploads expire.
+    expires_at = models.DateTimeField(db_index=True)
+
+    @property
+    def chunk_count(self):
+        """Number of chunks the file is split into"""
+        return -(-self.size // self.chunk_size)
+
+    def chunk_length(self, number):
+        """Return the length of chunk `number` (counted from 0)"""
+        return min(self.chunk_size, self.size - number * self.chunk_size)
+
+    def __str__(self):
+        return str(self.id)
+
+
+class RefreshToken(models.Model):
+    """
+    Token exchanged for new signed access tokens (see
+    core/access_tokens.py). Only the SHA-256 of the token is stored.
+    """
+    key_hash = models.CharField(max_length=64, primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='refresh_tokens'
+    )
+    # The token_version of the user when the token was issued, it stops
+    # working once the version is bumped.
+    token_version = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.key_hash
@@ -0,0 +1,100 @@
+"""
+Signal handlers for the core models
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from core.access_tokens import publish_token_version
+from core.authentication import invalidate_tokens
+from core.models import (
+    ContentVersion,
+    Recipe,
+    Tag,
+    Ingredient
+)
+
+# Users whose content changed inside deferred_content_versions(), or
+# None outside of it.
+_changed_users = ContextVar('changed_users', default=None)
+
+
+def content_changed(user_id):
+    """Bump the user's content version, or note it for later"""
+    changed = _changed_users.get()
+    if changed is None:
+        ContentVersion.objects.bump(user_id)
+    else:
+        changed.add(user_id)
+
+
+@contextmanager
+def deferred_content_versions():
+    """
+    Bump the content version of each user whose data changes in the
+    enclosed block once when the block ends, rather than once per
+    changed row. Used by bulk writes, which would otherwise run a
+    version update per recipe, and by recipe writes, which would run one
+    per row and per relation. Blocks can be nested.
+    """
+    token = _changed_users.set(set())
+    try:
+        yield
+        changed = _changed_users.get()
+    finally:
+        _changed_users.reset(token)
+    # Only reached if the block succeeded, a failed block is rolled back
+    # along with the writes it made.
+    for user_id in sorted(changed):
+        content_changed(user_id)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def create_content_version(sender, instance, created, **kwargs):
+    """Start every new user at version 0"""
+    if created:
+        ContentVersion.objects.create(user=instance)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def forget_cached_user(sender, instance, created, **kwargs):
+    """
+    Stop authenticating with a cached copy of a user that changed, e.g.
+    deactivated or with a new password, and revoke its access tokens if
+    its token version changed
+    """
+    if not created:
+        invalidate_tokens(
+            Token.objects.filter(user=instance).values_list('key', flat=True))
+        publish_token_version(instance)
+
+
+@receiver(post_delete, sender=Token)
+def forget_cached_token(sender, instance, **kwargs):
+    """Stop accepting a deleted token"""
+    invalidate_tokens([instance.key])
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def bump_content_version(sender, instance, **kwargs):
+    """Bump the owner's content version when a row changes"""
+    content_changed(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def bump_content_version_on_link(sender, instance, action, **kwargs):
+    """Bump the owner's content version when recipe links change"""
+    # instance is the recipe, or the tag/ingredient for reverse changes,
+    # both belong to the same user.
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        content_changed(instance.user_id)
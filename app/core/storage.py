@@ -0,0 +1,60 @@
+"""
+Content addressed file storage
+"""
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage that names each file after the SHA-256 of its
+    content, in a directory per first two hex digits. Identical files
+    are stored once; the recipes referencing a file are its references,
+    and files no recipe references are deleted by gc_media.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is only known once the content is read, in
+        # _save(). Reusing an existing name is the point.
+        return name
+
+    def _save(self, name, content):
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        full_directory = self.path(directory)
+        os.makedirs(full_directory, exist_ok=True)
+
+        # Hashed while it is written, so the content is read once.
+        digest = hashlib.sha256()
+        fd, temporary = tempfile.mkstemp(dir=full_directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    f.write(chunk)
+            hexdigest = digest.hexdigest()
+            name = os.path.join(
+                directory, hexdigest[:2], hexdigest + extension)
+            full_path = self.path(name)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            if os.path.exists(full_path):
+                os.unlink(temporary)
+                # Counts as new for gc_media until the recipe that
+                # references it again is committed.
+                os.utime(full_path)
+            else:
+                if self.file_permissions_mode is not None:
+                    os.chmod(temporary, self.file_permissions_mode)
+                # Atomic, so two uploads of the same file can't clash.
+                os.replace(temporary, full_path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.unlink(temporary)
+            raise
+        return name.replace('\\', '/')
+
+
+image_storage = ContentAddressedStorage()
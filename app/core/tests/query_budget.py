@@ -0,0 +1,134 @@
+"""
+Query budgets for API actions.
+
+A budget caps the queries an action may issue as a function of the
+number of items it handles. Each action is run at several sizes: the
+counts must stay within the budget and must not grow with the size
+unless the budget allows it, which catches N+1 queries. The normalized
+statements are also compared with a snapshot file checked in next to
+the tests, so a new or duplicated query shows up as a readable diff.
+Set RECORD_QUERY_SNAPSHOTS=1 to write the snapshots of the actions
+that are run.
+"""
+import difflib
+import os
+import re
+from collections import Counter
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+RECORD_ENV = 'RECORD_QUERY_SNAPSHOTS'
+
+# Savepoint and server-side cursor names include the thread id.
+_SAVEPOINT = re.compile(r'"s\d+_x\d+"')
+_CURSOR = re.compile(r'"_django_curs_\d+_\w+?_\d+"')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w"])-?\d+(?:\.\d+)?\b')
+# Placeholder lists whose length depends on the data.
+_LIST = re.compile(r'\((?:\?, )*\?\)')
+_ROWS = re.compile(r'(?:\(\.\.\.\), )+\(\.\.\.\)')
+_SPACE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """Return a SQL statement with its literal values replaced by ?"""
+    sql = _SAVEPOINT.sub('"s?"', sql)
+    sql = _CURSOR.sub('"_django_curs_?"', sql)
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _LIST.sub('(...)', sql)
+    sql = _ROWS.sub('(...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+class QueryBudget:
+    """Most queries an action may issue for `n` items: base + per_item*n"""
+
+    def __init__(self, base, per_item=0):
+        self.base = base
+        self.per_item = per_item
+
+    def limit(self, n):
+        """Return the most queries allowed for `n` items"""
+        return self.base + self.per_item * n
+
+    def __repr__(self):
+        return f'QueryBudget({self.base}, per_item={self.per_item})'
+
+
+def _diff(expected, actual, expected_label, actual_label):
+    """Return a unified diff of two lists of fingerprints"""
+    return '\n'.join(difflib.unified_diff(
+        expected, actual, expected_label, actual_label, lineterm=''))
+
+
+class QueryBudgetMixin:
+    """
+    TestCase mixin to check actions against their query budgets.
+
+    Subclasses set `snapshot_dir`, the directory of the snapshot files.
+    """
+    snapshot_dir = None
+    # Item counts each action is run with.
+    sizes = (1, 3, 10)
+
+    def assertQueryBudget(self, name, budget, prepare):
+        """
+        Check action `name` against `budget`.
+
+        prepare(n) sets up the data for n items and returns a function
+        that sends the request; only the queries it issues are counted.
+        """
+        runs = {}
+        for n in self.sizes:
+            send = prepare(n)
+            with CaptureQueriesContext(connection) as ctx:
+                response = send()
+                # Streaming responses query while they are consumed.
+                if getattr(response, 'streaming', False):
+                    b''.join(response.streaming_content)
+            self.assertLess(
+                response.status_code, 400,
+                f'{name} returned {response.status_code}')
+            runs[n] = [
+                fingerprint(query['sql']) for query in ctx.captured_queries
+            ]
+
+        smallest, largest = min(runs), max(runs)
+        for n, queries in runs.items():
+            if len(queries) > budget.limit(n):
+                self.fail(
+                    f'{name} issued {len(queries)} queries for {n} items, '
+                    f'over its {budget!r} of {budget.limit(n)}:\n' +
+                    '\n'.join(queries))
+        if not budget.per_item and \
+                len(runs[largest]) != len(runs[smallest]):
+            grown = Counter(runs[largest]) - Counter(runs[smallest])
+            self.fail(
+                f'{name} queries grow with the number of items, '
+                f'{len(runs[smallest])} for {smallest} and '
+                f'{len(runs[largest])} for {largest}. Repeated:\n' +
+                '\n'.join(f'{count} x {sql}' for sql, count in grown.items())
+            )
+        self._check_snapshot(name, runs[smallest])
+
+    def _check_snapshot(self, name, queries):
+        """Compare fingerprints with the snapshot file of the action"""
+        path = os.path.join(self.snapshot_dir, f'{name}.sql')
+        if os.environ.get(RECORD_ENV):
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.writelines(f'{query}\n' for query in queries)
+            return
+        if not os.path.exists(path):
+            self.fail(
+                f'No query snapshot for {name}, run the tests with '
+                f'{RECORD_ENV}=1 to record it.')
+        with open(path, encoding='utf-8') as f:
+            expected = f.read().splitlines()
+        if queries != expected:
+            self.fail(
+                f'The queries of {name} changed, run the tests with '
+                f'{RECORD_ENV}=1 to accept them:\n' +
+                _diff(expected, queries, f'{name}.sql', 'actual'))
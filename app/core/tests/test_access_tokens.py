@@ -0,0 +1,307 @@
+"""
+Tests for signed access tokens and refresh tokens.
+"""
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import access_tokens
+from core.models import ContentVersion, Recipe, RefreshToken
+
+ACCESS_TOKEN_URL = reverse('user:access-token')
+REFRESH_URL = reverse('user:access-token-refresh')
+ME_URL = reverse('user:me')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+@override_settings(
+    ACCESS_TOKEN_KEYS={'k1': 'first-secret'},
+    ACCESS_TOKEN_SIGNING_KEY_ID='k1',
+)
+class AccessTokenTests(TestCase):
+    """Test access tokens are checked without the database"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'access@example.com',
+            'testpass123',
+            name='Access',
+        )
+        Recipe.objects.create(
+            user=self.user,
+            title='Curry',
+            time_minutes=10,
+            price=Decimal('5.00'),
+        )
+        self.client = APIClient()
+
+    def _tokens(self):
+        """Log in and return the tokens issued"""
+        res = self.client.post(ACCESS_TOKEN_URL, {
+            'email': 'access@example.com',
+            'password': 'testpass123',
+        })
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def _bearer(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_login_issues_tokens(self):
+        """Test logging in returns an access token and a refresh token"""
+        tokens = self._tokens()
+
+        self.assertEqual(tokens['token_type'], 'Bearer')
+        self.assertEqual(tokens['expires_in'], 300)
+        self.assertTrue(tokens['access'].startswith('k1.'))
+        self.assertEqual(RefreshToken.objects.get().user, self.user)
+        # Only the hash of the refresh token is stored.
+        self.assertFalse(
+            RefreshToken.objects.filter(key_hash=tokens['refresh']).exists())
+
+    def test_invalid_credentials(self):
+        """Test no token is issued for a wrong password"""
+        res = self.client.post(ACCESS_TOKEN_URL, {
+            'email': 'access@example.com',
+            'password': 'wrong',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn('access', res.data)
+
+    def test_authenticated_without_auth_query(self):
+        """Test the access token is verified without a query"""
+        self._bearer(self._tokens()['access'])
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('"authtoken_token"', sql)
+        self.assertNotIn('FROM "core_user"', sql)
+
+    def test_me_loads_user(self):
+        """Test the fields of the user are loaded when needed"""
+        self._bearer(self._tokens()['access'])
+
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['email'], 'access@example.com')
+        self.assertEqual(res.data['name'], 'Access')
+
+    def test_deactivated_user_cannot_update(self):
+        """Test without a shared cache, /me refuses deactivated users"""
+        self._bearer(self._tokens()['access'])
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.patch(ME_URL, {'name': 'Renamed'})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertEqual(self.user.name, 'Access')
+
+    def test_revoked_token_cannot_update(self):
+        """Test without a shared cache, /me refuses revoked tokens"""
+        self._bearer(self._tokens()['access'])
+        self.user.revoke_tokens()
+
+        res = self.client.patch(ME_URL, {'name': 'Renamed'})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.token_version, 1)
+        self.assertEqual(self.user.name, 'Access')
+
+    def test_deleted_user_rejected_by_me(self):
+        """Test /me refuses the access token of a deleted user"""
+        self._bearer(self._tokens()['access'])
+        self.user.delete()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_user_lists_nothing(self):
+        """Test the access token of a deleted user lists no recipes"""
+        self._bearer(self._tokens()['access'])
+        self.user.delete()
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [])
+        # No content version row is made for the missing user.
+        self.assertFalse(
+            ContentVersion.objects.filter(user_id=self.user.id).exists())
+
+    def test_tampered_token_rejected(self):
+        """Test a token whose payload was changed is refused"""
+        key_id, payload, signature = self._tokens()['access'].split('.')
+        other = access_tokens._encode(
+            b'{"uid":999,"ver":0,"exp":9999999999}')
+        self._bearer(f'{key_id}.{other}.{signature}')
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res['WWW-Authenticate'], 'Token')
+
+    def test_expired_token_rejected(self):
+        """Test access tokens stop working after ACCESS_TOKEN_LIFETIME"""
+        self._bearer(self._tokens()['access'])
+
+        with patch('core.access_tokens.time.time',
+                   return_value=time.time() + 301):
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_key_rotation(self):
+        """Test tokens signed with the previous key work until removed"""
+        old = self._tokens()['access']
+        rotated = {'k2': 'second-secret', 'k1': 'first-secret'}
+
+        with self.settings(
+                ACCESS_TOKEN_KEYS=rotated, ACCESS_TOKEN_SIGNING_KEY_ID='k2'):
+            new = self._tokens()['access']
+            self._bearer(old)
+            old_res = self.client.get(RECIPES_URL)
+        with self.settings(
+                ACCESS_TOKEN_KEYS={'k2': 'second-secret'},
+                ACCESS_TOKEN_SIGNING_KEY_ID='k2'):
+            self._bearer(new)
+            new_res = self.client.get(RECIPES_URL)
+            self._bearer(old)
+            retired_res = self.client.get(RECIPES_URL)
+
+        self.assertTrue(new.startswith('k2.'))
+        self.assertEqual(old_res.status_code, status.HTTP_200_OK)
+        self.assertEqual(new_res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            retired_res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_rotates_tokens(self):
+        """Test a refresh token is exchanged once for new tokens"""
+        refresh = self._tokens()['refresh']
+
+        res = self.client.post(REFRESH_URL, {'refresh': refresh})
+        again = self.client.post(REFRESH_URL, {'refresh': refresh})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res.data['refresh'], refresh)
+        self._bearer(res.data['access'])
+        self.assertEqual(
+            self.client.get(RECIPES_URL).status_code, status.HTTP_200_OK)
+        self.assertEqual(again.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_expired_refresh_token_rejected(self):
+        """Test refresh tokens stop working after REFRESH_TOKEN_LIFETIME"""
+        refresh = self._tokens()['refresh']
+        RefreshToken.objects.update(expires_at=timezone.now())
+
+        res = self.client.post(REFRESH_URL, {'refresh': refresh})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_revoked_refresh_token_rejected(self):
+        """Test bumping the token version revokes refresh tokens"""
+        refresh = self._tokens()['refresh']
+        RefreshToken.objects.create(
+            key_hash='0' * 64,
+            user=self.user,
+            token_version=0,
+            expires_at=timezone.now() + timedelta(days=1),
+        )
+
+        self.user.revoke_tokens()
+        res = self.client.post(REFRESH_URL, {'refresh': refresh})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(RefreshToken.objects.exists())
+
+    @override_settings(TOKEN_AUTH_SHARED_CACHE='default')
+    def test_revoked_access_token_rejected(self):
+        """Test with a shared cache, revoking applies to access tokens"""
+        caches['default'].clear()
+        self._bearer(self._tokens()['access'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.revoke_tokens()
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(TOKEN_AUTH_SHARED_CACHE='default')
+    def test_password_change_revokes_access_tokens(self):
+        """Test changing the password revokes the access tokens"""
+        caches['default'].clear()
+        self._bearer(self._tokens()['access'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.patch(ME_URL, {'password': 'newpass123'})
+        after = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(after.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('newpass123'))
+        self.assertEqual(self.user.name, 'Access')
+
+    @override_settings(TOKEN_AUTH_SHARED_CACHE='default')
+    def test_deactivated_user_rejected(self):
+        """Test with a shared cache, deactivation applies at once"""
+        caches['default'].clear()
+        self._bearer(self._tokens()['access'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_database_tokens_still_work(self):
+        """Test the database token flow works alongside access tokens"""
+        self._tokens()
+        res = self.client.post(reverse('user:token'), {
+            'email': 'access@example.com',
+            'password': 'testpass123',
+        })
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {res.data["token"]}')
+
+        self.assertEqual(
+            self.client.get(RECIPES_URL).status_code, status.HTTP_200_OK)
+
+    def test_clear_expired_tokens(self):
+        """Test expired refresh tokens are deleted"""
+        self._tokens()
+        self._tokens()
+        RefreshToken.objects.filter(
+            pk=RefreshToken.objects.first().pk
+        ).update(expires_at=timezone.now())
+        out = StringIO()
+
+        call_command('clear_expired_tokens', stdout=out)
+
+        self.assertEqual(RefreshToken.objects.count(), 1)
+        self.assertIn('Deleted 1 expired refresh tokens', out.getvalue())
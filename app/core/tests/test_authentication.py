@@ -0,0 +1,162 @@
+"""
+Tests for the cached token authentication.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.authentication import CACHE_KEY_PREFIX, cache_key, token_cache
+
+ME_URL = reverse('user:me')
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test tokens are checked against the database once per TTL"""
+
+    def setUp(self):
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+        self.user = get_user_model().objects.create_user(
+            'auth@example.com',
+            'testpass123',
+            name='Auth',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def _me(self):
+        """Fetch the profile of the authenticated user"""
+        return self.client.get(ME_URL)
+
+    def test_second_request_without_queries(self):
+        """Test a recently seen token is accepted without a query"""
+        # The token and its user, then the user row /me reads.
+        with self.assertNumQueries(2):
+            self._me()
+        with self.assertNumQueries(1):
+            res = self._me()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_invalid_token_rejected(self):
+        """Test unknown tokens are refused and not cached"""
+        self.client.credentials(HTTP_AUTHORIZATION='Token wrong')
+
+        res = self._me()
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIsNone(token_cache.get(cache_key('wrong')))
+
+    @override_settings(TOKEN_AUTH_CACHE_TTL=0)
+    def test_entries_expire(self):
+        """Test the token is checked again once its entry expired"""
+        self._me()
+
+        with self.assertNumQueries(2):
+            self._me()
+
+    @override_settings(TOKEN_AUTH_CACHE_SIZE=1)
+    def test_least_recently_used_evicted(self):
+        """Test the cache holds at most TOKEN_AUTH_CACHE_SIZE tokens"""
+        other = APIClient()
+        other.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(
+            user=get_user_model().objects.create_user(
+                'other@example.com', 'testpass123')).key)
+        self._me()
+        other.get(ME_URL)
+
+        with self.assertNumQueries(2):
+            self._me()
+
+    def test_deleted_token_rejected(self):
+        """Test a deleted token stops working at once"""
+        self._me()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        res = self._me()
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """Test a deactivated user stops being authenticated at once"""
+        self._me()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        res = self._me()
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_reloads_user(self):
+        """Test the user is read again after changing the password"""
+        self._me()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.patch(ME_URL, {'password': 'newpass123'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(2):
+            self._me()
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('newpass123'))
+
+    def test_update_uses_current_row(self):
+        """Test updating the profile doesn't write back the cached copy"""
+        self._me()
+        # Changed without the signals, as by a process whose copy of the
+        # token is still cached here.
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            password=make_password('newpass123'))
+
+        res = self.client.patch(ME_URL, {'name': 'Renamed'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.name, 'Renamed')
+        self.assertTrue(self.user.check_password('newpass123'))
+
+    def test_inactive_user_cannot_update(self):
+        """Test a cached copy of a deactivated user can't update it"""
+        self._me()
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            is_active=False)
+
+        res = self.client.patch(ME_URL, {'name': 'Renamed'})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertEqual(self.user.name, 'Auth')
+
+    @override_settings(TOKEN_AUTH_SHARED_CACHE='default')
+    def test_shared_cache(self):
+        """Test tokens seen by another process are accepted too"""
+        caches['default'].clear()
+        self._me()
+        # As in another process, which only has the shared cache.
+        token_cache.clear()
+
+        with self.assertNumQueries(1):
+            res = self._me()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        # Password hashes aren't copied into the shared cache.
+        snapshot = caches['default'].get(
+            CACHE_KEY_PREFIX + cache_key(self.token.key))
+        self.assertNotIn(self.user.password, snapshot[1])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        token_cache.clear()
+        res = self._me()
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
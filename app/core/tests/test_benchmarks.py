@@ -0,0 +1,191 @@
+"""
+Test the benchmark management commands.
+"""
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+from core.management.commands.benchmark_endpoints import compare
+
+
+class BenchmarkCommandTests(TestCase):
+    """Test benchmark commands run end to end on a small dataset"""
+
+    def test_benchmark_pagination(self):
+        """Test the pagination benchmark reports every depth"""
+        out = StringIO()
+
+        call_command(
+            'benchmark_pagination',
+            rows=40,
+            page_size=5,
+            repeat=2,
+            in_place=True,
+            stdout=out,
+        )
+
+        lines = out.getvalue().splitlines()
+        self.assertIn('Seeding 40 recipes...', lines)
+        # A header plus one line per depth.
+        self.assertEqual(len(lines), 7)
+
+    def test_benchmark_search(self):
+        """Test the search benchmark reports every term"""
+        out = StringIO()
+
+        call_command(
+            'benchmark_search',
+            recipes=50,
+            repeat=2,
+            in_place=True,
+            stdout=out,
+        )
+
+        lines = out.getvalue().splitlines()
+        self.assertIn('Seeding 50 recipes...', lines)
+        self.assertEqual(len(lines), 6)
+
+    def test_benchmark_serialization(self):
+        """Test the serialization benchmark reports both paths"""
+        out = StringIO()
+
+        call_command(
+            'benchmark_serialization',
+            recipes=30,
+            repeat=1,
+            in_place=True,
+            stdout=out,
+        )
+
+        output = out.getvalue()
+        self.assertIn('serializer', output)
+        self.assertIn('values', output)
+        self.assertEqual(output.count('rows/sec'), 2)
+
+    def test_benchmark_bulk(self):
+        """Test the bulk benchmark reports both ways of creating"""
+        out = StringIO()
+
+        call_command(
+            'benchmark_bulk',
+            recipes=20,
+            in_place=True,
+            stdout=out,
+        )
+
+        output = out.getvalue()
+        self.assertIn('single posts', output)
+        self.assertIn('bulk post', output)
+        self.assertEqual(output.count('recipes/sec'), 2)
+
+    @override_settings(PASSWORD_HASH_ITERATIONS=1000)
+    def test_benchmark_login_storm(self):
+        """Test the login storm benchmark reports every scenario"""
+        out = StringIO()
+
+        call_command(
+            'benchmark_login_storm',
+            recipes=5,
+            repeat=2,
+            logins=2,
+            in_place=True,
+            stdout=out,
+        )
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[1].startswith('no logins'))
+        self.assertTrue(lines[2].startswith('logins, unbounded'))
+
+    def _benchmark_endpoints(self, **options):
+        """Run the endpoint benchmark on a tiny dataset"""
+        out = StringIO()
+        call_command(
+            'benchmark_endpoints',
+            users=3,
+            recipes_per_user=5,
+            repeat=2,
+            warmup=1,
+            endpoint=['recipe-list', 'recipe-create', 'health-check'],
+            in_place=True,
+            stdout=out,
+            **options
+        )
+        return out.getvalue()
+
+    def test_benchmark_endpoints(self):
+        """Test the endpoint benchmark writes results for each endpoint"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'results.json')
+
+            output = self._benchmark_endpoints(output=path)
+
+            with open(path, encoding='utf-8') as f:
+                results = json.load(f)
+        self.assertEqual(
+            set(results['endpoints']),
+            {'recipe-list', 'recipe-create', 'health-check'},
+        )
+        for name, result in results['endpoints'].items():
+            self.assertIn(name, output)
+            self.assertGreater(result['p50'], 0)
+            self.assertGreater(result['peak_kib'], 0)
+        self.assertEqual(results['endpoints']['health-check']['queries'], 0)
+        self.assertGreater(
+            results['endpoints']['recipe-list']['queries'], 0)
+
+    def test_benchmark_endpoints_compare(self):
+        """Test comparing with a baseline fails on regressions"""
+        results = {'endpoints': {'recipe-list': {
+            'p50': 1000.0, 'p95': 1000.0, 'queries': 50,
+            'peak_kib': 10 ** 6,
+        }}}
+        self.assertEqual(compare(results, results, 0.2), [])
+
+        baseline = {'endpoints': {'recipe-list': {
+            'p50': 1000.0, 'p95': 1000.0, 'queries': 1, 'peak_kib': 10,
+        }}}
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'baseline.json')
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(baseline, f)
+
+            with self.assertRaisesMessage(CommandError, 'recipe-list'):
+                self._benchmark_endpoints(compare=path)
+
+    def test_compare_ignores_noise(self):
+        """Test small changes and changes within the threshold pass"""
+        baseline = {'endpoints': {'tag-list': {
+            'p50': 0.2, 'p95': 10.0, 'queries': 3, 'peak_kib': 100,
+        }}}
+        results = {'endpoints': {'tag-list': {
+            'p50': 0.6, 'p95': 11.5, 'queries': 3, 'peak_kib': 150,
+        }}}
+        self.assertEqual(compare(results, baseline, 0.2), [])
+
+        results['endpoints']['tag-list']['queries'] = 4
+        self.assertEqual(
+            compare(results, baseline, 0.2), ['tag-list queries: 3.0 -> 4.0'])
+
+    def test_benchmark_image_variants(self):
+        """Test the image variant benchmark reports each worker count"""
+        out = StringIO()
+
+        call_command(
+            'benchmark_image_variants',
+            images=2,
+            width=400,
+            height=300,
+            workers='1,2',
+            stdout=out,
+        )
+
+        lines = out.getvalue().splitlines()
+        # A description, a header plus one line per worker count.
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(lines[-1].split()[0], '2')
@@ -0,0 +1,109 @@
+"""
+Test the explain_queries command and the indexes it is meant to watch.
+"""
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+
+from core.models import Recipe, Tag, Ingredient
+
+
+class ExplainQueriesTests(TestCase):
+    """Test printing query plans for the API endpoints"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'plans@example.com',
+            'testpass123'
+        )
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title='Curry',
+            time_minutes=10,
+            price=Decimal('5.00'),
+        )
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Dinner'))
+        recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Rice'))
+
+    def test_explain_every_endpoint(self):
+        """Test a plan is printed for each endpoint query"""
+        out = StringIO()
+
+        call_command('explain_queries', self.user.email, stdout=out)
+
+        output = out.getvalue()
+        for label in ['recipe list', 'recipe detail', 'recipe search',
+                      'recipe list, filtered, match all', 'tag list',
+                      'ingredient list, assigned only']:
+            self.assertIn(f'== {label}:', output)
+        self.assertIn('cost=', output)
+        # Every endpoint answered successfully.
+        self.assertEqual(output.count('[200, '), output.count('== '))
+
+    def test_explain_analyze(self):
+        """Test --analyze reports actual timings"""
+        out = StringIO()
+
+        call_command(
+            'explain_queries', self.user.email, analyze=True, stdout=out)
+
+        self.assertIn('actual time=', out.getvalue())
+
+    def test_unknown_user(self):
+        """Test an unknown email is reported as an error"""
+        with self.assertRaises(CommandError):
+            call_command('explain_queries', 'nobody@example.com')
+
+
+class AccessPathIndexTests(TestCase):
+    """Test the composite indexes used by the API exist"""
+
+    def _index_columns(self, table):
+        """Return the column lists of the indexes on a table"""
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, table)
+        return [
+            (constraint['columns'], constraint['orders'])
+            for constraint in constraints.values()
+            if constraint['index']
+        ]
+
+    def test_recipe_user_id_index(self):
+        """Test recipes are indexed on (user_id, id DESC)"""
+        self.assertIn(
+            (['user_id', 'id'], ['ASC', 'DESC']),
+            self._index_columns('core_recipe'),
+        )
+
+    def test_tag_and_ingredient_user_name_index(self):
+        """Test tags and ingredients are uniquely indexed on (user_id, name)"""
+        for table in ['core_tag', 'core_ingredient']:
+            with connection.cursor() as cursor:
+                constraints = connection.introspection.get_constraints(
+                    cursor, table)
+            self.assertIn(
+                ['user_id', 'name'],
+                [
+                    constraint['columns']
+                    for constraint in constraints.values()
+                    if constraint['unique']
+                ],
+            )
+
+    def test_through_reverse_lookup_indexes(self):
+        """Test the through tables are indexed from the target side"""
+        self.assertIn(
+            (['tag_id', 'recipe_id'], ['ASC', 'ASC']),
+            self._index_columns('core_recipe_tags'),
+        )
+        self.assertIn(
+            (['ingredient_id', 'recipe_id'], ['ASC', 'ASC']),
+            self._index_columns('core_recipe_ingredients'),
+        )
@@ -0,0 +1,134 @@
+"""
+Tests for the gc_media command.
+"""
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+from core.management.commands.gc_media import walk_sorted
+from core.models import Recipe
+
+
+class GcMediaTests(TestCase):
+    """Test deleting unreferenced media files"""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.media_root = media_root.name
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = get_user_model().objects.create_user(
+            'gc@example.com',
+            'testpass123'
+        )
+
+    def _file(self, name, age=7200, size=10):
+        """Create a media file `age` seconds old"""
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(b'x' * size)
+        mtime = os.path.getmtime(path) - age
+        os.utime(path, (mtime, mtime))
+        return name
+
+    def _recipe(self, image, variants=None):
+        """Create a recipe referencing an image and its variants"""
+        return Recipe.objects.create(
+            user=self.user,
+            title='Curry',
+            time_minutes=10,
+            price=Decimal('5.00'),
+            image=image,
+            image_variants={'source': image, 'variants': variants or {}},
+        )
+
+    def _exists(self, name):
+        return os.path.exists(os.path.join(self.media_root, name))
+
+    def _gc(self, *args):
+        """Run the command and return its output"""
+        out = StringIO()
+        call_command('gc_media', *args, stdout=out)
+        return out.getvalue()
+
+    def test_unreferenced_files_deleted(self):
+        """Test only files no recipe references are deleted"""
+        source = self._file('uploads/recipe/ab/ab12.jpg')
+        thumbnail = self._file('uploads/recipe/ab/ab12-thumbnail.webp')
+        orphan = self._file('uploads/recipe/cd/cd34.jpg', size=2048)
+        replaced = self._file('uploads/recipe/ab/ab12-old.webp')
+        legacy = self._file('uploads/recipe/0a1b-uuid.jpg')
+        self._recipe(source, {'thumbnail': {
+            'width': 160, 'height': 120, 'webp': thumbnail}})
+
+        output = self._gc()
+
+        self.assertTrue(self._exists(source))
+        self.assertTrue(self._exists(thumbnail))
+        self.assertFalse(self._exists(orphan))
+        self.assertFalse(self._exists(replaced))
+        self.assertFalse(self._exists(legacy))
+        self.assertIn('Scanned 5 files', output)
+        self.assertIn('Deleted 3 files', output)
+
+    def test_recent_files_kept(self):
+        """Test files of uploads that may not have committed are kept"""
+        recent = self._file('uploads/recipe/ab/ab12.jpg', age=60)
+
+        self._gc('--min-age', '3600')
+
+        self.assertTrue(self._exists(recent))
+
+    def test_dry_run(self):
+        """Test a dry run reports the files without deleting them"""
+        orphan = self._file('uploads/recipe/ab/ab12.jpg')
+
+        output = self._gc('--dry-run')
+
+        self.assertTrue(self._exists(orphan))
+        self.assertIn('Would delete 1 files', output)
+
+    def test_batches(self):
+        """Test files are deleted and reported in batches"""
+        for i in range(5):
+            self._file(f'uploads/recipe/ab/ab{i}.jpg')
+
+        output = self._gc('--batch-size', '2')
+
+        self.assertEqual(output.count('files scanned'), 3)
+        self.assertEqual(
+            os.listdir(os.path.join(self.media_root, 'uploads/recipe/ab')),
+            [])
+
+    def test_other_directories_untouched(self):
+        """Test only files under the prefix are collected"""
+        chunk = self._file('uploads/chunks/1234/0')
+
+        self._gc()
+
+        self.assertTrue(self._exists(chunk))
+
+    def test_invalid_prefix(self):
+        """Test the whole media root can't be collected by mistake"""
+        with self.assertRaises(CommandError):
+            self._gc('--prefix', '/')
+
+    def test_walk_sorted(self):
+        """Test files are listed in the same order as names sort"""
+        for name in ['a-c', 'a/b', 'a/a', 'b', 'a.jpg']:
+            self._file(f'p/{name}')
+
+        names = [name for name, _ in walk_sorted(self.media_root, 'p')]
+
+        self.assertEqual(names, sorted(names))
+        self.assertEqual(len(names), 5)
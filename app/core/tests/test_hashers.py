@@ -0,0 +1,120 @@
+"""
+Tests for password hashing in the bounded pool.
+"""
+import threading
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.hashers import HashingBusy, hashing_pool
+
+TOKEN_URL = reverse('user:token')
+
+
+@override_settings(
+    PASSWORD_HASH_ITERATIONS=1000,
+    PASSWORD_HASHING_WORKERS=1,
+    PASSWORD_HASHING_QUEUE=0,
+)
+class HashingPoolTests(TestCase):
+    """Test passwords are hashed by a bounded number of threads"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'hash@example.com',
+            'testpass123',
+        )
+        self.client = APIClient()
+
+    def _occupy_pool(self):
+        """Keep the only worker busy until the test ends"""
+        started = threading.Event()
+        release = threading.Event()
+
+        def wait():
+            started.set()
+            release.wait()
+
+        thread = threading.Thread(target=hashing_pool.run, args=(wait,))
+        thread.start()
+        started.wait()
+        self.addCleanup(thread.join)
+        self.addCleanup(release.set)
+
+    def test_hashed_in_pool(self):
+        """Test passwords are hashed by the pool's threads"""
+        names = []
+
+        def record(*args):
+            names.append(threading.current_thread().name)
+
+        hashing_pool.run(record)
+        encoded = make_password('testpass123')
+
+        self.assertTrue(names[0].startswith('password-hashing'))
+        self.assertTrue(encoded.startswith('pbkdf2_sha256$1000$'))
+
+    def test_saturated_pool_rejects(self):
+        """Test hashes are refused at once while the pool is full"""
+        self._occupy_pool()
+        rejected = hashing_pool.stats()['rejected']
+
+        with self.assertRaises(HashingBusy), \
+                self.assertLogs('core.hashers', 'WARNING'):
+            make_password('testpass123')
+
+        self.assertEqual(hashing_pool.stats()['rejected'], rejected + 1)
+        self.assertEqual(hashing_pool.stats()['running'], 1)
+
+    def test_login_throttled(self):
+        """Test logins get a 429 while the pool is full"""
+        self._occupy_pool()
+
+        with self.assertLogs('core.hashers', 'WARNING'):
+            res = self.client.post(TOKEN_URL, {
+                'email': 'hash@example.com',
+                'password': 'testpass123',
+            })
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res['Retry-After'], '1')
+
+    def test_signup_throttled(self):
+        """Test no user is created when its password can't be hashed"""
+        self._occupy_pool()
+
+        with self.assertLogs('core.hashers', 'WARNING'):
+            res = self.client.post(reverse('user:create'), {
+                'email': 'new@example.com',
+                'password': 'testpass123',
+                'name': 'New',
+            })
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertFalse(
+            get_user_model().objects.filter(email='new@example.com').exists())
+
+    @override_settings(PASSWORD_HASHING_WORKERS=0)
+    def test_without_workers(self):
+        """Test hashes are computed in the caller without workers"""
+        self._occupy_pool()
+
+        self.assertTrue(make_password('testpass123'))
+
+    def test_hash_upgraded_on_login(self):
+        """Test a changed iteration count applies at the next login"""
+        with self.settings(PASSWORD_HASH_ITERATIONS=2000):
+            res = self.client.post(TOKEN_URL, {
+                'email': 'hash@example.com',
+                'password': 'testpass123',
+            })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$2000$'))
+        self.assertTrue(self.user.check_password('testpass123'))
@@ -1,6 +1,7 @@
 """
 Tests for the health check API
 """
+from django.contrib.auth import get_user_model
 from django.test import TestCase
 from django.urls import reverse
 
@@ -25,3 +26,21 @@ class HealthCheckTests(TestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data, {'status': 'ok'})
+
+    def test_health_check_staff(self):
+        """
+        Test staff also get the load of the password hashing pool
+        """
+        user = get_user_model().objects.create_user(
+            'staff@example.com',
+            'testpass123',
+        )
+        user.is_staff = True
+        user.save()
+        self.client.force_authenticate(user)
+
+        response = self.client.get(reverse('health-check'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'ok')
+        self.assertIn('queued', response.data['password_hashing'])
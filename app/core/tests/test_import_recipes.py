@@ -0,0 +1,253 @@
+"""
+Test the import_recipes management command.
+"""
+import json
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.loader import RecipeLoader
+from core.models import (
+    ContentVersion,
+    ImportCheckpoint,
+    Recipe,
+    Tag,
+    Ingredient
+)
+
+
+def recipe_record(i, **params):
+    """Return an NDJSON record for a recipe"""
+    record = {
+        'title': f'Imported {i}',
+        'description': f'Tab\there, new\nline and back\\slash {i}',
+        'time_minutes': i,
+        'price': '3.50',
+        'tags': [{'name': 'Thai'}, {'name': f'Tag {i % 3}'}],
+        'ingredients': [{'name': 'Rice'}, {'name': 'Rice'}],
+    }
+    record.update(params)
+    return record
+
+
+class ImportRecipesTests(TestCase):
+    """Test importing recipes from files"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'import@example.com',
+            'testpass123'
+        )
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def _write(self, name, content):
+        """Write a file to import and return its path"""
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def _write_ndjson(self, records):
+        """Write records as NDJSON"""
+        return self._write(
+            'recipes.ndjson',
+            ''.join(json.dumps(record) + '\n' for record in records)
+        )
+
+    def _import(self, path, **options):
+        """Run the command and return its output"""
+        out = StringIO()
+        options.setdefault('user', self.user.email)
+        call_command('import_recipes', path, stdout=out, **options)
+        return out.getvalue()
+
+    def _check_imported(self, count):
+        """Check `count` records were imported with their relations"""
+        recipes = Recipe.objects.filter(user=self.user).order_by('id')
+        self.assertEqual(recipes.count(), count)
+        recipe = recipes[1]
+        self.assertEqual(recipe.title, 'Imported 1')
+        self.assertEqual(
+            recipe.description, 'Tab\there, new\nline and back\\slash 1')
+        self.assertEqual(recipe.price, Decimal('3.50'))
+        self.assertEqual(
+            sorted(tag.name for tag in recipe.tags.all()), ['Tag 1', 'Thai'])
+        self.assertEqual(
+            [ingredient.name for ingredient in recipe.ingredients.all()],
+            ['Rice']
+        )
+        # Names are stored once per user however often they are used.
+        self.assertEqual(
+            sorted(Tag.objects.filter(user=self.user).values_list(
+                'name', flat=True)),
+            ['Tag 0', 'Tag 1', 'Tag 2', 'Thai'][:min(count, 3) + 1]
+        )
+        self.assertEqual(
+            Ingredient.objects.filter(user=self.user).count(), 1)
+
+    def test_import_ndjson(self):
+        """Test importing NDJSON with COPY"""
+        path = self._write_ndjson(recipe_record(i) for i in range(10))
+
+        out = self._import(path, batch_size=4)
+
+        self._check_imported(10)
+        self.assertIn('Imported 10 recipes', out)
+        # One progress line per batch.
+        self.assertIn('4 records', out)
+        self.assertIn('8 records', out)
+
+    def test_import_without_copy(self):
+        """Test importing with bulk_create()"""
+        path = self._write_ndjson(recipe_record(i) for i in range(10))
+
+        self._import(path, batch_size=4, no_copy=True)
+
+        self._check_imported(10)
+
+    def test_import_keeps_existing_names(self):
+        """Test existing tags are reused rather than duplicated"""
+        thai = Tag.objects.create(user=self.user, name='Thai')
+        other_user = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123'
+        )
+        Tag.objects.create(user=other_user, name='Tag 1')
+        path = self._write_ndjson(recipe_record(i) for i in range(3))
+
+        self._import(path)
+
+        self.assertEqual(Tag.objects.get(user=self.user, name='Thai'), thai)
+        self.assertEqual(thai.recipe_set.count(), 3)
+        self._check_imported(3)
+
+    def test_import_searchable_and_versioned(self):
+        """Test imported recipes are searchable and change the version"""
+        before = ContentVersion.objects.get(user=self.user).version
+        path = self._write_ndjson(
+            [recipe_record(0, title='Green curry')] +
+            [recipe_record(i) for i in range(1, 3)]
+        )
+
+        self._import(path)
+
+        self.assertGreater(
+            ContentVersion.objects.get(user=self.user).version, before)
+        self.assertTrue(Recipe.objects.filter(
+            user=self.user, search_vector='curry').exists())
+
+    def test_export_round_trip(self):
+        """Test the CSV and NDJSON exports can be imported"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = reverse('recipe:recipe-list')
+        for i in range(3):
+            client.post(url, recipe_record(i), format='json')
+        target = get_user_model().objects.create_user(
+            'target@example.com',
+            'testpass123'
+        )
+
+        for export_format in ['ndjson', 'csv']:
+            res = client.get(
+                reverse('recipe:recipe-export'),
+                {'export_format': export_format}
+            )
+            path = self._write(
+                f'export.{export_format}',
+                b''.join(res.streaming_content).decode()
+            )
+            self._import(path, user=target.email)
+
+        fields = ['title', 'description', 'time_minutes', 'price', 'link']
+        expected = list(Recipe.objects.filter(
+            user=self.user).order_by('id').values(*fields))
+        self.assertEqual(
+            list(Recipe.objects.filter(
+                user=target).order_by('id').values(*fields)),
+            expected * 2
+        )
+        self.assertEqual(
+            sorted(Tag.objects.filter(user=target).values_list(
+                'name', flat=True)),
+            ['Tag 0', 'Tag 1', 'Tag 2', 'Thai']
+        )
+
+    def test_records_name_their_user(self):
+        """Test records can belong to different users"""
+        other_user = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123'
+        )
+        path = self._write_ndjson([
+            recipe_record(0),
+            recipe_record(1, user=other_user.email),
+        ])
+
+        self._import(path)
+
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(Recipe.objects.filter(user=other_user).count(), 1)
+        self.assertTrue(Tag.objects.filter(
+            user=other_user, name='Tag 1').exists())
+
+    def test_invalid_record(self):
+        """Test an invalid record stops the import with its number"""
+        path = self._write_ndjson(
+            [recipe_record(0), recipe_record(1, price='12345.678')])
+
+        with self.assertRaisesMessage(CommandError, 'Record 2'):
+            self._import(path)
+
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_resume_after_failure(self):
+        """Test a failed import resumes after the last committed batch"""
+        path = self._write_ndjson(recipe_record(i) for i in range(10))
+        load = RecipeLoader.load
+        calls = []
+
+        def failing_load(loader, records):
+            calls.append(len(records))
+            if len(calls) == 3:
+                raise RuntimeError('Connection lost')
+            return load(loader, records)
+
+        with patch.object(RecipeLoader, 'load', failing_load):
+            with self.assertRaises(RuntimeError):
+                self._import(path, batch_size=3)
+
+        self.assertEqual(Recipe.objects.count(), 6)
+        self.assertEqual(
+            ImportCheckpoint.objects.get(source=path).records, 6)
+
+        out = self._import(path, batch_size=3)
+
+        self.assertIn('Resuming after 6 records', out)
+        self.assertIn('Imported 4 recipes', out)
+        self._check_imported(10)
+        self.assertEqual(
+            list(Recipe.objects.order_by('id').values_list(
+                'time_minutes', flat=True)),
+            list(range(10))
+        )
+
+    def test_restart(self):
+        """Test --restart imports the file again from the start"""
+        path = self._write_ndjson(recipe_record(i) for i in range(2))
+        self._import(path)
+
+        self._import(path, restart=True)
+
+        self.assertEqual(Recipe.objects.count(), 4)
@@ -1,7 +1,6 @@
 """
 Tests for models.
 """
-from unittest.mock import patch
 from decimal import Decimal
 
 from django.test import TestCase
@@ -100,14 +99,12 @@ class ModelTests(TestCase):
 
         self.assertEqual(str(ingredient), ingredient.name)
 
-    @patch('core.models.uuid.uuid4')
-    def test_recipe_file_name_uuid(self, mock_uuid):
+    def test_recipe_file_path(self):
         """
         Test that image is saved in the correct location.
         """
-        uuid = 'test-uuid'
-        mock_uuid.return_value = uuid
-        file_path = models.recipe_image_file_path(None, 'myimage.jpg')
+        file_path = models.recipe_image_file_path(None, 'myimage.JPG')
 
-        expected_path = f'uploads/recipe/{uuid}.jpg'
+        # The storage replaces the name with a hash of the content.
+        expected_path = 'uploads/recipe/image.jpg'
         self.assertEqual(file_path, expected_path)
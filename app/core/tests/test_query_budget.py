@@ -0,0 +1,120 @@
+"""
+Tests for the query budget test harness.
+"""
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.http import HttpResponse
+from django.test import TestCase
+
+from core.models import Tag
+from core.tests.query_budget import (
+    RECORD_ENV,
+    QueryBudget,
+    QueryBudgetMixin,
+    fingerprint,
+)
+
+
+class FingerprintTests(TestCase):
+    """Test normalizing SQL statements"""
+
+    def test_literals_are_replaced(self):
+        """Test numbers, strings and lists of values are normalized"""
+        sql = (
+            'SELECT "core_tag"."id" FROM "core_tag" '
+            'WHERE ("core_tag"."name" = \'It\'\'s\'   AND '
+            '"core_tag"."user_id" IN (1, 22, 333)) LIMIT 21'
+        )
+
+        self.assertEqual(
+            fingerprint(sql),
+            'SELECT "core_tag"."id" FROM "core_tag" '
+            'WHERE ("core_tag"."name" = ? AND '
+            '"core_tag"."user_id" IN (...)) LIMIT ?'
+        )
+
+    def test_rows_and_names_are_replaced(self):
+        """Test multi-row inserts and savepoint names are normalized"""
+        self.assertEqual(
+            fingerprint('INSERT INTO "t" ("a", "b") VALUES (1, 2), (3, 4)'),
+            'INSERT INTO "t" ("a", "b") VALUES (...)'
+        )
+        self.assertEqual(
+            fingerprint('SAVEPOINT "s140231_x12"'), 'SAVEPOINT "s?"')
+
+    def test_identifiers_are_kept(self):
+        """Test digits inside identifiers are left alone"""
+        sql = 'SELECT U0."id" FROM "core_recipe" U0 WHERE U0."id" = 5'
+
+        self.assertEqual(
+            fingerprint(sql),
+            'SELECT U0."id" FROM "core_recipe" U0 WHERE U0."id" = ?'
+        )
+
+
+class QueryBudgetMixinTests(QueryBudgetMixin, TestCase):
+    """Test checking actions against their budgets"""
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.snapshot_dir = tmpdir.name
+
+    def _prepare(self, queries):
+        """Return a prepare function issuing queries(n) queries"""
+        def prepare(n):
+            def send():
+                for _ in range(queries(n)):
+                    Tag.objects.exists()
+                return HttpResponse()
+            return send
+        return prepare
+
+    def _record(self, name, prepare, budget=QueryBudget(10)):
+        """Check an action, recording its snapshot"""
+        with patch.dict(os.environ, {RECORD_ENV: '1'}):
+            self.assertQueryBudget(name, budget, prepare)
+
+    def test_within_budget(self):
+        """Test a constant number of queries passes once recorded"""
+        prepare = self._prepare(lambda n: 2)
+        self._record('constant', prepare)
+
+        self.assertQueryBudget('constant', QueryBudget(2), prepare)
+
+        with open(os.path.join(self.snapshot_dir, 'constant.sql')) as f:
+            self.assertEqual(f.read().count('SELECT'), 2)
+
+    def test_over_budget(self):
+        """Test more queries than the budget fails"""
+        prepare = self._prepare(lambda n: 3)
+        self._record('over', prepare)
+
+        with self.assertRaisesMessage(AssertionError, 'issued 3 queries'):
+            self.assertQueryBudget('over', QueryBudget(2), prepare)
+
+    def test_queries_growing_with_n(self):
+        """Test N+1 queries fail unless the budget allows them"""
+        prepare = self._prepare(lambda n: n + 1)
+        self._record('per_item', prepare, QueryBudget(1, per_item=1))
+
+        with self.assertRaisesMessage(AssertionError, 'grow with'):
+            self.assertQueryBudget('per_item', QueryBudget(20), prepare)
+        self.assertQueryBudget(
+            'per_item', QueryBudget(1, per_item=1), prepare)
+
+    def test_snapshot_diff(self):
+        """Test a changed statement shows up in a diff"""
+        self._record('changed', self._prepare(lambda n: 1))
+
+        with self.assertRaisesMessage(AssertionError, '+SELECT'):
+            self.assertQueryBudget(
+                'changed', QueryBudget(2), self._prepare(lambda n: 2))
+
+    def test_missing_snapshot(self):
+        """Test an action without a snapshot fails"""
+        with self.assertRaisesMessage(AssertionError, RECORD_ENV):
+            self.assertQueryBudget(
+                'missing', QueryBudget(2), self._prepare(lambda n: 1))
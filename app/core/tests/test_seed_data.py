@@ -0,0 +1,81 @@
+"""
+Test the seed_data management command.
+"""
+from collections import Counter
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from core.models import Recipe, Tag
+
+
+class SeedDataTests(TestCase):
+    """Test generating synthetic data"""
+
+    def _seed(self, **options):
+        """Run the command and return its output"""
+        out = StringIO()
+        options.setdefault('users', 20)
+        options.setdefault('recipes_per_user', 10)
+        options.setdefault('tags', 30)
+        options.setdefault('ingredients', 50)
+        options.setdefault('batch_size', 50)
+        call_command('seed_data', stdout=out, **options)
+        return out.getvalue()
+
+    def _snapshot(self, prefix):
+        """Return the generated recipes of a run, without ids"""
+        recipes = Recipe.objects.filter(
+            user__email__startswith=prefix).order_by('id')
+        return [
+            (recipe.user.name.removeprefix(prefix), recipe.title,
+             recipe.price, sorted(tag.name for tag in recipe.tags.all()))
+            for recipe in recipes.select_related('user').prefetch_related(
+                'tags')
+        ]
+
+    def test_seed_data(self):
+        """Test users and recipes are created with their relations"""
+        output = self._seed()
+
+        users = get_user_model().objects.filter(email__startswith='seed')
+        self.assertEqual(users.count(), 20)
+        recipes = Recipe.objects.filter(user__in=users)
+        self.assertIn(
+            f'Seeded 20 users and {recipes.count()} recipes', output)
+        self.assertGreater(recipes.count(), 0)
+        self.assertTrue(users[0].check_password('password'))
+        self.assertTrue(Tag.objects.filter(user__in=users).exists())
+
+    def test_same_seed_same_data(self):
+        """Test a seed always generates the same data"""
+        self._seed(seed=7, email_prefix='first')
+        self._seed(seed=7, email_prefix='second')
+        self._seed(seed=8, email_prefix='third')
+
+        first = self._snapshot('first')
+        self.assertEqual(first, self._snapshot('second'))
+        self.assertNotEqual(first, self._snapshot('third'))
+
+    def test_distributions_are_skewed(self):
+        """Test a few tags and users account for most of the data"""
+        self._seed(users=50, recipes_per_user=20)
+
+        tags = Counter(
+            Recipe.tags.through.objects.values_list('tag__name', flat=True))
+        counts = [count for _, count in tags.most_common()]
+        self.assertGreater(counts[0], 5 * counts[-1])
+        recipes = sorted(Counter(
+            Recipe.objects.values_list('user_id', flat=True)).values())
+        # The busiest users own far more than the median one.
+        self.assertGreater(recipes[-1], 3 * recipes[len(recipes) // 2])
+
+    def test_existing_users(self):
+        """Test seeding twice with the same prefix fails early"""
+        self._seed(users=2)
+
+        with self.assertRaises(CommandError):
+            self._seed(users=2)
@@ -0,0 +1,56 @@
+"""
+Tests for the content addressed image storage.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase
+
+from core.storage import ContentAddressedStorage
+
+
+class ContentAddressedStorageTests(SimpleTestCase):
+    """Test files are stored once, named after their content"""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.storage = ContentAddressedStorage(location=media_root.name)
+
+    def test_named_after_content(self):
+        """Test the name is the SHA-256 of the content"""
+        digest = hashlib.sha256(b'photo').hexdigest()
+
+        name = self.storage.save(
+            'uploads/recipe/image.JPG', ContentFile(b'photo'))
+
+        self.assertEqual(name, f'uploads/recipe/{digest[:2]}/{digest}.jpg')
+        with self.storage.open(name) as f:
+            self.assertEqual(f.read(), b'photo')
+
+    def test_identical_content_stored_once(self):
+        """Test saving the same bytes again reuses the stored file"""
+        first = self.storage.save(
+            'uploads/recipe/image.jpg', ContentFile(b'photo'))
+        second = self.storage.save(
+            'uploads/recipe/image.jpg', ContentFile(b'photo'))
+        other = self.storage.save(
+            'uploads/recipe/image.jpg', ContentFile(b'other photo'))
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        directory = os.path.dirname(self.storage.path(first))
+        # No temporary files are left behind.
+        self.assertEqual(os.listdir(directory), [os.path.basename(first)])
+
+    def test_reuse_refreshes_age(self):
+        """Test a reused file counts as new for garbage collection"""
+        name = self.storage.save(
+            'uploads/recipe/image.jpg', ContentFile(b'photo'))
+        os.utime(self.storage.path(name), (0, 0))
+
+        self.storage.save('uploads/recipe/image.jpg', ContentFile(b'photo'))
+
+        self.assertGreater(os.path.getmtime(self.storage.path(name)), 0)
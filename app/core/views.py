@@ -1,13 +1,27 @@
 """
 Core view for app.
 """
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, authentication_classes
 from rest_framework.response import Response
 
+from core.authentication import (
+    AccessTokenAuthentication,
+    CachedTokenAuthentication,
+)
+from core.hashers import hashing_pool
+
 
 @api_view(['GET'])
+@authentication_classes([
+    CachedTokenAuthentication,
+    AccessTokenAuthentication,
+])
 def health_check(request):
     """
-    Health check endpoint
+    Health check endpoint. Staff also get the load of the password
+    hashing pool of the process that answers
     """
-    return Response({'status': 'ok'})
+    data = {'status': 'ok'}
+    if request.user.is_staff:
+        data['password_hashing'] = hashing_pool.stats()
+    return Response(data)
@@ -0,0 +1,112 @@
+"""
+Per-user cache of rendered list responses for the recipe API
+"""
+import functools
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from recipe.conditional import content_version
+
+HITS_KEY = 'response-cache:hits'
+MISSES_KEY = 'response-cache:misses'
+
+
+def _cache():
+    """Return the cache backend responses are stored in"""
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def _count(key):
+    """Increment a hit/miss counter shared by every process"""
+    cache = _cache()
+    # add() is a no-op if the counter exists, incr() is atomic on the
+    # shared backends (Redis, memcached).
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr().
+        cache.add(key, 1, timeout=None)
+
+
+def response_cache_stats():
+    """Return the number of cache hits and misses so far"""
+    cache = _cache()
+    return {
+        'hits': cache.get(HITS_KEY, 0),
+        'misses': cache.get(MISSES_KEY, 0),
+    }
+
+
+def reset_response_cache_stats():
+    """Set the hit and miss counters back to zero"""
+    _cache().delete_many([HITS_KEY, MISSES_KEY])
+
+
+def response_key(view, request):
+    """
+    Cache key for a list response.
+
+    The user's content version is part of the key: every write to their
+    recipes, tags or ingredients (including tag/ingredient links) bumps
+    it through signals, so older entries are never looked up again and
+    simply expire.
+    """
+    version = content_version(request)
+    # Normalize the query string so ?a=1&b=2 and ?b=2&a=1 share an entry.
+    params = sorted(
+        (name, value)
+        for name, values in request.query_params.lists()
+        for value in values
+    )
+    key = '|'.join([
+        str(version.user_id),
+        str(version.version),
+        view.basename,
+        view.action,
+        repr(params),
+        # JSON and the browsable API render the same data differently.
+        request.accepted_media_type or '',
+    ])
+    return 'response:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def cache_response(view_method):
+    """
+    Serve a viewset action from the response cache, storing the rendered
+    bytes of successful responses on a miss.
+
+    The content version is read before the action queries the database,
+    so a response is never stored under a newer version than the data
+    it was built from.
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        if not settings.RECIPE_RESPONSE_CACHE:
+            return view_method(self, request, *args, **kwargs)
+
+        key = response_key(self, request)
+        cached = _cache().get(key)
+        if cached is not None:
+            _count(HITS_KEY)
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        _count(MISSES_KEY)
+        response = view_method(self, request, *args, **kwargs)
+        response['X-Cache'] = 'MISS'
+        if response.status_code == 200:
+            def store(rendered):
+                _cache().set(
+                    key,
+                    (rendered.content, rendered['Content-Type'])
+                )
+            # DRF responses are rendered after the view returns.
+            response.add_post_render_callback(store)
+        return response
+    return wrapper
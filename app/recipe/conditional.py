@@ -0,0 +1,45 @@
+"""
+Conditional GET support (ETag / Last-Modified) for the recipe API
+"""
+import hashlib
+
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from core.models import ContentVersion
+
+
+def content_version(request):
+    """Return the ContentVersion of the request's user"""
+    # Looked up once per request, both validators use it.
+    if not hasattr(request, '_content_version'):
+        request._content_version = ContentVersion.objects.for_user(
+            request.user)
+    return request._content_version
+
+
+def _etag(request, *args, **kwargs):
+    """ETag for the user's data as seen through this exact URL"""
+    version = content_version(request)
+    key = '|'.join([
+        str(version.user_id),
+        str(version.version),
+        request.get_full_path(),
+        # JSON and the browsable API render the same data differently.
+        request.accepted_media_type or '',
+    ])
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def _last_modified(request, *args, **kwargs):
+    """When the user's recipes, tags or ingredients last changed"""
+    return content_version(request).modified_at
+
+
+# Wraps a viewset action so a request whose If-None-Match or
+# If-Modified-Since validator is still current gets a 304 before the
+# action runs any queries. Runs after authentication, so request.user is
+# known.
+conditional_get = method_decorator(
+    condition(etag_func=_etag, last_modified_func=_last_modified)
+)
@@ -0,0 +1,108 @@
+"""
+Streaming export of a user's recipes as NDJSON or CSV
+"""
+import csv
+import io
+import json
+from itertools import islice
+
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.utils.encoders import JSONEncoder
+
+from recipe.prefetch import prefetch_instances
+from recipe.values import ValuesReader
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+class ExportContentNegotiation(BaseContentNegotiation):
+    """
+    Accept any Accept header: the export picks its content type from
+    ?export_format=, and errors are rendered with the first renderer.
+    """
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+def _chunks(iterable, size):
+    """Yield lists of up to `size` items"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def export_representations(queryset, serializer, chunk_size):
+    """
+    Yield the serialized recipes of a queryset, one chunk at a time.
+
+    Rows come from a server-side cursor via iterator() and the nested
+    relations are fetched per chunk, so at most `chunk_size` recipes are
+    held in memory whatever the size of the queryset.
+    """
+    reader = ValuesReader.build(serializer)
+    if reader is not None:
+        # Plain values() rows: no model instances to build, and nothing
+        # left for the garbage collector once a chunk is written out.
+        rows = reader.rows(queryset).iterator(chunk_size=chunk_size)
+        for chunk in _chunks(rows, chunk_size):
+            yield reader.to_representation(chunk)
+        return
+
+    # iterator() ignores prefetch_related(), relations are loaded for
+    # each chunk instead.
+    rows = queryset.prefetch_related(None).iterator(chunk_size=chunk_size)
+    for chunk in _chunks(rows, chunk_size):
+        prefetch_instances(chunk, serializer)
+        yield [serializer.to_representation(recipe) for recipe in chunk]
+
+
+def _csv_value(value):
+    """Flatten a serialized value into a CSV cell"""
+    if isinstance(value, list):
+        # Nested tags and ingredients are exported by name.
+        return ';'.join(
+            str(item.get('name', '')) if isinstance(item, dict)
+            else str(item)
+            for item in value
+        )
+    if isinstance(value, dict):
+        # Image variant URLs.
+        return json.dumps(value, cls=JSONEncoder)
+    return '' if value is None else value
+
+
+def ndjson_lines(chunks):
+    """Render chunks of representations as NDJSON, a chunk at a time"""
+    for chunk in chunks:
+        yield ''.join(
+            json.dumps(data, cls=JSONEncoder, ensure_ascii=False) + '\n'
+            for data in chunk
+        )
+
+
+def csv_lines(chunks, fields):
+    """Render chunks of representations as CSV, a chunk at a time"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields)
+    writer.writeheader()
+    for chunk in chunks:
+        writer.writerows(
+            {name: _csv_value(data[name]) for name in fields}
+            for data in chunk
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # The header on its own for an empty export.
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,250 @@
+"""
+Resized variants of recipe images, made off the request path
+"""
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+
+from PIL import Image, features
+
+from core.models import Recipe
+from core.signals import content_changed
+
+logger = logging.getLogger(__name__)
+
+PIL_FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+EXTENSIONS = {'webp': '.webp', 'jpeg': '.jpg'}
+
+ORIENTATION_TAG = 0x0112
+# The transposition that turns an image with each EXIF orientation the
+# right way up, as in ImageOps.exif_transpose().
+ORIENTATIONS = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class ImageTooLarge(ValueError):
+    """An upload has more pixels than RECIPE_IMAGE_MAX_PIXELS"""
+
+
+def normalize_image(upload, max_size=None, max_pixels=None, quality=None):
+    """
+    Return (file, bytes saved) for an uploaded image scaled down to fit
+    in max_size x max_size, turned the right way up, stripped of its
+    metadata and re-encoded: JPEG at `quality`, or PNG if transparent.
+    """
+    max_size = max_size or settings.RECIPE_IMAGE_MAX_SIZE
+    max_pixels = max_pixels or settings.RECIPE_IMAGE_MAX_PIXELS
+    quality = quality or settings.RECIPE_IMAGE_UPLOAD_QUALITY
+
+    upload.seek(0)
+    image = Image.open(upload)
+    # Only the header has been read so far.
+    if image.width * image.height > max_pixels:
+        raise ImageTooLarge(
+            f'Images can have at most {max_pixels} pixels, this one has '
+            f'{image.width * image.height}.')
+    orientation = image.getexif().get(ORIENTATION_TAG)
+    # The colour profile is kept, it isn't personal metadata and the
+    # colours would shift without it.
+    icc_profile = image.info.get('icc_profile')
+    transparent = 'A' in image.mode or 'transparency' in image.info
+
+    # Large JPEGs are decoded at 1/2, 1/4 or 1/8 scale, never holding
+    # the full-resolution pixels, then resized the rest of the way.
+    image.draft('RGB', (max_size, max_size))
+    image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+    # Turned after resizing, so only the small copy is transposed.
+    if orientation in ORIENTATIONS:
+        image = image.transpose(ORIENTATIONS[orientation])
+
+    if transparent:
+        fmt, extension, options = 'PNG', '.png', {}
+        image = image.convert('RGBA')
+    else:
+        fmt, extension = 'JPEG', '.jpg'
+        options = {'quality': quality, 'optimize': True}
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+    if icc_profile:
+        options['icc_profile'] = icc_profile
+    buffer = io.BytesIO()
+    # Nothing else from the original (EXIF, XMP, comments) is written.
+    image.save(buffer, format=fmt, **options)
+
+    stem = os.path.splitext(os.path.basename(upload.name))[0]
+    normalized = ContentFile(buffer.getvalue(), name=stem + extension)
+    return normalized, upload.size - normalized.size
+
+
+def image_formats():
+    """Return the configured formats this Pillow build can encode"""
+    return [
+        fmt for fmt in settings.RECIPE_IMAGE_FORMATS
+        if fmt != 'webp' or features.check('webp')
+    ]
+
+
+def _encode(image, fmt, quality):
+    """Return an image encoded in `fmt`"""
+    if fmt == 'jpeg' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, format=PIL_FORMATS[fmt], quality=quality)
+    return buffer.getvalue()
+
+
+def _open(source, largest):
+    """Load an image at the smallest scale that covers `largest`"""
+    with default_storage.open(source) as f:
+        image = Image.open(f)
+        # JPEGs are decoded at 1/2, 1/4 or 1/8 scale when that's still
+        # big enough, which is most of the work saved for large photos.
+        image.draft('RGB', (largest, largest))
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        transparent = 'A' in image.mode or 'transparency' in image.info
+        image = image.convert('RGBA' if transparent else 'RGB')
+    return image
+
+
+def save_variants(source, sizes=None, formats=None, quality=None):
+    """
+    Resize an image to each variant size, save the results next to it
+    and return {name: {'width', 'height', <format>: file name}}.
+    """
+    sizes = sizes or settings.RECIPE_IMAGE_VARIANTS
+    formats = formats or image_formats()
+    quality = quality or settings.RECIPE_IMAGE_QUALITY
+    stem = os.path.splitext(source)[0]
+
+    image = _open(source, max(sizes.values()))
+    variants = {}
+    # Largest first, so each variant is resized from the one before
+    # rather than from the full image. thumbnail() never enlarges.
+    for name, size in sorted(sizes.items(), key=lambda item: -item[1]):
+        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+        variant = {'width': image.width, 'height': image.height}
+        for fmt in formats:
+            variant[fmt] = default_storage.save(
+                f'{stem}-{name}{EXTENSIONS[fmt]}',
+                ContentFile(_encode(image, fmt, quality)),
+            )
+        variants[name] = variant
+    return variants
+
+
+def _stored_variants(source):
+    """
+    Return the variants already made of a stored image, which other
+    recipes share since identical uploads are stored once, or None.
+    """
+    recorded = Recipe.objects.filter(image=source).exclude(
+        image_variants__variants={}
+    ).values_list('image_variants', flat=True).first()
+    if not recorded:
+        return None
+    variants = recorded['variants']
+    # Made with the current settings.
+    if set(variants) != set(settings.RECIPE_IMAGE_VARIANTS) or any(
+            fmt not in variant
+            for variant in variants.values() for fmt in image_formats()):
+        return None
+    return variants
+
+
+def create_variants(recipe_id, user_id, source):
+    """Make the variants of a recipe's image and record them"""
+    variants = _stored_variants(source)
+    made = variants is None
+    if made:
+        variants = save_variants(source)
+    # The image may have been replaced while this one was resized.
+    updated = Recipe.objects.filter(pk=recipe_id, image=source).update(
+        image_variants={'source': source, 'variants': variants})
+    if updated:
+        # update() sends no signals.
+        content_changed(user_id)
+        return
+    if not made:
+        return
+    for variant in variants.values():
+        for fmt in PIL_FORMATS:
+            if fmt in variant:
+                default_storage.delete(variant[fmt])
+
+
+def _create_logged(*args):
+    """Make the variants, logging rather than raising errors"""
+    try:
+        create_variants(*args)
+    except Exception:
+        # The original is served until the variants exist.
+        logger.exception('Could not create the variants of %s', args[2])
+
+
+def _work(*args):
+    """Make the variants in a worker thread"""
+    try:
+        _create_logged(*args)
+    finally:
+        # Worker threads open their own connection, don't leave it idle.
+        connection.close()
+
+
+def executor():
+    """Return the process's pool of image workers"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Pillow releases the GIL while it decodes, resizes and
+            # encodes, so threads resize images in parallel.
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.RECIPE_IMAGE_WORKERS,
+                thread_name_prefix='recipe-images',
+            )
+        return _executor
+
+
+def schedule_variants(recipe):
+    """Make the variants of a recipe's image once the upload commits"""
+    args = (recipe.id, recipe.user_id, recipe.image.name)
+
+    def submit():
+        if settings.RECIPE_IMAGE_WORKERS:
+            executor().submit(_work, *args)
+        else:
+            _create_logged(*args)
+
+    transaction.on_commit(submit)
+
+
+def attach_image(recipe, image):
+    """
+    Store an uploaded image (or None) on a recipe without saving it.
+    Call schedule_variants() once the recipe is saved.
+    """
+    if image is None:
+        recipe.image = None
+        recipe.image_variants = None
+        return
+    # Saving the file now gives it its final name, which the variants
+    # are recorded against.
+    recipe.image.save(image.name, image, save=False)
+    recipe.image_variants = {'source': recipe.image.name, 'variants': {}}
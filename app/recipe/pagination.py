@@ -0,0 +1,144 @@
+"""
+Pagination for the recipe API
+"""
+import json
+from functools import reduce
+
+from django.conf import settings
+from django.db.models import Q
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+
+
+class RecipeCursorPagination(CursorPagination):
+    """
+    Keyset pagination over recipes, newest first.
+
+    Each page is fetched with `WHERE id < <last id>` rather than an
+    OFFSET, so deep pages cost the same as the first one. Cursors are
+    opaque base64 tokens returned in the `next`/`previous` links.
+
+    DRF only keys on the first ordering field and pages through ties
+    with an offset, which it caps at offset_cutoff. Here the cursor
+    holds every ordering field, e.g. (search_rank, id) for searches, so
+    positions are unique and no page needs an offset.
+    """
+    # Used when the view doesn't order the queryset itself.
+    ordering = '-id'
+    page_size = settings.RECIPE_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.RECIPE_MAX_PAGE_SIZE
+
+    def get_ordering(self, request, queryset, view):
+        """Paginate in the order the view applied to the queryset"""
+        # Search results are ordered by rank first, so the cursor has to
+        # follow whatever ordering get_queryset chose.
+        if queryset.query.order_by:
+            return tuple(queryset.query.order_by)
+        return super().get_ordering(request, queryset, view)
+
+    def _get_position_from_instance(self, instance, ordering):
+        if len(ordering) == 1:
+            return super()._get_position_from_instance(instance, ordering)
+        values = []
+        for order in ordering:
+            name = order.lstrip('-')
+            if isinstance(instance, dict):
+                values.append(instance[name])
+            else:
+                values.append(getattr(instance, name))
+        # JSON keeps floats exact, so ranks compare equal in the database.
+        return json.dumps(values)
+
+    def _position_values(self, position):
+        """Return the value of each ordering field in a cursor position"""
+        if len(self.ordering) == 1:
+            return [position]
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or \
+                len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        # Multi-field orderings are a numeric rank then the id.
+        for order, value in zip(self.ordering, values):
+            types = int if order.lstrip('-') == 'id' else (int, float)
+            if isinstance(value, bool) or not isinstance(value, types):
+                raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def _after(self, position, reverse):
+        """
+        Return the filter for the rows after `position` in the ordering:
+        (a, b) after (x, y) is a after x, or a = x and b after y
+        """
+        terms = []
+        equal = Q()
+        for order, value in zip(self.ordering, self._position_values(
+                position)):
+            name = order.lstrip('-')
+            # Test for: (cursor reversed) XOR (field descending)
+            lookup = 'lt' if reverse != order.startswith('-') else 'gt'
+            terms.append(equal & Q(**{f'{name}__{lookup}': value}))
+            equal &= Q(**{name: value})
+        return reduce(lambda a, b: a | b, terms)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # Same as CursorPagination.paginate_queryset, except that the
+        # position filters on every ordering field.
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if current_position is not None:
+            queryset = queryset.filter(self._after(current_position, reverse))
+
+        # One more row than the page tells whether a page follows.
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(
+                results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            # Fetched backwards, returned in the usual order.
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
@@ -0,0 +1,113 @@
+"""
+Query planner that shapes recipe querysets from the serializer in use
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch, prefetch_related_objects
+
+from rest_framework import serializers
+
+
+def _nested_serializer(field):
+    """Return the model serializer behind a nested field, if any"""
+    # Fields declared with many=True are wrapped in a ListSerializer,
+    # the serializer that knows the related model is its child.
+    if isinstance(field, serializers.ListSerializer):
+        field = field.child
+    if isinstance(field, serializers.ModelSerializer):
+        return field
+    return None
+
+
+def _plan(model, serializer):
+    """
+    Work out the columns and relations a serializer reads from a model.
+
+    Returns a tuple of (only, select_related, prefetch) where `only` is
+    None when a field could not be mapped to a concrete column, in which
+    case every column has to be loaded.
+    """
+    only = [model._meta.pk.name]
+    select = []
+    prefetch = []
+
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        # source='*' or dotted sources span more than one column,
+        # so we can't safely narrow the selected columns.
+        if field.source == '*' or '.' in field.source:
+            only = None
+            continue
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            only = None
+            continue
+
+        nested = _nested_serializer(field)
+        if model_field.many_to_many or model_field.one_to_many:
+            if nested is None:
+                only = None
+                continue
+            related = nested.Meta.model
+            related_only, _, _ = _plan(related, nested)
+            related_qs = related.objects.all()
+            if related_only is not None:
+                related_qs = related_qs.only(*related_only)
+            # Order nested objects by primary key so responses are stable.
+            prefetch.append(Prefetch(
+                field.source,
+                queryset=related_qs.order_by(related._meta.pk.name),
+            ))
+        elif model_field.many_to_one or model_field.one_to_one:
+            if nested is not None:
+                select.append(field.source)
+        elif only is not None:
+            only.append(model_field.name)
+
+    if only is not None:
+        # Foreign keys are always loaded: they are cheap, and model code
+        # such as signal handlers expects e.g. user_id to be there.
+        only.extend(
+            field.name for field in model._meta.concrete_fields
+            if field.many_to_one or field.one_to_one
+        )
+    return only, select, prefetch
+
+
+def optimize_queryset(queryset, serializer):
+    """
+    Apply only(), select_related() and prefetch_related() to a queryset
+    so that serializing its objects with `serializer` runs a fixed
+    number of queries, whatever the number of objects.
+    """
+    only, select, prefetch = _plan(queryset.model, serializer)
+    if only is not None:
+        queryset = queryset.only(*only)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
+
+
+def prefetch_instances(instances, serializer):
+    """
+    Load the relations read by `serializer` into already fetched
+    instances, e.g. ones that were just created or updated.
+    """
+    if not instances:
+        return instances
+    _, _, prefetch = _plan(type(instances[0]), serializer)
+    # Related managers drop their prefetch cache when add(), remove()
+    # or clear() is called, so only relations changed by a write are
+    # fetched again here.
+    if prefetch:
+        prefetch_related_objects(instances, *prefetch)
+    return instances
+
+
+def prefetch_instance(instance, serializer):
+    """Load the relations read by `serializer` into one instance"""
+    prefetch_instances([instance], serializer)
+    return instance
@@ -1,16 +1,113 @@
 """
 Serializers for recipe app
 """
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 
 from core.models import (
+    ImageUpload,
     Recipe,
     Tag,
     Ingredient
 )
+from core.signals import content_changed, deferred_content_versions
+from recipe import uploads
+from recipe.images import (
+    ImageTooLarge,
+    attach_image,
+    normalize_image,
+    schedule_variants,
+)
+
+
+def _field_names(value):
+    """Split a comma separated query parameter into field names"""
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+class SparseFieldsMixin:
+    """
+    Let clients choose the fields they get back with ?fields=a,b or
+    leave some out with ?omit=c,d. Only applies to the top level
+    serializer of a read request, nested serializers are left alone.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        # Writes need every field to validate the input.
+        if request is None or request.method not in SAFE_METHODS:
+            return
+        only = _field_names(request.query_params.get('fields'))
+        omit = _field_names(request.query_params.get('omit'))
+        # Unknown names are ignored rather than rejected.
+        for name in list(self.fields):
+            if (only and name not in only) or name in omit:
+                self.fields.pop(name)
+
 
+def get_or_create_by_name(model, user, names):
+    """
+    Return {name: object} for the user's tags or ingredients called
+    `names`, creating the missing ones.
 
-class IngredientSerializer(serializers.ModelSerializer):
+    Runs one query when every name exists and three otherwise, however
+    many names there are.
+    """
+    # Keep the first occurrence of each name, new objects get ids in the
+    # order they were given.
+    names = list(dict.fromkeys(names))
+    if not names:
+        return {}
+    found = {
+        obj.name: obj
+        for obj in model.objects.filter(user=user, name__in=names)
+    }
+    missing = [name for name in names if name not in found]
+    if missing:
+        # A concurrent request may create the same names first: the
+        # unique (user, name) constraint turns those inserts into no-ops
+        # and the rows are picked up by the select that follows.
+        model.objects.bulk_create(
+            [model(user=user, name=name) for name in missing],
+            ignore_conflicts=True,
+        )
+        found.update(
+            (obj.name, obj)
+            for obj in model.objects.filter(user=user, name__in=missing)
+        )
+    return found
+
+
+class UniqueNameMixin:
+    """Reject a tag or ingredient name the user already has"""
+
+    def validate_name(self, value):
+        # Nested in a recipe, existing names are reused instead.
+        if self.parent is not None:
+            return value
+        queryset = self.Meta.model.objects.filter(
+            user=self.context['request'].user,
+            name=value,
+        )
+        if self.instance is not None:
+            queryset = queryset.exclude(pk=self.instance.pk)
+        if queryset.exists():
+            raise serializers.ValidationError(
+                f'You already have a {self.Meta.model._meta.verbose_name} '
+                'with this name.'
+            )
+        return value
+
+
+class IngredientSerializer(SparseFieldsMixin, UniqueNameMixin,
+                           serializers.ModelSerializer):
     """Serializer for ingredient objects"""
 
     class Meta:
@@ -19,7 +116,8 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(SparseFieldsMixin, UniqueNameMixin,
+                    serializers.ModelSerializer):
     """Serializer for tag objects"""
 
     class Meta:
@@ -28,7 +126,98 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeListSerializer(serializers.ListSerializer):
+    """
+    Create or update many recipes with a fixed number of queries: rows
+    are written with bulk_create()/bulk_update(), the tags and
+    ingredients of the whole batch are resolved together and their
+    links are inserted and deleted in one query per relation.
+    """
+    relations = [('tags', Tag), ('ingredients', Ingredient)]
+
+    def _pop_relations(self, validated_data):
+        """Take {relation: [items or None per recipe]} out of the data"""
+        return {
+            name: [attrs.pop(name, None) for attrs in validated_data]
+            for name, _ in self.relations
+        }
+
+    def _link(self, recipes, name, model, items, replace):
+        """Link each recipe to its `items`, replacing current links"""
+        field = Recipe._meta.get_field(name)
+        through = field.remote_field.through
+        source = f'{field.m2m_field_name()}_id'
+        target = f'{field.m2m_reverse_field_name()}_id'
+        objs = get_or_create_by_name(
+            model,
+            self.context['request'].user,
+            [item['name'] for entry in items if entry for item in entry]
+        )
+        # Recipes whose relation wasn't in the data are left alone.
+        changing = [
+            (recipe, entry) for recipe, entry in zip(recipes, items)
+            if entry is not None
+        ]
+        wanted = {
+            (recipe.pk, objs[item['name']].pk)
+            for recipe, entry in changing for item in entry
+        }
+        current = set()
+        if replace and changing:
+            stale = []
+            for link_id, *pair in through.objects.filter(**{
+                f'{source}__in': [recipe.pk for recipe, _ in changing]
+            }).values_list('id', source, target):
+                if tuple(pair) in wanted:
+                    current.add(tuple(pair))
+                else:
+                    stale.append(link_id)
+            if stale:
+                through.objects.filter(id__in=stale).delete()
+        new = sorted(wanted - current)
+        if new:
+            through.objects.bulk_create(
+                through(**{source: recipe_id, target: obj_id})
+                for recipe_id, obj_id in new
+            )
+        for recipe, _ in changing:
+            # The links were written without the related manager, which
+            # would have dropped its cache itself.
+            getattr(recipe, '_prefetched_objects_cache', {}).pop(name, None)
+
+    def create(self, validated_data):
+        """Create recipes in bulk"""
+        relations = self._pop_relations(validated_data)
+        with transaction.atomic(savepoint=False):
+            recipes = Recipe.objects.bulk_create(
+                Recipe(**attrs) for attrs in validated_data)
+            for name, model in self.relations:
+                self._link(recipes, name, model, relations[name], False)
+            # bulk_create() doesn't send post_save.
+            content_changed(self.context['request'].user.id)
+        return recipes
+
+    def update(self, instance, validated_data):
+        """Partially update recipes in bulk"""
+        recipes = list(instance)
+        relations = self._pop_relations(validated_data)
+        fields = set()
+        for recipe, attrs in zip(recipes, validated_data):
+            for attr, value in attrs.items():
+                setattr(recipe, attr, value)
+                fields.add(attr)
+        with transaction.atomic(savepoint=False):
+            if fields:
+                # Every recipe gets every changed column, unchanged ones
+                # are written back with their current value.
+                Recipe.objects.bulk_update(recipes, sorted(fields))
+            for name, model in self.relations:
+                self._link(recipes, name, model, relations[name], True)
+            content_changed(self.context['request'].user.id)
+        return recipes
+
+
+class RecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for recipe objects"""
     tags = TagSerializer(many=True, required=False)
     ingredients = IngredientSerializer(many=True, required=False)
@@ -43,32 +232,61 @@ class RecipeSerializer(serializers.ModelSerializer):
                   'tags',
                   'ingredients']
         read_only_fields = ['id']
+        list_serializer_class = RecipeListSerializer
 
-    def _get_or_create_tags(self, tags, recipe):
+    def _link(self, manager, objs, replace):
+        """Add `objs` to a relation, or make it hold exactly `objs`"""
+        if not replace:
+            manager.add(*objs)
+            return
+        # Read again rather than from the prefetch cache, which was
+        # loaded before the recipe row was locked and may be stale.
+        current = set(manager.values_list('pk', flat=True))
+        wanted = {obj.pk: obj for obj in objs}
+        # Links that are kept are left alone, only the difference is
+        # deleted and inserted, in one query each.
+        stale = [pk for pk in current if pk not in wanted]
+        if stale:
+            manager.remove(*stale)
+        new = [obj for pk, obj in wanted.items() if pk not in current]
+        if new:
+            manager.add(*new)
+
+    def _get_or_create_tags(self, tags, recipe, replace=False):
         """Handle getting or creating tags as needed"""
         auth_user = self.context['request'].user
-        for tag in tags:
-            tag_obj, _ = Tag.objects.get_or_create(
-                user=auth_user,
-                **tag)
-            recipe.tags.add(tag_obj)
+        tag_objs = get_or_create_by_name(
+            Tag, auth_user, [tag['name'] for tag in tags])
+        self._link(recipe.tags, tag_objs.values(), replace)
 
-    def _get_or_create_ingredients(self, ingredients, recipe):
+    def _get_or_create_ingredients(self, ingredients, recipe, replace=False):
         """Handle getting or creating ingredients as needed"""
         auth_user = self.context['request'].user
-        for ingredient in ingredients:
-            ingredient_obj, _ = Ingredient.objects.get_or_create(
-                user=auth_user,
-                **ingredient)
-            recipe.ingredients.add(ingredient_obj)
+        ingredient_objs = get_or_create_by_name(
+            Ingredient,
+            auth_user,
+            [ingredient['name'] for ingredient in ingredients]
+        )
+        self._link(recipe.ingredients, ingredient_objs.values(), replace)
 
     def create(self, validated_data):
         """Create a recipe"""
         tags = validated_data.pop('tags', [])
         ingredients = validated_data.pop('ingredients', [])
-        recipe = Recipe.objects.create(**validated_data)
-        self._get_or_create_tags(tags, recipe)
-        self._get_or_create_ingredients(ingredients, recipe)
+        image = validated_data.pop('image', None)
+        # savepoint=False: a transaction when called on its own, and no
+        # extra savepoint queries inside one. The row and each of its
+        # links bump the content version once in all.
+        with transaction.atomic(savepoint=False), \
+                deferred_content_versions():
+            recipe = Recipe(**validated_data)
+            if image is not None:
+                attach_image(recipe, image)
+            recipe.save()
+            self._get_or_create_tags(tags, recipe)
+            self._get_or_create_ingredients(ingredients, recipe)
+            if image is not None:
+                schedule_variants(recipe)
 
         return recipe
 
@@ -76,37 +294,231 @@ class RecipeSerializer(serializers.ModelSerializer):
         """Update a recipe"""
         tags = validated_data.pop('tags', None)
         ingredients = validated_data.pop('ingredients', None)
-        if tags is not None:
-            instance.tags.clear()
-            self._get_or_create_tags(tags, instance)
-        if ingredients is not None:
-            instance.ingredients.clear()
-            self._get_or_create_ingredients(ingredients, instance)
+        with transaction.atomic(savepoint=False), \
+                deferred_content_versions():
+            if tags is not None or ingredients is not None:
+                # Concurrent updates of the links wait for this one, so
+                # each works out its changes from the committed links.
+                list(Recipe.objects.select_for_update().filter(
+                    pk=instance.pk).values_list('pk', flat=True))
+            if tags is not None:
+                self._get_or_create_tags(tags, instance, replace=True)
+            if ingredients is not None:
+                self._get_or_create_ingredients(
+                    ingredients, instance, replace=True)
 
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
+            fields = []
+            for attr, value in validated_data.items():
+                if attr == 'image':
+                    attach_image(instance, value)
+                    fields += ['image', 'image_variants']
+                else:
+                    setattr(instance, attr, value)
+                    fields.append(attr)
 
-        instance.save()
+            # Only the changed columns are written, so the variants a
+            # worker recorded since the recipe was loaded are kept.
+            if fields:
+                instance.save(update_fields=fields)
+            if validated_data.get('image') is not None:
+                schedule_variants(instance)
         return instance
 
 
-class RecipeDetailSerializer(RecipeSerializer):
+@extend_schema_field(OpenApiTypes.OBJECT)
+class ImageVariantsField(serializers.Field):
+    """
+    URLs of the resized variants of a recipe image in each format, with
+    their size. Until a variant is ready its URLs are the original's
+    and its size is null.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def _url(self, name):
+        """Return the URL of a stored file, absolute with a request"""
+        url = default_storage.url(name)
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+    def to_representation(self, value):
+        source = value.get('source')
+        if not source:
+            return None
+        variants = value.get('variants', {})
+        ret = {}
+        for name in settings.RECIPE_IMAGE_VARIANTS:
+            variant = variants.get(name, {})
+            ret[name] = {
+                'width': variant.get('width'),
+                'height': variant.get('height'),
+            }
+            for fmt in settings.RECIPE_IMAGE_FORMATS:
+                ret[name][fmt] = self._url(variant.get(fmt, source))
+        return ret
+
+
+class NormalizedImageMixin:
+    """
+    Validate uploaded images and replace them with a normalized copy
+    (see recipe.images.normalize_image). The bytes saved are kept in
+    `bytes_saved`.
+    """
+    bytes_saved = None
+
+    def validate_image(self, value):
+        if value is None:
+            return value
+        try:
+            value, self.bytes_saved = normalize_image(value)
+        except ImageTooLarge as e:
+            raise serializers.ValidationError(str(e))
+        return value
+
+
+class RecipeDetailSerializer(NormalizedImageMixin, RecipeSerializer):
     """Serializer for recipe detail objects"""
+    images = ImageVariantsField(source='image_variants')
 
     class Meta(RecipeSerializer.Meta):
-        fields = RecipeSerializer.Meta.fields + ['description', 'image']
+        fields = RecipeSerializer.Meta.fields + [
+            'description', 'image', 'images']
         # read_only_fields = RecipeSerializer.Meta.read_only_fields
 
 
-class RecipeImageSerializer(serializers.ModelSerializer):
+class RecipeImageSerializer(NormalizedImageMixin,
+                            serializers.ModelSerializer):
     """Serializer for uploading images to recipes"""
+    images = ImageVariantsField(source='image_variants')
 
     class Meta:
         model = Recipe
-        fields = ['id', 'image']
+        fields = ['id', 'image', 'images']
         read_only_fields = ['id']
         extra_kwargs = {
             'image': {
                 'required': True
             }
         }
+
+    def update(self, instance, validated_data):
+        """Save the image and make its variants once it's committed"""
+        attach_image(instance, validated_data['image'])
+        instance.save()
+        schedule_variants(instance)
+        return instance
+
+
+class RecipeImageResultSerializer(RecipeImageSerializer):
+    """Serializer for the response of an image upload"""
+    bytes_saved = serializers.IntegerField(
+        help_text='How much smaller the stored image is than the upload, '
+                  'negative if it is bigger'
+    )
+
+    class Meta(RecipeImageSerializer.Meta):
+        fields = RecipeImageSerializer.Meta.fields + ['bytes_saved']
+
+
+class ImageUploadSerializer(serializers.ModelSerializer):
+    """Serializer for chunked image upload sessions"""
+    chunk_count = serializers.IntegerField(read_only=True)
+    received_chunks = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ImageUpload
+        fields = [
+            'id', 'recipe', 'filename', 'size', 'sha256', 'chunk_size',
+            'chunk_count', 'received_chunks', 'expires_at',
+        ]
+        read_only_fields = ['id', 'chunk_size', 'expires_at']
+
+    def get_received_chunks(self, obj) -> list[int]:
+        return uploads.received_chunks(obj)
+
+    def validate_recipe(self, value):
+        """Only allow uploads to the user's own recipes"""
+        if value.user_id != self.context['request'].user.id:
+            raise serializers.ValidationError('Recipe not found.')
+        return value
+
+    def validate_size(self, value):
+        if not 0 < value <= settings.RECIPE_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                'Uploads must be between 1 and '
+                f'{settings.RECIPE_UPLOAD_MAX_SIZE} bytes.'
+            )
+        return value
+
+    def validate_sha256(self, value):
+        value = value.lower()
+        if len(value) != 64 or value.strip('0123456789abcdef'):
+            raise serializers.ValidationError(
+                'Must be a hex SHA-256 digest.')
+        return value
+
+    def create(self, validated_data):
+        """Start an upload session"""
+        return ImageUpload.objects.create(
+            chunk_size=settings.RECIPE_UPLOAD_CHUNK_SIZE,
+            expires_at=uploads.expiry(),
+            **validated_data
+        )
+
+
+class RecipeBulkUpdateSerializer(serializers.Serializer):
+    """Serializer for one partial update of a bulk recipe request"""
+    id = serializers.IntegerField(help_text='Id of the recipe to update')
+
+    def to_internal_value(self, data):
+        validated = super().to_internal_value(data)
+        # The other fields are validated against the recipe later.
+        return {**data, **validated}
+
+
+class RecipeBulkSerializer(serializers.Serializer):
+    """Serializer for the operations of a bulk recipe request"""
+    create = serializers.ListField(
+        child=serializers.DictField(),
+        required=False,
+        default=list,
+        help_text='Recipes to create'
+    )
+    update = serializers.ListField(
+        child=RecipeBulkUpdateSerializer(),
+        required=False,
+        default=list,
+        help_text='Partial updates, each with the id of its recipe'
+    )
+    delete = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        default=list,
+        help_text='Ids of recipes to delete'
+    )
+
+    def validate(self, attrs):
+        """Limit the batch size and reject conflicting operations"""
+        total = sum(
+            len(attrs[name]) for name in ['create', 'update', 'delete'])
+        if total > settings.RECIPE_BULK_MAX_ITEMS:
+            raise serializers.ValidationError(
+                f'At most {settings.RECIPE_BULK_MAX_ITEMS} recipes can be '
+                'changed per request.'
+            )
+        ids = [item['id'] for item in attrs['update']] + attrs['delete']
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError(
+                'Each recipe can only be updated or deleted once.')
+        return attrs
+
+
+class RecipeBulkResultSerializer(serializers.Serializer):
+    """Serializer for the response of a bulk recipe request"""
+    created = RecipeDetailSerializer(many=True)
+    updated = RecipeDetailSerializer(many=True)
+    deleted = serializers.ListField(child=serializers.IntegerField())
@@ -0,0 +1,3 @@
+SELECT "authtoken_token"."key", "authtoken_token"."user_id", "authtoken_token"."created", "core_user"."id", "core_user"."last_login", "core_user"."is_superuser", "core_user"."email", "core_user"."name", "core_user"."is_active", "core_user"."is_staff", "core_user"."token_version" FROM "authtoken_token" INNER JOIN "core_user" ON ("authtoken_token"."user_id" = "core_user"."id") WHERE "authtoken_token"."key" = ? LIMIT ?
+SELECT "core_imageupload"."id", "core_imageupload"."user_id", "core_imageupload"."recipe_id", "core_imageupload"."filename", "core_imageupload"."size", "core_imageupload"."sha256", "core_imageupload"."chunk_size", "core_imageupload"."created_at", "core_imageupload"."expires_at" FROM "core_imageupload" WHERE ("core_imageupload"."expires_at" > ?::timestamptz AND "core_imageupload"."user_id" = ? AND "core_imageupload"."id" = ?::uuid) LIMIT ?
+UPDATE "core_imageupload" SET "expires_at" = ?::timestamptz WHERE "core_imageupload"."id" = ?::uuid
@@ -0,0 +1,3 @@
+SELECT "authtoken_token"."key", "authtoken_token"."user_id", "authtoken_token"."created", "core_user"."id", "core_user"."last_login", "core_user"."is_superuser", "core_user"."email", "core_user"."name", "core_user"."is_active", "core_user"."is_staff", "core_user"."token_version" FROM "authtoken_token" INNER JOIN "core_user" ON ("authtoken_token"."user_id" = "core_user"."id") WHERE "authtoken_token"."key" = ? LIMIT ?
+SELECT "core_recipe"."id", "core_recipe"."user_id", "core_recipe"."title", "core_recipe"."description", "core_recipe"."time_minutes", "core_recipe"."price", "core_recipe"."link", "core_recipe"."image", "core_recipe"."image_variants", "core_recipe"."search_vector" FROM "core_recipe" WHERE "core_recipe"."id" = ? LIMIT ?
+INSERT INTO "core_imageupload" ("id", "user_id", "recipe_id", "filename", "size", "sha256", "chunk_size", "created_at", "expires_at") VALUES (?::uuid, ?, ?, ?, ?, ?, ?, ?::timestamptz, ?::timestamptz)
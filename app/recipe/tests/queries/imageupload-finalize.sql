@@ -0,0 +1,8 @@
+SELECT "authtoken_token"."key", "authtoken_token"."user_id", "authtoken_token"."created", "core_user"."id", "core_user"."last_login", "core_user"."is_superuser", "core_user"."email", "core_user"."name", "core_user"."is_active", "core_user"."is_staff", "core_user"."token_version" FROM "authtoken_token" INNER JOIN "core_user" ON ("authtoken_token"."user_id" = "core_user"."id") WHERE "authtoken_token"."key" = ? LIMIT ?
+SAVEPOINT "s?"
+SELECT "core_imageupload"."id", "core_imageupload"."user_id", "core_imageupload"."recipe_id", "core_imageupload"."filename", "core_imageupload"."size", "core_imageupload"."sha256", "core_imageupload"."chunk_size", "core_imageupload"."created_at", "core_imageupload"."expires_at" FROM "core_imageupload" WHERE ("core_imageupload"."expires_at" > ?::timestamptz AND "core_imageupload"."user_id" = ? AND "core_imageupload"."id" = ?::uuid) LIMIT ? FOR UPDATE
+SELECT "core_recipe"."id", "core_recipe"."user_id", "core_recipe"."title", "core_recipe"."description", "core_recipe"."time_minutes", "core_recipe"."price", "core_recipe"."link", "core_recipe"."image", "core_recipe"."image_variants", "core_recipe"."search_vector" FROM "core_recipe" WHERE "core_recipe"."id" = ? LIMIT ?
+UPDATE "core_recipe" SET "user_id" = ?, "title" = ?, "description" = ?, "time_minutes" = ?, "price" = ?, "link" = ?, "image" = ?, "image_variants" = ?, "search_vector" = ? WHERE "core_recipe"."id" = ?
+UPDATE "core_contentversion" SET "version" = ("core_contentversion"."version" + ?), "modified_at" = ?::timestamptz WHERE "core_contentversion"."user_id" IN (...)
+DELETE FROM "core_imageupload" WHERE "core_imageupload"."id" IN (?::uuid)
+RELEASE SAVEPOINT "s?"
@@ -0,0 +1,5 @@
+SELECT "authtoken_token"."key", "authtoken_token"."user_id", "authtoken_token"."created", "core_user"."id", "core_user"."last_login", "core_user"."is_superuser", "core_user"."email", "core_user"."name", "core_user"."is_active", "core_user"."is_staff", "core_user"."token_version" FROM "authtoken_token" INNER JOIN "core_user" ON ("authtoken_token"."user_id" = "core_user"."id") WHERE "authtoken_token"."key" = ? LIMIT ?
+SELECT DISTINCT "core_ingredient"."id", "core_ingredient"."name", "core_ingredient"."user_id" FROM "core_ingredient" WHERE ("core_ingredient"."user_id" = ? AND "core_ingredient"."id" = ?) LIMIT ?
+SELECT (...) AS "a" FROM "core_ingredient" WHERE ("core_ingredient"."name" = ? AND "core_ingredient"."user_id" = ? AND NOT ("core_ingredient"."id" = ?)) LIMIT ?
+UPDATE "core_ingredient" SET "name" = ?, "user_id" = ? WHERE "core_ingredient"."id" = ?
+UPDATE "core_contentversion" SET "version" = ("core_contentversion"."version" + ?), "modified_at" = ?::timestamptz WHERE "core_contentversion"."user_id" IN (...)
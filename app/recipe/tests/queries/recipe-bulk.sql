@@ -0,0 +1,28 @@
+SELECT "authtoken_token"."key", "authtoken_token"."user_id", "authtoken_token"."created", "core_user"."id", "core_user"."last_login", "core_user"."is_superuser", "core_user"."email", "core_user"."name", "core_user"."is_active", "core_user"."is_staff", "core_user"."token_version" FROM "authtoken_token" INNER JOIN "core_user" ON ("authtoken_token"."user_id" = "core_user"."id") WHERE "authtoken_token"."key" = ? LIMIT ?
+SELECT "core_recipe"."id", "core_recipe"."user_id", "core_recipe"."title", "core_recipe"."description", "core_recipe"."time_minutes", "core_recipe"."price", "core_recipe"."link", "core_recipe"."image", "core_recipe"."image_variants" FROM "core_recipe" WHERE ("core_recipe"."user_id" = ? AND "core_recipe"."id" IN (...)) ORDER BY "core_recipe"."id" DESC
+SELECT ("core_recipe_tags"."recipe_id") AS "_prefetch_related_val_recipe_id", "core_tag"."id", "core_tag"."name", "core_tag"."user_id" FROM "core_tag" INNER JOIN "core_recipe_tags" ON ("core_tag"."id" = "core_recipe_tags"."tag_id") WHERE "core_recipe_tags"."recipe_id" IN (...) ORDER BY "core_tag"."id" ASC
+SELECT ("core_recipe_ingredients"."recipe_id") AS "_prefetch_related_val_recipe_id", "core_ingredient"."id", "core_ingredient"."name", "core_ingredient"."user_id" FROM "core_ingredient" INNER JOIN "core_recipe_ingredients" ON ("core_ingredient"."id" = "core_recipe_ingredients"."ingredient_id") WHERE "core_recipe_ingredients"."recipe_id" IN (...) ORDER BY "core_ingredient"."id" ASC
+SELECT "core_recipe"."id" FROM "core_recipe" WHERE ("core_recipe"."id" IN (...) AND "core_recipe"."user_id" = ?)
+SAVEPOINT "s?"
+INSERT INTO "core_recipe" ("user_id", "title", "description", "time_minutes", "price", "link", "image", "image_variants", "search_vector") VALUES (?, ?, ?, ?, ?, ?, ?, NULL, NULL) RETURNING "core_recipe"."id"
+SELECT "core_tag"."id", "core_tag"."name", "core_tag"."user_id" FROM "core_tag" WHERE ("core_tag"."name" IN (...) AND "core_tag"."user_id" = ?)
+INSERT INTO "core_tag" ("name", "user_id") VALUES (...) ON CONFLICT DO NOTHING
+SELECT "core_tag"."id", "core_tag"."name", "core_tag"."user_id" FROM "core_tag" WHERE ("core_tag"."name" IN (...) AND "core_tag"."user_id" = ?)
+INSERT INTO "core_recipe_tags" ("recipe_id", "tag_id") VALUES (...) RETURNING "core_recipe_tags"."id"
+SELECT "core_ingredient"."id", "core_ingredient"."name", "core_ingredient"."user_id" FROM "core_ingredient" WHERE ("core_ingredient"."name" IN (...) AND "core_ingredient"."user_id" = ?)
+INSERT INTO "core_ingredient" ("name", "user_id") VALUES (...) ON CONFLICT DO NOTHING
+SELECT "core_ingredient"."id", "core_ingredient"."name", "core_ingredient"."user_id" FROM "core_ingredient" WHERE ("core_ingredient"."name" IN (...) AND "core_ingredient"."user_id" = ?)
+INSERT INTO "core_recipe_ingredients" ("recipe_id", "ingredient_id") VALUES (...) RETURNING "core_recipe_ingredients"."id"
+UPDATE "core_recipe" SET "title" = (CASE WHEN ("core_recipe"."id" = ?) THEN ? ELSE NULL END)::varchar(...) WHERE "core_recipe"."id" IN (...)
+SELECT "core_tag"."id", "core_tag"."name", "core_tag"."user_id" FROM "core_tag" WHERE ("core_tag"."name" IN (...) AND "core_tag"."user_id" = ?)
+SELECT "core_recipe_tags"."id", "core_recipe_tags"."recipe_id", "core_recipe_tags"."tag_id" FROM "core_recipe_tags" WHERE "core_recipe_tags"."recipe_id" IN (...)
+DELETE FROM "core_recipe_tags" WHERE "core_recipe_tags"."id" IN (...)
+SELECT "core_recipe"."id", "core_recipe"."user_id", "core_recipe"."title", "core_recipe"."description", "core_recipe"."time_minutes", "core_recipe"."price", "core_recipe"."link", "core_recipe"."image", "core_recipe"."image_variants", "core_recipe"."search_vector" FROM "core_recipe" WHERE ("core_recipe"."id" IN (...) AND "core_recipe"."user_id" = ?)
+DELETE FROM "core_recipe_tags" WHERE "core_recipe_tags"."recipe_id" IN (...)
+DELETE FROM "core_recipe_ingredients" WHERE "core_recipe_ingredients"."recipe_id" IN (...)
+DELETE FROM "core_imageupload" WHERE "core_imageupload"."recipe_id" IN (...)
+DELETE FROM "core_recipe" WHERE "core_recipe"."id" IN (...)
+UPDATE "core_contentversion" SET "version" = ("core_contentversion"."version" + ?), "modified_at" = ?::timestamptz WHERE "core_contentversion"."user_id" IN (...)
+RELEASE SAVEPOINT "s?"
+SELECT ("core_recipe_tags"."recipe_id") AS "_prefetch_related_val_recipe_id", "core_tag"."id", "core_tag"."name", "core_tag"."user_id" FROM "core_tag" INNER JOIN "core_recipe_tags" ON ("core_tag"."id" = "core_recipe_tags"."tag_id") WHERE "core_recipe_tags"."recipe_id" IN (...) ORDER BY "core_tag"."id" ASC
+SELECT ("core_recipe_ingredients"."recipe_id") AS "_prefetch_related_val_recipe_id", "core_ingredient"."id", "core_ingredient"."name", "core_ingredient"."user_id" FROM "core_ingredient" INNER JOIN "core_recipe_ingredients" ON ("core_ingredient"."id" = "core_recipe_ingredients"."ingredient_id") WHERE "core_recipe_ingredients"."recipe_id" IN (...) ORDER BY "core_ingredient"."id" ASC
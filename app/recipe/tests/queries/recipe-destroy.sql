@@ -0,0 +1,7 @@
+SELECT "authtoken_token"."key", "authtoken_token"."user_id", "authtoken_token"."created", "core_user"."id", "core_user"."last_login", "core_user"."is_superuser", "core_user"."email", "core_user"."name", "core_user"."is_active", "core_user"."is_staff", "core_user"."token_version" FROM "authtoken_token" INNER JOIN "core_user" ON ("authtoken_token"."user_id" = "core_user"."id") WHERE "authtoken_token"."key" = ? LIMIT ?
+SELECT "core_recipe"."id", "core_recipe"."user_id", "core_recipe"."title", "core_recipe"."description", "core_recipe"."time_minutes", "core_recipe"."price", "core_recipe"."link", "core_recipe"."image", "core_recipe"."image_variants", "core_recipe"."search_vector" FROM "core_recipe" WHERE ("core_recipe"."user_id" = ? AND "core_recipe"."id" = ?) LIMIT ?
+DELETE FROM "core_recipe_tags" WHERE "core_recipe_tags"."recipe_id" IN (...)
+DELETE FROM "core_recipe_ingredients" WHERE "core_recipe_ingredients"."recipe_id" IN (...)
+DELETE FROM "core_imageupload" WHERE "core_imageupload"."recipe_id" IN (...)
+DELETE FROM "core_recipe" WHERE "core_recipe"."id" IN (...)
+UPDATE "core_contentversion" SET "version" = ("core_contentversion"."version" + ?), "modified_at" = ?::timestamptz WHERE "core_contentversion"."user_id" IN (...)
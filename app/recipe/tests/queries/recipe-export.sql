@@ -0,0 +1,4 @@
+SELECT "authtoken_token"."key", "authtoken_token"."user_id", "authtoken_token"."created", "core_user"."id", "core_user"."last_login", "core_user"."is_superuser", "core_user"."email", "core_user"."name", "core_user"."is_active", "core_user"."is_staff", "core_user"."token_version" FROM "authtoken_token" INNER JOIN "core_user" ON ("authtoken_token"."user_id" = "core_user"."id") WHERE "authtoken_token"."key" = ? LIMIT ?
+DECLARE "_django_curs_?" NO SCROLL CURSOR WITHOUT HOLD FOR SELECT "core_recipe"."id", "core_recipe"."title", "core_recipe"."time_minutes", "core_recipe"."price", "core_recipe"."link", "core_recipe"."description", "core_recipe"."image", "core_recipe"."image_variants" FROM "core_recipe" WHERE "core_recipe"."user_id" = ? ORDER BY "core_recipe"."id" ASC
+SELECT "core_recipe_tags"."recipe_id", "core_recipe_tags"."tag_id", "core_tag"."name" FROM "core_recipe_tags" INNER JOIN "core_tag" ON ("core_recipe_tags"."tag_id" = "core_tag"."id") WHERE "core_recipe_tags"."recipe_id" IN (...) ORDER BY "core_recipe_tags"."tag_id" ASC
+SELECT "core_recipe_ingredients"."recipe_id", "core_recipe_ingredients"."ingredient_id", "core_ingredient"."name" FROM "core_recipe_ingredients" INNER JOIN "core_ingredient" ON ("core_recipe_ingredients"."ingredient_id" = "core_ingredient"."id") WHERE "core_recipe_ingredients"."recipe_id" IN (...) ORDER BY "core_recipe_ingredients"."ingredient_id" ASC
@@ -0,0 +1,5 @@
+SELECT "authtoken_token"."key", "authtoken_token"."user_id", "authtoken_token"."created", "core_user"."id", "core_user"."last_login", "core_user"."is_superuser", "core_user"."email", "core_user"."name", "core_user"."is_active", "core_user"."is_staff", "core_user"."token_version" FROM "authtoken_token" INNER JOIN "core_user" ON ("authtoken_token"."user_id" = "core_user"."id") WHERE "authtoken_token"."key" = ? LIMIT ?
+SELECT "core_contentversion"."user_id", "core_contentversion"."version", "core_contentversion"."modified_at" FROM "core_contentversion" WHERE "core_contentversion"."user_id" = ? LIMIT ?
+SELECT "core_recipe"."id", "core_recipe"."user_id", "core_recipe"."title", "core_recipe"."time_minutes", "core_recipe"."price", "core_recipe"."link" FROM "core_recipe" WHERE "core_recipe"."user_id" = ? ORDER BY "core_recipe"."id" DESC LIMIT ?
+SELECT ("core_recipe_tags"."recipe_id") AS "_prefetch_related_val_recipe_id", "core_tag"."id", "core_tag"."name", "core_tag"."user_id" FROM "core_tag" INNER JOIN "core_recipe_tags" ON ("core_tag"."id" = "core_recipe_tags"."tag_id") WHERE "core_recipe_tags"."recipe_id" IN (...) ORDER BY "core_tag"."id" ASC
+SELECT ("core_recipe_ingredients"."recipe_id") AS "_prefetch_related_val_recipe_id", "core_ingredient"."id", "core_ingredient"."name", "core_ingredient"."user_id" FROM "core_ingredient" INNER JOIN "core_recipe_ingredients" ON ("core_ingredient"."id" = "core_recipe_ingredients"."ingredient_id") WHERE "core_recipe_ingredients"."recipe_id" IN (...) ORDER BY "core_ingredient"."id" ASC
@@ -0,0 +1,3 @@
+SELECT "authtoken_token"."key", "authtoken_token"."user_id", "authtoken_token"."created", "core_user"."id", "core_user"."last_login", "core_user"."is_superuser", "core_user"."email", "core_user"."name", "core_user"."is_active", "core_user"."is_staff", "core_user"."token_version" FROM "authtoken_token" INNER JOIN "core_user" ON ("authtoken_token"."user_id" = "core_user"."id") WHERE "authtoken_token"."key" = ? LIMIT ?
+SELECT "core_contentversion"."user_id", "core_contentversion"."version", "core_contentversion"."modified_at" FROM "core_contentversion" WHERE "core_contentversion"."user_id" = ? LIMIT ?
+SELECT DISTINCT "core_tag"."id", "core_tag"."name", "core_tag"."user_id" FROM "core_tag" WHERE "core_tag"."user_id" = ? ORDER BY "core_tag"."name" DESC
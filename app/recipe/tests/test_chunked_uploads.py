@@ -0,0 +1,323 @@
+"""
+Tests for chunked, resumable recipe image uploads.
+"""
+import hashlib
+import io
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import ImageUpload, Recipe
+from recipe import uploads
+
+UPLOADS_URL = reverse('recipe:imageupload-list')
+CHUNK_SIZE = 1024
+
+
+def detail_url(upload_id):
+    """Return the URL of an upload"""
+    return reverse('recipe:imageupload-detail', args=[upload_id])
+
+
+def chunk_url(upload_id, number):
+    """Return the URL of a chunk of an upload"""
+    return reverse('recipe:imageupload-chunk', args=[upload_id, number])
+
+
+def finalize_url(upload_id):
+    """Return the URL that finalizes an upload"""
+    return reverse('recipe:imageupload-finalize', args=[upload_id])
+
+
+def photo():
+    """Return the bytes of a JPEG a few chunks long"""
+    f = io.BytesIO()
+    Image.effect_noise((100, 100), 50).convert('RGB').save(f, format='JPEG')
+    return f.getvalue()
+
+
+class EndlessStream:
+    """A request body that never ends, counting the bytes read"""
+
+    def __init__(self):
+        self.read_bytes = 0
+
+    def read(self, size):
+        self.read_bytes += size
+        return b'x' * size
+
+
+@override_settings(
+    RECIPE_IMAGE_WORKERS=0,
+    RECIPE_UPLOAD_CHUNK_SIZE=CHUNK_SIZE,
+)
+class ChunkedUploadTests(TestCase):
+    """Test uploading recipe images in chunks"""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'chunks@example.com',
+            'testpass123'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Curry',
+            time_minutes=10,
+            price=Decimal('5.00'),
+        )
+        self.content = photo()
+
+    def _start(self, content=None, recipe=None):
+        """Start an upload of `content` and return its data"""
+        content = self.content if content is None else content
+        res = self.client.post(UPLOADS_URL, {
+            'recipe': (recipe or self.recipe).id,
+            'filename': 'photo.jpg',
+            'size': len(content),
+            'sha256': hashlib.sha256(content).hexdigest(),
+        })
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return res.data
+
+    def _put(self, upload_id, number, data):
+        """PUT one chunk"""
+        return self.client.put(
+            chunk_url(upload_id, number),
+            data,
+            content_type='application/octet-stream',
+        )
+
+    def _send_all(self, upload_id, content=None):
+        """PUT every chunk of `content`"""
+        content = self.content if content is None else content
+        for number in range(0, -(-len(content) // CHUNK_SIZE)):
+            res = self._put(upload_id, number, content[
+                number * CHUNK_SIZE:(number + 1) * CHUNK_SIZE])
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def _finalize(self, upload_id):
+        """Finalize an upload, running the work queued on commit"""
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(finalize_url(upload_id))
+
+    def test_start_upload(self):
+        """Test starting an upload tells the client how to split it"""
+        data = self._start()
+
+        self.assertEqual(data['chunk_size'], CHUNK_SIZE)
+        self.assertEqual(
+            data['chunk_count'], -(-len(self.content) // CHUNK_SIZE))
+        self.assertEqual(data['received_chunks'], [])
+        self.assertGreater(len(self.content), 2 * CHUNK_SIZE)
+
+    def test_other_users_recipe_rejected(self):
+        """Test uploads can only target the user's own recipes"""
+        other = get_user_model().objects.create_user(
+            'other@example.com', 'testpass123')
+        recipe = Recipe.objects.create(
+            user=other, title='Soup', time_minutes=5, price=Decimal('1.00'))
+
+        res = self.client.post(UPLOADS_URL, {
+            'recipe': recipe.id,
+            'filename': 'photo.jpg',
+            'size': 10,
+            'sha256': '0' * 64,
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('recipe', res.data)
+
+    @override_settings(RECIPE_UPLOAD_MAX_SIZE=100)
+    def test_too_large_rejected(self):
+        """Test uploads larger than the maximum are refused up front"""
+        res = self.client.post(UPLOADS_URL, {
+            'recipe': self.recipe.id,
+            'filename': 'photo.jpg',
+            'size': 101,
+            'sha256': '0' * 64,
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('size', res.data)
+
+    def test_resume(self):
+        """Test the received chunks are reported, in any order"""
+        upload_id = self._start()['id']
+        self._put(upload_id, 2, self.content[2 * CHUNK_SIZE:3 * CHUNK_SIZE])
+        self._put(upload_id, 0, self.content[:CHUNK_SIZE])
+
+        res = self.client.get(detail_url(upload_id))
+
+        self.assertEqual(res.data['received_chunks'], [0, 2])
+
+    def test_chunk_wrong_length_rejected(self):
+        """Test a truncated chunk is refused and not recorded"""
+        upload_id = self._start()['id']
+
+        res = self._put(upload_id, 0, self.content[:CHUNK_SIZE - 1])
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            self.client.get(detail_url(upload_id)).data['received_chunks'],
+            [])
+        # No temporary file is left behind either.
+        upload = ImageUpload.objects.get(id=upload_id)
+        self.assertEqual(os.listdir(uploads.upload_dir(upload)), [])
+
+    def test_chunk_number_out_of_range(self):
+        """Test chunks past the end of the file are refused"""
+        data = self._start()
+
+        res = self._put(data['id'], data['chunk_count'], b'x')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_chunk_streamed(self):
+        """Test an oversized body is read no further than needed"""
+        upload = ImageUpload.objects.get(id=self._start()['id'])
+        stream = EndlessStream()
+
+        with self.assertRaises(uploads.UploadError):
+            uploads.write_chunk(upload, 0, stream)
+
+        self.assertLessEqual(
+            stream.read_bytes, CHUNK_SIZE + uploads.BLOCK_SIZE)
+
+    def test_finalize(self):
+        """Test finalizing attaches the normalized image to the recipe"""
+        upload_id = self._start()['id']
+        self._send_all(upload_id)
+        upload = ImageUpload.objects.get(id=upload_id)
+
+        res = self._finalize(upload_id)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        self.assertTrue(self.recipe.image.name.endswith('.jpg'))
+        self.assertEqual(
+            res.data['bytes_saved'],
+            len(self.content) - self.recipe.image.size)
+        self.assertTrue(self.recipe.image_variants['variants'])
+        self.assertFalse(ImageUpload.objects.filter(id=upload_id).exists())
+        self.assertFalse(os.path.exists(uploads.upload_dir(upload)))
+
+    def test_finalize_missing_chunks(self):
+        """Test an upload can't be finalized before every chunk arrived"""
+        upload_id = self._start()['id']
+        self._put(upload_id, 0, self.content[:CHUNK_SIZE])
+
+        res = self._finalize(upload_id)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Missing chunks: 1', res.data['upload'][0])
+
+    def test_finalize_checksum_mismatch(self):
+        """Test a corrupted file is refused and the image unchanged"""
+        upload_id = self._start()['id']
+        corrupted = bytearray(self.content)
+        corrupted[-10] ^= 0xff
+        self._send_all(upload_id, bytes(corrupted))
+
+        res = self._finalize(upload_id)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('SHA-256', res.data['upload'][0])
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+        # The chunks are kept, so the broken ones can be sent again.
+        self.assertTrue(ImageUpload.objects.filter(id=upload_id).exists())
+
+    def test_finalize_invalid_image(self):
+        """Test a file that isn't an image is refused"""
+        content = b'not an image' * 200
+        upload_id = self._start(content)['id']
+        self._send_all(upload_id, content)
+
+        res = self._finalize(upload_id)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('image', res.data)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    def test_expired_upload_not_found(self):
+        """Test an expired upload can't be continued"""
+        upload_id = self._start()['id']
+        ImageUpload.objects.filter(id=upload_id).update(
+            expires_at=timezone.now())
+
+        res = self._put(upload_id, 0, self.content[:CHUNK_SIZE])
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_chunk_extends_expiry(self):
+        """Test each chunk keeps an active upload from expiring"""
+        upload_id = self._start()['id']
+        soon = timezone.now() + timedelta(seconds=5)
+        ImageUpload.objects.filter(id=upload_id).update(expires_at=soon)
+
+        self._put(upload_id, 0, self.content[:CHUNK_SIZE])
+
+        upload = ImageUpload.objects.get(id=upload_id)
+        self.assertGreater(upload.expires_at, soon)
+
+    def test_other_users_upload_not_found(self):
+        """Test users can't see or continue each other's uploads"""
+        upload_id = self._start()['id']
+        other = get_user_model().objects.create_user(
+            'other@example.com', 'testpass123')
+        self.client.force_authenticate(other)
+
+        res = self._put(upload_id, 0, self.content[:CHUNK_SIZE])
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_abandon_upload(self):
+        """Test deleting an upload deletes its chunks"""
+        upload_id = self._start()['id']
+        self._put(upload_id, 0, self.content[:CHUNK_SIZE])
+        upload = ImageUpload.objects.get(id=upload_id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.delete(detail_url(upload_id))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(os.path.exists(uploads.upload_dir(upload)))
+
+    def test_clear_expired_uploads(self):
+        """Test the command deletes expired and orphaned uploads only"""
+        active = self._start()['id']
+        expired = self._start()['id']
+        orphaned = self._start()['id']
+        for upload_id in [active, expired, orphaned]:
+            self._put(upload_id, 0, self.content[:CHUNK_SIZE])
+        ImageUpload.objects.filter(id=expired).update(
+            expires_at=timezone.now())
+        ImageUpload.objects.filter(id=orphaned).delete()
+
+        call_command('clear_expired_uploads', stdout=io.StringIO())
+
+        self.assertEqual(
+            list(ImageUpload.objects.values_list('id', flat=True)),
+            [ImageUpload.objects.get(id=active).id])
+        self.assertEqual(
+            os.listdir(uploads.uploads_root()), [str(active)])
@@ -0,0 +1,190 @@
+"""
+Tests for conditional GET requests on the recipe API.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils.http import http_date
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    ContentVersion,
+    Recipe,
+    Tag,
+    Ingredient
+)
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+def detail_url(recipe_id):
+    """Return recipe detail URL"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_recipe(user, **params):
+    """Helper function to create a recipe"""
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.00'),
+    }
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class ConditionalGetTests(TestCase):
+    """Test ETag and Last-Modified handling"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'etag@example.com',
+            'testpass123'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(user=self.user)
+
+    def _etag(self, url, params=None):
+        """GET a URL and return its ETag"""
+        res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res['ETag']
+
+    def _is_current(self, url, etag, params=None):
+        """Return True if the server answers 304 for `etag`"""
+        res = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        return res.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_validators_sent(self):
+        """Test list and detail responses carry ETag and Last-Modified"""
+        for url in [RECIPES_URL, detail_url(self.recipe.id), TAGS_URL,
+                    INGREDIENTS_URL]:
+            res = self.client.get(url)
+
+            self.assertTrue(res.has_header('ETag'))
+            self.assertTrue(res.has_header('Last-Modified'))
+
+    def test_not_modified_without_running_the_list(self):
+        """Test a current ETag gets a 304 after one indexed lookup"""
+        etag = self._etag(RECIPES_URL)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b'')
+
+    def test_if_modified_since(self):
+        """Test If-Modified-Since is honoured"""
+        modified_at = ContentVersion.objects.get(user=self.user).modified_at
+        current = http_date((modified_at + timedelta(seconds=1)).timestamp())
+        stale = http_date((modified_at - timedelta(seconds=5)).timestamp())
+
+        res = self.client.get(RECIPES_URL, HTTP_IF_MODIFIED_SINCE=current)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        res = self.client.get(RECIPES_URL, HTTP_IF_MODIFIED_SINCE=stale)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_etag_depends_on_query(self):
+        """Test different query strings get different ETags"""
+        page = self._etag(RECIPES_URL, {'page_size': 1})
+
+        self.assertNotEqual(page, self._etag(RECIPES_URL))
+        self.assertFalse(self._is_current(RECIPES_URL, page))
+
+    def test_etag_depends_on_user(self):
+        """Test another user doesn't share ETags"""
+        etag = self._etag(RECIPES_URL)
+        other = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123'
+        )
+        self.client.force_authenticate(other)
+
+        self.assertFalse(self._is_current(RECIPES_URL, etag))
+
+    def test_recipe_writes_change_etag(self):
+        """Test creating, updating and deleting recipes"""
+        etag = self._etag(RECIPES_URL)
+        payload = {'title': 'New', 'time_minutes': 5, 'price': '1.00'}
+        res = self.client.post(RECIPES_URL, payload, format='json')
+        self.assertFalse(self._is_current(RECIPES_URL, etag))
+
+        etag = self._etag(RECIPES_URL)
+        self.client.patch(detail_url(res.data['id']), {'title': 'Newer'})
+        self.assertFalse(self._is_current(RECIPES_URL, etag))
+
+        etag = self._etag(RECIPES_URL)
+        self.client.delete(detail_url(res.data['id']))
+        self.assertFalse(self._is_current(RECIPES_URL, etag))
+
+    def test_recipe_write_bumps_version_once(self):
+        """Test a write of a recipe and its links is one version bump"""
+        version = ContentVersion.objects.get(user=self.user).version
+        payload = {
+            'title': 'Curry',
+            'time_minutes': 5,
+            'price': '1.00',
+            'tags': [{'name': 'Thai'}],
+            'ingredients': [{'name': 'Rice'}],
+        }
+
+        res = self.client.post(RECIPES_URL, payload, format='json')
+        created = ContentVersion.objects.get(user=self.user).version
+        payload['tags'] = [{'name': 'Lao'}]
+        payload['ingredients'] = [{'name': 'Noodles'}]
+        self.client.put(detail_url(res.data['id']), payload, format='json')
+        updated = ContentVersion.objects.get(user=self.user).version
+
+        self.assertEqual(created, version + 1)
+        self.assertEqual(updated, created + 1)
+
+    def test_link_changes_change_etag(self):
+        """Test adding and removing tags and ingredients on a recipe"""
+        tag = Tag.objects.create(user=self.user, name='Thai')
+        ingredient = Ingredient.objects.create(user=self.user, name='Rice')
+        url = detail_url(self.recipe.id)
+
+        for change in [
+            lambda: self.recipe.tags.add(tag),
+            lambda: self.recipe.ingredients.add(ingredient),
+            lambda: tag.recipe_set.remove(self.recipe),
+            lambda: self.recipe.ingredients.clear(),
+        ]:
+            etag = self._etag(url)
+            change()
+            self.assertFalse(self._is_current(url, etag))
+
+    def test_tag_rename_changes_recipe_etag(self):
+        """Test renaming a tag changes recipes that embed it"""
+        tag = Tag.objects.create(user=self.user, name='Thai')
+        self.recipe.tags.add(tag)
+        etag = self._etag(RECIPES_URL)
+
+        self.client.patch(
+            reverse('recipe:tag-detail', args=[tag.id]), {'name': 'Lao'})
+
+        self.assertFalse(self._is_current(RECIPES_URL, etag))
+
+    def test_other_users_writes_keep_etag(self):
+        """Test writes by another user don't invalidate this user's data"""
+        etag = self._etag(RECIPES_URL)
+        other = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123'
+        )
+
+        create_recipe(user=other)
+        Tag.objects.create(user=other, name='Lunch')
+
+        self.assertTrue(self._is_current(RECIPES_URL, etag))
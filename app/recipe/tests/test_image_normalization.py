@@ -0,0 +1,199 @@
+"""
+Tests for normalizing uploaded recipe images.
+"""
+import io
+import os
+import subprocess
+import sys
+import tempfile
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from recipe import images
+
+# Run in a fresh interpreter, so its peak memory is only this upload's.
+# Pillow's pixel buffers are invisible to tracemalloc, so the peak
+# resident size is read from the kernel.
+MEMORY_SCRIPT = '''
+import os, sys
+import django
+django.setup()
+from django.core.files.uploadedfile import UploadedFile
+from recipe.serializers import RecipeImageSerializer
+
+def peak_rss():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) * 1024
+
+path = sys.argv[1]
+before = peak_rss()
+with open(path, 'rb') as f:
+    upload = UploadedFile(
+        f, 'photo.jpg', 'image/jpeg', os.path.getsize(path))
+    serializer = RecipeImageSerializer(data={'image': upload})
+    assert serializer.is_valid(), serializer.errors
+print(peak_rss() - before)
+'''
+
+
+def image_upload_url(recipe_id):
+    """Return URL for recipe image upload"""
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+def image_file(size=(1000, 500), fmt='JPEG', mode='RGB', **params):
+    """Return an in-memory image to upload"""
+    f = io.BytesIO()
+    color = (255, 165, 0, 128) if mode == 'RGBA' else (255, 165, 0)
+    Image.new(mode, size, color).save(f, format=fmt, **params)
+    f.name = f'photo.{fmt.lower()}'
+    f.seek(0)
+    return f
+
+
+def exif(orientation):
+    """Return EXIF data with an orientation, a camera and a location"""
+    data = Image.Exif()
+    data[images.ORIENTATION_TAG] = orientation
+    data[0x010F] = 'Camera maker'
+    # GPSInfo, with the latitude reference set.
+    data[0x8825] = {1: 'N'}
+    return data.tobytes()
+
+
+@override_settings(RECIPE_IMAGE_WORKERS=0, RECIPE_IMAGE_MAX_SIZE=400)
+class ImageNormalizationTests(TestCase):
+    """Test uploaded images are normalized before they're stored"""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'normalize@example.com',
+            'testpass123'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Curry',
+            time_minutes=10,
+            price=Decimal('5.00'),
+        )
+
+    def _upload(self, image):
+        """Upload an image and return the response and stored image"""
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(
+                image_upload_url(self.recipe.id),
+                {'image': image},
+                format='multipart',
+            )
+        if res.status_code != status.HTTP_200_OK:
+            return res, None
+        self.recipe.refresh_from_db()
+        with default_storage.open(self.recipe.image.name) as f:
+            stored = Image.open(f)
+            stored.load()
+        return res, stored
+
+    def test_large_image_scaled_down(self):
+        """Test images are scaled down to fit in the maximum size"""
+        _, stored = self._upload(image_file(size=(2000, 1000)))
+
+        self.assertEqual(stored.size, (400, 200))
+        self.assertEqual(stored.format, 'JPEG')
+
+    def test_small_image_not_enlarged(self):
+        """Test images smaller than the maximum keep their size"""
+        _, stored = self._upload(image_file(size=(300, 200)))
+
+        self.assertEqual(stored.size, (300, 200))
+
+    def test_orientation_applied_and_metadata_stripped(self):
+        """Test the EXIF orientation is applied, then EXIF removed"""
+        # Orientation 6: the camera was turned, display rotated 90° CW.
+        _, stored = self._upload(
+            image_file(size=(800, 400), exif=exif(6)))
+
+        self.assertEqual(stored.size, (200, 400))
+        self.assertEqual(dict(stored.getexif()), {})
+        self.assertNotIn('exif', stored.info)
+
+    def test_transparent_png_kept(self):
+        """Test transparent images stay PNG with their alpha channel"""
+        _, stored = self._upload(image_file(fmt='PNG', mode='RGBA'))
+
+        self.assertEqual(stored.format, 'PNG')
+        self.assertEqual(stored.mode, 'RGBA')
+        self.assertTrue(self.recipe.image.name.endswith('.png'))
+
+    def test_opaque_png_becomes_jpeg(self):
+        """Test images without transparency are stored as JPEG"""
+        _, stored = self._upload(image_file(fmt='PNG'))
+
+        self.assertEqual(stored.format, 'JPEG')
+        self.assertTrue(self.recipe.image.name.endswith('.jpg'))
+
+    def test_bytes_saved_reported(self):
+        """Test the upload response reports the bytes saved"""
+        upload = image_file(size=(2000, 1000), quality=100)
+        size = len(upload.getvalue())
+
+        res, _ = self._upload(upload)
+
+        self.assertEqual(
+            res.data['bytes_saved'], size - self.recipe.image.size)
+        self.assertGreater(res.data['bytes_saved'], 0)
+
+    @override_settings(RECIPE_IMAGE_MAX_PIXELS=1000)
+    def test_too_many_pixels_rejected(self):
+        """Test images with more pixels than allowed are rejected"""
+        res, _ = self._upload(image_file(size=(100, 100)))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('image', res.data)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    @skipUnless(os.path.exists('/proc/self/status'), 'Linux only')
+    def test_50_megapixel_upload_memory_is_bounded(self):
+        """Test a 50 MP photo is normalized without decoding it fully"""
+        width, height = 8660, 5774
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as f:
+            Image.new('RGB', (width, height), (255, 165, 0)).save(
+                f, format='JPEG')
+            f.flush()
+            output = subprocess.run(
+                [sys.executable, '-c', MEMORY_SCRIPT, f.name],
+                env=dict(
+                    os.environ,
+                    DJANGO_SETTINGS_MODULE='app.settings',
+                    RECIPE_IMAGE_MAX_SIZE='2560',
+                ),
+                cwd=os.path.dirname(os.path.dirname(images.__file__)),
+                capture_output=True,
+                check=True,
+                text=True,
+            ).stdout
+
+        peak = int(output.split()[-1])
+        # Decoding it at full resolution takes over 250 MB; the pixels
+        # alone are 150 MB.
+        self.assertLess(peak, width * height * 3)
@@ -0,0 +1,187 @@
+"""
+Tests for serving recipe images through the proxy.
+"""
+import io
+import os
+import tempfile
+from decimal import Decimal
+from unittest.mock import patch
+from urllib.parse import unquote
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+
+ACCEL_LOCATION = '/protected-media/'
+
+
+def media_url(name):
+    """Return the URL of a media file"""
+    return reverse('recipe:media', args=[name])
+
+
+def image_file():
+    """Return an in-memory image to upload"""
+    f = io.BytesIO()
+    Image.new('RGB', (300, 200), (255, 165, 0)).save(f, format='JPEG')
+    f.name = 'photo.jpg'
+    f.seek(0)
+    return f
+
+
+class NginxStandIn:
+    """
+    Enough of the proxy in front of the app to follow X-Accel-Redirect:
+    the internal location serves MEDIA_ROOT with the cache headers of
+    proxy/default.conf.tpl.
+    """
+
+    def __init__(self, client, media_root):
+        self.client = client
+        self.media_root = media_root
+
+    def get(self, url):
+        """Return (app response, body and headers sent to the client)"""
+        # Python must not read the file, only nginx does.
+        with patch('builtins.open', side_effect=AssertionError(
+                'The app opened a file')):
+            response = self.client.get(url)
+        redirect = response.get('X-Accel-Redirect')
+        if redirect is None:
+            return response, response.content, dict(response.items())
+
+        assert redirect.startswith(ACCEL_LOCATION), redirect
+        path = os.path.join(
+            self.media_root, unquote(redirect[len(ACCEL_LOCATION):]))
+        with open(path, 'rb') as f:
+            body = f.read()
+        headers = {
+            'Content-Type': response['Content-Type'],
+            'Cache-Control': 'private, max-age=31536000, immutable',
+        }
+        return response, body, headers
+
+
+@override_settings(
+    RECIPE_IMAGE_WORKERS=0,
+    MEDIA_ACCEL_REDIRECT_LOCATION=ACCEL_LOCATION,
+)
+class RecipeMediaTests(TestCase):
+    """Test recipe images are only served to the users of the recipe"""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.media_root = media_root.name
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'media@example.com',
+            'testpass123'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = self._recipe(self.user)
+        self.nginx = NginxStandIn(self.client, self.media_root)
+
+    def _recipe(self, user):
+        """Create a recipe with an uploaded image"""
+        recipe = Recipe.objects.create(
+            user=user,
+            title='Curry',
+            time_minutes=10,
+            price=Decimal('5.00'),
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            client.post(
+                reverse('recipe:recipe-upload-image', args=[recipe.id]),
+                {'image': image_file()},
+                format='multipart',
+            )
+        recipe.refresh_from_db()
+        return recipe
+
+    def test_image_sent_by_proxy(self):
+        """Test the app only hands the file over to the proxy"""
+        response, body, headers = self.nginx.get(
+            media_url(self.recipe.image.name))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response['X-Accel-Redirect'],
+            ACCEL_LOCATION + self.recipe.image.name)
+        self.assertEqual(response.content, b'')
+        with self.recipe.image.open('rb') as f:
+            self.assertEqual(body, f.read())
+        self.assertEqual(headers['Content-Type'], 'image/jpeg')
+        self.assertIn('immutable', headers['Cache-Control'])
+
+    def test_variant_served(self):
+        """Test the variants of an image are served too"""
+        name = self.recipe.image_variants['variants']['thumbnail']['webp']
+
+        response, body, headers = self.nginx.get(media_url(name))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(headers['Content-Type'], 'image/webp')
+        self.assertTrue(body)
+
+    def test_image_urls_point_at_view(self):
+        """Test the API links to the media view"""
+        res = self.client.get(
+            reverse('recipe:recipe-detail', args=[self.recipe.id]))
+
+        self.assertEqual(
+            res.data['image'],
+            'http://testserver' + media_url(self.recipe.image.name))
+
+    def test_other_users_image_not_found(self):
+        """Test users can't fetch images of recipes they don't own"""
+        other = get_user_model().objects.create_user(
+            'other@example.com', 'testpass123')
+        self.client.force_authenticate(other)
+
+        response, _, _ = self.nginx.get(media_url(self.recipe.image.name))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn('X-Accel-Redirect', response)
+
+    def test_shared_image_served_to_each_owner(self):
+        """Test a photo both users uploaded is served to both"""
+        other = get_user_model().objects.create_user(
+            'other@example.com', 'testpass123')
+        other_recipe = self._recipe(other)
+        self.client.force_authenticate(other)
+
+        response, _, _ = self.nginx.get(media_url(self.recipe.image.name))
+
+        self.assertEqual(other_recipe.image.name, self.recipe.image.name)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_authentication_required(self):
+        """Test anonymous requests are refused"""
+        self.client.force_authenticate(None)
+
+        response, _, _ = self.nginx.get(media_url(self.recipe.image.name))
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(MEDIA_ACCEL_REDIRECT_LOCATION='')
+    def test_served_by_django_without_proxy(self):
+        """Test the file is sent by the app when there is no proxy"""
+        res = self.client.get(media_url(self.recipe.image.name))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn('X-Accel-Redirect', res)
+        with self.recipe.image.open('rb') as f:
+            self.assertEqual(b''.join(res.streaming_content), f.read())
@@ -0,0 +1,369 @@
+"""
+Query budgets of the recipe, tag and ingredient API actions.
+"""
+import hashlib
+import io
+import os
+import tempfile
+from decimal import Decimal
+from itertools import count
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import (
+    ImageUpload,
+    Recipe,
+    Tag,
+    Ingredient
+)
+from core.tests.query_budget import QueryBudget, QueryBudgetMixin
+from recipe import uploads
+from recipe.urls import router
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+# The queries of each action, whatever the number of items. Token
+# authentication is one of them, and each write bumps the content
+# version once.
+BUDGETS = {
+    'recipe-list': QueryBudget(5),
+    'recipe-retrieve': QueryBudget(5),
+    'recipe-create': QueryBudget(15),
+    'recipe-update': QueryBudget(23),
+    'recipe-partial_update': QueryBudget(14),
+    'recipe-destroy': QueryBudget(7),
+    'recipe-bulk': QueryBudget(28),
+    'recipe-export': QueryBudget(4),
+    'recipe-upload_image': QueryBudget(4),
+    'tag-list': QueryBudget(3),
+    'tag-update': QueryBudget(5),
+    'tag-partial_update': QueryBudget(5),
+    'tag-destroy': QueryBudget(5),
+    'ingredient-list': QueryBudget(3),
+    'ingredient-update': QueryBudget(5),
+    'ingredient-partial_update': QueryBudget(5),
+    'ingredient-destroy': QueryBudget(5),
+    'imageupload-create': QueryBudget(3),
+    'imageupload-retrieve': QueryBudget(2),
+    'imageupload-destroy': QueryBudget(3),
+    'imageupload-chunk': QueryBudget(3),
+    'imageupload-finalize': QueryBudget(8),
+}
+
+
+def viewset_actions():
+    """Return '<basename>-<action>' for every routed viewset action"""
+    names = set()
+    for _, viewset, basename in router.registry:
+        for route in router.get_routes(viewset):
+            names.update(
+                f'{basename}-{action}'
+                for action in route.mapping.values()
+                if hasattr(viewset, action)
+            )
+    return names
+
+
+@override_settings(RECIPE_RESPONSE_CACHE=False)
+class RecipeQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Test each action issues a bounded number of queries"""
+    snapshot_dir = os.path.join(os.path.dirname(__file__), 'queries')
+
+    def setUp(self):
+        self.numbers = count()
+
+    def _client(self):
+        """Return a token-authenticated client for a new user"""
+        self.user = get_user_model().objects.create_user(
+            f'budget{next(self.numbers)}@example.com',
+            'testpass123'
+        )
+        client = APIClient()
+        token = Token.objects.create(user=self.user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return client
+
+    def _recipes(self, n, relations=2):
+        """Create n recipes linked to `relations` tags and ingredients"""
+        tags = [Tag.objects.create(user=self.user, name=f'Tag {i}')
+                for i in range(relations)]
+        ingredients = [
+            Ingredient.objects.create(user=self.user, name=f'Ingredient {i}')
+            for i in range(relations)
+        ]
+        recipes = []
+        for i in range(n):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=f'Recipe {i}',
+                time_minutes=i,
+                price=Decimal('5.00'),
+            )
+            recipe.tags.add(*tags)
+            recipe.ingredients.add(*ingredients)
+            recipes.append(recipe)
+        return recipes
+
+    def _payload(self, n):
+        """Return a recipe payload with n tags and n ingredients"""
+        return {
+            'title': 'Curry',
+            'time_minutes': 30,
+            'price': '7.50',
+            'tags': [{'name': f'New tag {i}'} for i in range(n)],
+            'ingredients': [
+                {'name': f'New ingredient {i}'} for i in range(n)],
+        }
+
+    def _detail_url(self, n, basename='recipe', model=None):
+        """Return the detail URL of an object with n relations"""
+        recipe = self._recipes(max(n, 1), relations=n)[0]
+        if model is None:
+            return reverse(f'recipe:{basename}-detail', args=[recipe.id])
+        obj = model.objects.filter(user=self.user).first()
+        return reverse(f'recipe:{basename}-detail', args=[obj.id])
+
+    def test_every_action_has_a_budget(self):
+        """Test no routed action is missing from the budgets"""
+        self.assertEqual(viewset_actions(), set(BUDGETS))
+
+    def test_recipe_list(self):
+        """Test listing n recipes"""
+        def prepare(n):
+            client = self._client()
+            self._recipes(n)
+            return lambda: client.get(RECIPES_URL)
+
+        self.assertQueryBudget(
+            'recipe-list', BUDGETS['recipe-list'], prepare)
+
+    def test_recipe_retrieve(self):
+        """Test retrieving a recipe with n tags and ingredients"""
+        def prepare(n):
+            client = self._client()
+            url = self._detail_url(n)
+            return lambda: client.get(url)
+
+        self.assertQueryBudget(
+            'recipe-retrieve', BUDGETS['recipe-retrieve'], prepare)
+
+    def test_recipe_create(self):
+        """Test creating a recipe with n new tags and ingredients"""
+        def prepare(n):
+            client = self._client()
+            payload = self._payload(n)
+            return lambda: client.post(RECIPES_URL, payload, format='json')
+
+        self.assertQueryBudget(
+            'recipe-create', BUDGETS['recipe-create'], prepare)
+
+    def test_recipe_update(self):
+        """Test replacing a recipe's n tags and ingredients"""
+        def prepare(n):
+            client = self._client()
+            url = self._detail_url(n)
+            payload = self._payload(n)
+            return lambda: client.put(url, payload, format='json')
+
+        self.assertQueryBudget(
+            'recipe-update', BUDGETS['recipe-update'], prepare)
+
+    def test_recipe_partial_update(self):
+        """Test replacing n tags of a recipe"""
+        def prepare(n):
+            client = self._client()
+            url = self._detail_url(n)
+            payload = {'tags': self._payload(n)['tags']}
+            return lambda: client.patch(url, payload, format='json')
+
+        self.assertQueryBudget(
+            'recipe-partial_update', BUDGETS['recipe-partial_update'],
+            prepare)
+
+    def test_recipe_destroy(self):
+        """Test deleting a recipe with n tags and ingredients"""
+        def prepare(n):
+            client = self._client()
+            url = self._detail_url(n)
+            return lambda: client.delete(url)
+
+        self.assertQueryBudget(
+            'recipe-destroy', BUDGETS['recipe-destroy'], prepare)
+
+    def test_recipe_bulk(self):
+        """Test creating, updating and deleting n recipes at once"""
+        def prepare(n):
+            client = self._client()
+            recipes = self._recipes(2 * n)
+            payload = {
+                'create': [
+                    dict(self._payload(2), title=f'Bulk {i}')
+                    for i in range(n)
+                ],
+                'update': [
+                    {'id': recipe.id, 'title': 'Renamed',
+                     'tags': [{'name': 'Tag 0'}]}
+                    for recipe in recipes[:n]
+                ],
+                'delete': [recipe.id for recipe in recipes[n:]],
+            }
+            url = reverse('recipe:recipe-bulk')
+            return lambda: client.post(url, payload, format='json')
+
+        self.assertQueryBudget(
+            'recipe-bulk', BUDGETS['recipe-bulk'], prepare)
+
+    @override_settings(RECIPE_EXPORT_CHUNK_SIZE=100)
+    def test_recipe_export(self):
+        """Test exporting n recipes"""
+        def prepare(n):
+            client = self._client()
+            self._recipes(n)
+            url = reverse('recipe:recipe-export')
+            return lambda: client.get(url)
+
+        self.assertQueryBudget(
+            'recipe-export', BUDGETS['recipe-export'], prepare)
+
+    def test_recipe_upload_image(self):
+        """Test uploading an image to a recipe with n relations"""
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+
+        def prepare(n):
+            client = self._client()
+            recipe = self._recipes(1, relations=n)[0]
+            url = reverse('recipe:recipe-upload-image', args=[recipe.id])
+
+            def send():
+                with tempfile.NamedTemporaryFile(suffix='.jpg') as image, \
+                        override_settings(MEDIA_ROOT=media_root.name):
+                    Image.new('RGB', (10, 10)).save(image, format='JPEG')
+                    image.seek(0)
+                    return client.post(
+                        url, {'image': image}, format='multipart')
+            return send
+
+        self.assertQueryBudget(
+            'recipe-upload_image', BUDGETS['recipe-upload_image'], prepare)
+
+    def _upload(self, n):
+        """Return an upload of a JPEG in n chunks, all received"""
+        f = io.BytesIO()
+        Image.new('RGB', (10, 10)).save(f, format='JPEG')
+        content = f.getvalue()
+        chunk_size = -(-len(content) // n)
+        upload = ImageUpload.objects.create(
+            user=self.user,
+            recipe=self._recipes(1, relations=n)[0],
+            filename='photo.jpg',
+            size=len(content),
+            sha256=hashlib.sha256(content).hexdigest(),
+            chunk_size=chunk_size,
+            expires_at=uploads.expiry(),
+        )
+        for number in range(upload.chunk_count):
+            uploads.write_chunk(upload, number, io.BytesIO(
+                content[number * chunk_size:(number + 1) * chunk_size]))
+        return upload
+
+    def test_upload_actions(self):
+        """Test the chunked upload actions with n chunks"""
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        def prepare_create(n):
+            client = self._client()
+            payload = {
+                'recipe': self._recipes(1, relations=n)[0].id,
+                'filename': 'photo.jpg',
+                'size': 10,
+                'sha256': '0' * 64,
+            }
+            url = reverse('recipe:imageupload-list')
+            return lambda: client.post(url, payload, format='json')
+
+        def prepare_detail(method, n):
+            client = self._client()
+            url = reverse(
+                'recipe:imageupload-detail', args=[self._upload(n).id])
+            return lambda: getattr(client, method)(url)
+
+        def prepare_chunk(n):
+            client = self._client()
+            upload = self._upload(n)
+            url = reverse(
+                'recipe:imageupload-chunk', args=[upload.id, 0])
+            # Sent again, as when resuming.
+            with open(os.path.join(uploads.upload_dir(upload), '0'),
+                      'rb') as f:
+                data = f.read()
+            return lambda: client.put(
+                url, data, content_type='application/octet-stream')
+
+        def prepare_finalize(n):
+            client = self._client()
+            url = reverse(
+                'recipe:imageupload-finalize', args=[self._upload(n).id])
+            return lambda: client.post(url)
+
+        actions = [
+            ('create', prepare_create),
+            ('retrieve', lambda n: prepare_detail('get', n)),
+            ('destroy', lambda n: prepare_detail('delete', n)),
+            ('chunk', prepare_chunk),
+            ('finalize', prepare_finalize),
+        ]
+        for action, prepare in actions:
+            name = f'imageupload-{action}'
+            with self.subTest(name):
+                self.assertQueryBudget(name, BUDGETS[name], prepare)
+
+    def _check_attr_actions(self, basename, model):
+        """Check the actions of the tag or ingredient viewset"""
+        list_url = reverse(f'recipe:{basename}-list')
+
+        def prepare_list(n):
+            client = self._client()
+            self._recipes(1, relations=n)
+            return lambda: client.get(list_url)
+
+        def prepare_update(method, n):
+            client = self._client()
+            # An object linked to n recipes.
+            url = self._detail_url(n, basename, model)
+            return lambda: getattr(client, method)(
+                url, {'name': 'Renamed'}, format='json')
+
+        def prepare_destroy(n):
+            client = self._client()
+            url = self._detail_url(n, basename, model)
+            return lambda: client.delete(url)
+
+        actions = [
+            ('list', prepare_list),
+            ('update', lambda n: prepare_update('put', n)),
+            ('partial_update', lambda n: prepare_update('patch', n)),
+            ('destroy', prepare_destroy),
+        ]
+        for action, prepare in actions:
+            name = f'{basename}-{action}'
+            with self.subTest(name):
+                self.assertQueryBudget(name, BUDGETS[name], prepare)
+
+    def test_tag_actions(self):
+        """Test the tag actions"""
+        self._check_attr_actions('tag', Tag)
+
+    def test_ingredient_actions(self):
+        """Test the ingredient actions"""
+        self._check_attr_actions('ingredient', Ingredient)
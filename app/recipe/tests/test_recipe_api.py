@@ -4,10 +4,13 @@ Tests for recipe API endpoints.
 from decimal import Decimal
 import tempfile
 import os
+from unittest.mock import patch
 
 from PIL import Image
 
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 
@@ -20,6 +23,8 @@ from core.models import (
     Ingredient
 )
 
+from recipe import views
+from recipe.pagination import RecipeCursorPagination
 from recipe.serializers import (
     RecipeSerializer,
     RecipeDetailSerializer
@@ -57,6 +62,14 @@ def create_user(**params):
     return get_user_model().objects.create_user(**params)
 
 
+def recipe_query(ctx):
+    """Return the SQL of the first recipe query captured by `ctx`"""
+    return next(
+        query['sql'] for query in ctx.captured_queries
+        if 'FROM "core_recipe"' in query['sql']
+    )
+
+
 class PublicRecipeApiTests(TestCase):
     """Test unauthenticated recipe API access"""
 
@@ -91,7 +104,7 @@ class PrivateRecipeApiTests(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         # compare the response data with the serialized data
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_recipes_limited_to_user(self):
         """Test list of recipes are only for the authenticated user"""
@@ -106,7 +119,7 @@ class PrivateRecipeApiTests(TestCase):
 
         serializer = RecipeSerializer(recipes, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_recipe_detail_view(self):
         """Test viewing a recipe detail"""
@@ -433,9 +446,9 @@ class PrivateRecipeApiTests(TestCase):
         serializer1 = RecipeSerializer(recipe1)
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
 
     def test_filter_by_ingredients(self):
         """Test filtering recipes by ingredients"""
@@ -455,9 +468,162 @@ class PrivateRecipeApiTests(TestCase):
         serializer1 = RecipeSerializer(recipe1)
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
+
+    def test_filter_by_all_tags(self):
+        """Test match=all only returns recipes with every tag"""
+        recipe1 = create_recipe(user=self.user, title='Thai curry')
+        recipe2 = create_recipe(user=self.user, title='Pasta')
+        tag1 = Tag.objects.create(user=self.user, name='Thai')
+        tag2 = Tag.objects.create(user=self.user, name='Dinner')
+        recipe1.tags.add(tag1, tag2)
+        recipe2.tags.add(tag2)
+
+        res = self.client.get(
+            RECIPES_URL,
+            {'tags': f'{tag1.id},{tag2.id}', 'match': 'all'}
+        )
+
+        ids = [recipe['id'] for recipe in res.data['results']]
+        self.assertEqual(ids, [recipe1.id])
+
+    def test_filter_by_all_ingredients(self):
+        """Test match=all applies to ingredients too"""
+        recipe1 = create_recipe(user=self.user, title='Pesto')
+        recipe2 = create_recipe(user=self.user, title='Salad')
+        ingredient1 = Ingredient.objects.create(user=self.user, name='Basil')
+        ingredient2 = Ingredient.objects.create(user=self.user, name='Oil')
+        recipe1.ingredients.add(ingredient1, ingredient2)
+        recipe2.ingredients.add(ingredient2)
+
+        res = self.client.get(
+            RECIPES_URL,
+            {
+                'ingredients': f'{ingredient1.id},{ingredient2.id},'
+                               f'{ingredient1.id}',
+                'match': 'all',
+            }
+        )
+
+        ids = [recipe['id'] for recipe in res.data['results']]
+        self.assertEqual(ids, [recipe1.id])
+
+    def test_filter_returns_recipe_once(self):
+        """Test a recipe matching several tags is listed once"""
+        recipe = create_recipe(user=self.user)
+        tag1 = Tag.objects.create(user=self.user, name='Thai')
+        tag2 = Tag.objects.create(user=self.user, name='Dinner')
+        recipe.tags.add(tag1, tag2)
+
+        res = self.client.get(RECIPES_URL, {'tags': f'{tag1.id},{tag2.id}'})
+
+        ids = [recipe['id'] for recipe in res.data['results']]
+        self.assertEqual(ids, [recipe.id])
+
+
+class RecipePaginationTests(TestCase):
+    """Test paginating the recipe list"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(
+            email='pages@example.com', password='testpass123')
+        self.client.force_authenticate(self.user)
+
+    def _collect_ids(self, params):
+        """Follow next links and return recipe ids in page order"""
+        ids = []
+        res = self.client.get(RECIPES_URL, params)
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            ids.extend(recipe['id'] for recipe in res.data['results'])
+            if res.data['next'] is None:
+                return ids
+            res = self.client.get(res.data['next'])
+
+    def test_list_is_paginated(self):
+        """Test the list returns a page and a link to the next one"""
+        for i in range(3):
+            create_recipe(user=self.user, title=f'Recipe {i}')
+
+        res = self.client.get(RECIPES_URL, {'page_size': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertIsNotNone(res.data['next'])
+        self.assertIsNone(res.data['previous'])
+
+    def test_pages_cover_all_recipes_newest_first(self):
+        """Test following cursors returns every recipe exactly once"""
+        recipes = [create_recipe(user=self.user) for _ in range(7)]
+
+        ids = self._collect_ids({'page_size': 3})
+
+        expected = sorted((recipe.id for recipe in recipes), reverse=True)
+        self.assertEqual(ids, expected)
+
+    def test_cursor_is_opaque(self):
+        """Test the cursor doesn't expose the recipe id in the URL"""
+        recipes = [create_recipe(user=self.user) for _ in range(2)]
+
+        res = self.client.get(RECIPES_URL, {'page_size': 1})
+
+        self.assertIn('cursor=', res.data['next'])
+        self.assertNotIn(f'={recipes[0].id}', res.data['next'])
+
+    def test_default_page_size(self):
+        """Test the configured page size is used by default"""
+        for _ in range(3):
+            create_recipe(user=self.user)
+
+        with patch.object(RecipeCursorPagination, 'page_size', 2):
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(len(res.data['results']), 2)
+
+    def test_page_size_capped(self):
+        """Test page_size can't go above the maximum"""
+        for _ in range(3):
+            create_recipe(user=self.user)
+
+        with patch.object(RecipeCursorPagination, 'max_page_size', 2):
+            res = self.client.get(RECIPES_URL, {'page_size': 1000})
+
+        self.assertEqual(len(res.data['results']), 2)
+
+    def test_pagination_with_filters(self):
+        """Test cursors keep the tag and ingredient filters"""
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        matching = []
+        for i in range(5):
+            recipe = create_recipe(user=self.user)
+            create_recipe(user=self.user)
+            recipe.tags.add(tag)
+            if i % 2 == 0:
+                recipe.ingredients.add(ingredient)
+                matching.append(recipe.id)
+
+        ids = self._collect_ids({
+            'tags': f'{tag.id}',
+            'ingredients': f'{ingredient.id}',
+            'page_size': 2,
+        })
+
+        self.assertEqual(ids, sorted(matching, reverse=True))
+
+    def test_list_query_count_on_deep_page(self):
+        """Test a later page costs the same queries as the first"""
+        for _ in range(6):
+            create_recipe(user=self.user)
+        first = self.client.get(RECIPES_URL, {'page_size': 2})
+        second = first.data['next']
+
+        with self.assertNumQueries(4):
+            res = self.client.get(second)
+        self.assertEqual(len(res.data['results']), 2)
 
 
 class ImageUploadTests(TestCase):
@@ -503,3 +669,354 @@ class ImageUploadTests(TestCase):
         )
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecipeFilterPlanTests(TestCase):
+    """Test the query plans of the recipe filters"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(
+            email='plans@example.com', password='testpass123')
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Thai')
+        self.ingredient = Ingredient.objects.create(
+            user=self.user, name='Ginger')
+
+    def _explain_list_query(self, params):
+        """Run the list request and EXPLAIN the recipe query it ran"""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(RECIPES_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        sql = recipe_query(ctx)
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN {sql}')
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        return sql, plan
+
+    def test_any_filter_has_no_distinct(self):
+        """Test filtering by any tag or ingredient doesn't use DISTINCT"""
+        sql, plan = self._explain_list_query({
+            'tags': f'{self.tag.id}',
+            'ingredients': f'{self.ingredient.id}',
+        })
+
+        self.assertNotIn('DISTINCT', sql)
+        self.assertIn('EXISTS', sql)
+        self.assertNotIn('Unique', plan)
+
+    def test_all_filter_has_no_distinct(self):
+        """Test filtering by all tags groups links instead of DISTINCT"""
+        sql, plan = self._explain_list_query({
+            'tags': f'{self.tag.id}',
+            'match': 'all',
+        })
+
+        self.assertNotIn('DISTINCT', sql)
+        self.assertIn('HAVING', sql)
+        self.assertNotIn('Unique', plan)
+
+
+class RecipeQueryBudgetTests(TestCase):
+    """Test the number of queries each recipe action runs"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(
+            email='budget@example.com', password='testpass123')
+        self.client.force_authenticate(self.user)
+
+    def _create_recipes(self, count):
+        """Create recipes that each have their own tag and ingredient"""
+        recipes = []
+        for i in range(count):
+            recipe = create_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f'Tag {recipe.id}'))
+            recipe.ingredients.add(Ingredient.objects.create(
+                user=self.user, name=f'Ing {recipe.id}'))
+            recipes.append(recipe)
+        return recipes
+
+    def test_list_query_count_is_constant(self):
+        """Test listing recipes doesn't run a query per recipe"""
+        self._create_recipes(1)
+        # The content version lookup for conditional GET, one query for
+        # recipes and one per nested relation.
+        with self.assertNumQueries(4):
+            res = self.client.get(RECIPES_URL)
+        self.assertEqual(len(res.data['results']), 1)
+
+        self._create_recipes(10)
+        with self.assertNumQueries(4):
+            res = self.client.get(RECIPES_URL)
+        self.assertEqual(len(res.data['results']), 11)
+
+    def test_list_matches_serializer_output(self):
+        """Test the optimized list returns the same data"""
+        self._create_recipes(3)
+
+        res = self.client.get(RECIPES_URL)
+
+        recipes = Recipe.objects.filter(user=self.user).order_by('-id')
+        serializer = RecipeSerializer(recipes, many=True)
+        self.assertEqual(res.data['results'], serializer.data)
+
+    def test_list_only_selects_serialized_columns(self):
+        """Test the list query doesn't load columns it doesn't return"""
+        self._create_recipes(1)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(RECIPES_URL)
+
+        recipe_sql = recipe_query(ctx)
+        self.assertNotIn('"core_recipe"."description"', recipe_sql)
+        self.assertNotIn('"core_recipe"."image"', recipe_sql)
+
+    def test_retrieve_query_count(self):
+        """Test retrieving a recipe fetches relations once each"""
+        recipe = self._create_recipes(1)[0]
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Extra'))
+
+        with self.assertNumQueries(4):
+            res = self.client.get(detail_url(recipe.id))
+        self.assertEqual(len(res.data['tags']), 2)
+
+    def test_create_query_count(self):
+        """Test creating a recipe without relations"""
+        payload = {
+            'title': 'Sample recipe',
+            'time_minutes': 30,
+            'price': Decimal('5.99'),
+        }
+        # Insert, bump the content version, then one query per nested
+        # relation for the response.
+        with self.assertNumQueries(4):
+            res = self.client.post(RECIPES_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_create_with_relations_query_count_is_constant(self):
+        """Test tags and ingredients are resolved in batches"""
+        def create(count, prefix):
+            payload = {
+                'title': f'{prefix} {count}',
+                'time_minutes': 30,
+                'price': Decimal('5.99'),
+                'tags': [{'name': f'{prefix} {i}'} for i in range(count)],
+                'ingredients': [
+                    {'name': f'{prefix} {i}'} for i in range(count)
+                ],
+            }
+            with CaptureQueriesContext(connection) as ctx:
+                res = self.client.post(RECIPES_URL, payload, format='json')
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(len(res.data['tags']), count)
+            return len(ctx)
+
+        # Insert of the recipe; per relation a select, insert and select
+        # of the new names, then the link insert (checked against
+        # existing links first); one version bump for it all; then one
+        # query per relation for the response.
+        self.assertEqual(create(1, 'New'), 14)
+        self.assertEqual(create(30, 'Fresh'), 14)
+        # Existing names skip the insert and the second select.
+        self.assertEqual(create(30, 'Fresh'), 10)
+
+    def test_create_with_duplicate_names(self):
+        """Test a name given twice or already owned is only stored once"""
+        Tag.objects.create(user=self.user, name='Dinner')
+        payload = {
+            'title': 'Sample recipe',
+            'time_minutes': 30,
+            'price': Decimal('5.99'),
+            'tags': [{'name': 'Thai'}, {'name': 'Dinner'}, {'name': 'Thai'}],
+        }
+
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            sorted(tag['name'] for tag in res.data['tags']),
+            ['Dinner', 'Thai']
+        )
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+
+    def test_partial_update_query_count(self):
+        """Test a patch that leaves relations alone doesn't reload them"""
+        recipe = self._create_recipes(1)[0]
+
+        # Select with prefetches, the update and the version bump.
+        with self.assertNumQueries(5):
+            res = self.client.patch(
+                detail_url(recipe.id), {'title': 'New'}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['tags']), 1)
+
+    def test_update_reloads_changed_relations(self):
+        """Test the response reflects relations changed by an update"""
+        recipe = self._create_recipes(1)[0]
+        payload = {'tags': [{'name': 'Lunch'}]}
+
+        res = self.client.patch(detail_url(recipe.id), payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [tag['name'] for tag in res.data['tags']], ['Lunch'])
+        self.assertEqual(len(res.data['ingredients']), 1)
+
+    def _through_rows(self, recipe):
+        """Return the (id, ingredient_id) link rows of a recipe"""
+        return set(Recipe.ingredients.through.objects.filter(
+            recipe=recipe).values_list('id', 'ingredient_id'))
+
+    def test_update_only_writes_changed_links(self):
+        """Test swapping one of 40 ingredients keeps the other links"""
+        recipe = create_recipe(user=self.user)
+        names = [f'Ingredient {i}' for i in range(40)]
+        recipe.ingredients.add(*(
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in names
+        ))
+        before = self._through_rows(recipe)
+        names[7] = 'Saffron'
+        payload = {'ingredients': [{'name': name} for name in names]}
+
+        # Select with prefetches (3); lock the recipe (1); select,
+        # insert and reselect the new name (3); read the current links
+        # (1); one delete (1); the existing link check and one insert
+        # (2); one version bump for it all (1); and the changed
+        # ingredients for the response. No column changed, so the recipe
+        # row isn't written.
+        with self.assertNumQueries(13):
+            res = self.client.patch(
+                detail_url(recipe.id), payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        after = self._through_rows(recipe)
+        saffron = Ingredient.objects.get(user=self.user, name='Saffron')
+        removed = Ingredient.objects.get(user=self.user, name='Ingredient 7')
+        self.assertEqual(
+            before - after,
+            {row for row in before if row[1] == removed.id}
+        )
+        self.assertEqual(
+            {ingredient_id for _, ingredient_id in after - before},
+            {saffron.id}
+        )
+        self.assertEqual(len(res.data['ingredients']), 40)
+
+    def test_update_ignores_stale_prefetched_links(self):
+        """Test links added after the recipe was loaded are replaced too"""
+        recipe = self._create_recipes(1)[0]
+        kept = recipe.tags.get()
+        added = Tag.objects.create(user=self.user, name='Added meanwhile')
+        get_object = views.RecipeViewSet.get_object
+
+        def add_link_after_loading(view):
+            """Link a tag as another request would, once loaded"""
+            loaded = get_object(view)
+            Recipe.tags.through.objects.create(recipe=recipe, tag=added)
+            return loaded
+
+        with patch.object(views.RecipeViewSet, 'get_object',
+                          add_link_after_loading):
+            res = self.client.patch(
+                detail_url(recipe.id),
+                {'tags': [{'name': kept.name}]},
+                format='json',
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(recipe.tags.all()), [kept])
+        self.assertEqual(
+            [tag['name'] for tag in res.data['tags']], [kept.name])
+
+    def test_update_with_same_links_writes_none(self):
+        """Test resending the current relations doesn't touch links"""
+        recipe = self._create_recipes(1)[0]
+        before = self._through_rows(recipe)
+        payload = {
+            'tags': [{'name': tag.name} for tag in recipe.tags.all()],
+            'ingredients': [
+                {'name': ingredient.name}
+                for ingredient in recipe.ingredients.all()
+            ],
+        }
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.patch(
+                detail_url(recipe.id), payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        # Select with prefetches, lock the recipe, then one name lookup
+        # and one read of the current links per relation. Nothing is
+        # written.
+        self.assertEqual(len(ctx), 8)
+        writes = [
+            query['sql'] for query in ctx.captured_queries
+            if query['sql'].startswith(('INSERT', 'DELETE', 'UPDATE'))
+        ]
+        self.assertEqual(writes, [])
+        self.assertEqual(self._through_rows(recipe), before)
+
+    def test_delete_query_count(self):
+        """Test deleting a recipe"""
+        recipe = self._create_recipes(1)[0]
+
+        # Select without prefetching the relations, clear both through
+        # tables and its image uploads, delete the row and bump the
+        # content version.
+        with self.assertNumQueries(6):
+            res = self.client.delete(detail_url(recipe.id))
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_upload_image_query_count(self):
+        """Test uploading an image doesn't load relations"""
+        recipe = create_recipe(user=self.user)
+        url = image_upload_url(recipe.id)
+
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            Image.new('RGB', (10, 10)).save(image_file, format='JPEG')
+            image_file.seek(0)
+            with CaptureQueriesContext(connection) as ctx:
+                res = self.client.post(
+                    url, {'image': image_file}, format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        # Only the image column is written back, then the version bump.
+        self.assertEqual(len(ctx), 3)
+        select_sql = ctx.captured_queries[0]['sql']
+        self.assertNotIn('"core_recipe"."title"', select_sql)
+        recipe.refresh_from_db()
+        recipe.image.delete()
+
+
+class RecipeUpdateTransactionTests(TransactionTestCase):
+    """Test recipe updates outside of a test case transaction"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(
+            email='atomic@example.com', password='testpass123')
+        self.client.force_authenticate(self.user)
+
+    def test_update_is_atomic(self):
+        """Test a failing update leaves the recipe's links unchanged"""
+        recipe = create_recipe(user=self.user)
+        recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Rice'))
+        links = Recipe.ingredients.through.objects.filter(recipe=recipe)
+        before = set(links.values_list('id', 'ingredient_id'))
+        payload = {
+            'title': 'New title',
+            'ingredients': [{'name': 'Saffron'}],
+        }
+
+        with patch.object(Recipe, 'save', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.patch(
+                    detail_url(recipe.id), payload, format='json')
+
+        self.assertEqual(
+            set(links.values_list('id', 'ingredient_id')), before)
+        self.assertFalse(Ingredient.objects.filter(name='Saffron').exists())
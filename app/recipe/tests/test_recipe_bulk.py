@@ -0,0 +1,294 @@
+"""
+Tests for the bulk recipe API.
+"""
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    ContentVersion,
+    Recipe,
+    Tag,
+    Ingredient
+)
+
+BULK_URL = reverse('recipe:recipe-bulk')
+
+
+def create_recipe(user, **params):
+    """Helper function to create a recipe"""
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.00'),
+    }
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def recipe_payload(i, **params):
+    """Return the payload of a new recipe"""
+    payload = {
+        'title': f'Recipe {i}',
+        'time_minutes': i,
+        'price': '2.50',
+    }
+    payload.update(params)
+    return payload
+
+
+class PublicRecipeBulkApiTests(TestCase):
+    """Test unauthenticated bulk requests"""
+
+    def test_auth_required(self):
+        """Test auth is required to call the bulk API"""
+        res = APIClient().post(BULK_URL, {}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateRecipeBulkApiTests(TestCase):
+    """Test authenticated bulk requests"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'bulk@example.com',
+            'testpass123'
+        )
+        self.client.force_authenticate(self.user)
+
+    def _post(self, payload):
+        """POST a bulk request"""
+        return self.client.post(BULK_URL, payload, format='json')
+
+    def test_bulk_create(self):
+        """Test creating recipes with shared tags and ingredients"""
+        Tag.objects.create(user=self.user, name='Dinner')
+        payload = {'create': [
+            recipe_payload(1, tags=[{'name': 'Dinner'}, {'name': 'Thai'}]),
+            recipe_payload(2, tags=[{'name': 'Thai'}],
+                           ingredients=[{'name': 'Rice'}]),
+            recipe_payload(3, description='No relations'),
+        ]}
+
+        res = self._post(payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['created']), 3)
+        for item, data in zip(payload['create'], res.data['created']):
+            recipe = Recipe.objects.get(id=data['id'], user=self.user)
+            self.assertEqual(recipe.title, item['title'])
+            self.assertEqual(
+                sorted(tag.name for tag in recipe.tags.all()),
+                sorted(tag['name'] for tag in item.get('tags', []))
+            )
+            self.assertEqual(
+                [tag['name'] for tag in data['tags']],
+                [tag.name for tag in recipe.tags.order_by('id')]
+            )
+        self.assertEqual(
+            res.data['created'][2]['description'], 'No relations')
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 1)
+
+    def test_bulk_create_query_count_is_constant(self):
+        """Test the query count doesn't depend on the batch size"""
+        def create(count, prefix):
+            payload = {'create': [
+                recipe_payload(
+                    i,
+                    tags=[{'name': f'{prefix} tag {i}'}],
+                    ingredients=[{'name': f'{prefix} ingredient {i}'}],
+                )
+                for i in range(count)
+            ]}
+            with CaptureQueriesContext(connection) as ctx:
+                res = self._post(payload)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            return len(ctx)
+
+        self.assertEqual(create(1, 'One'), create(50, 'Fifty'))
+
+    def test_bulk_update(self):
+        """Test partially updating recipes and their relations"""
+        thai = Tag.objects.create(user=self.user, name='Thai')
+        rice = Ingredient.objects.create(user=self.user, name='Rice')
+        first = create_recipe(user=self.user, title='First')
+        first.tags.add(thai)
+        first.ingredients.add(rice)
+        second = create_recipe(user=self.user, title='Second')
+        second.tags.add(thai)
+        payload = {'update': [
+            {'id': first.id, 'title': 'Renamed'},
+            {'id': second.id, 'tags': [{'name': 'Lunch'}],
+             'time_minutes': 99},
+        ]}
+
+        res = self._post(payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.title, 'Renamed')
+        self.assertEqual(first.time_minutes, 10)
+        self.assertEqual(list(first.tags.all()), [thai])
+        self.assertEqual(list(first.ingredients.all()), [rice])
+        self.assertEqual(second.title, 'Second')
+        self.assertEqual(second.time_minutes, 99)
+        self.assertEqual([tag.name for tag in second.tags.all()], ['Lunch'])
+        self.assertEqual(
+            [tag['name'] for tag in res.data['updated'][1]['tags']],
+            ['Lunch']
+        )
+
+    def test_bulk_delete(self):
+        """Test deleting recipes"""
+        recipes = [create_recipe(user=self.user) for _ in range(3)]
+
+        res = self._post({'delete': [recipes[0].id, recipes[2].id]})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['deleted'], [recipes[0].id, recipes[2].id])
+        self.assertEqual(
+            list(Recipe.objects.filter(user=self.user)), [recipes[1]])
+
+    def test_errors_are_reported_per_item(self):
+        """Test invalid items are reported and nothing is changed"""
+        recipe = create_recipe(user=self.user)
+        other_user = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123'
+        )
+        other_recipe = create_recipe(user=other_user)
+        payload = {
+            'create': [recipe_payload(1), recipe_payload(2, price='free')],
+            'update': [
+                {'id': recipe.id, 'title': 'Changed'},
+                {'id': other_recipe.id, 'title': 'Stolen'},
+            ],
+            'delete': [other_recipe.id + 1000],
+        }
+
+        res = self._post(payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['create'][0], {})
+        self.assertIn('price', res.data['create'][1])
+        self.assertEqual(res.data['update'][0], {})
+        self.assertIn('id', res.data['update'][1])
+        self.assertEqual(len(res.data['delete'][0]), 1)
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 1)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'Sample recipe')
+        other_recipe.refresh_from_db()
+        self.assertEqual(other_recipe.title, 'Sample recipe')
+
+    def test_update_id_must_be_an_integer(self):
+        """Test update ids that aren't integers are validation errors"""
+        recipe = create_recipe(user=self.user)
+
+        for pk in [True, 'five', None]:
+            res = self._post({'update': [{'id': pk, 'title': 'Changed'}]})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('id', res.data['update'][0])
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'Sample recipe')
+
+    def test_update_id_as_string(self):
+        """Test a numeric string id is read as the integer, as in delete"""
+        recipe = create_recipe(user=self.user)
+
+        res = self._post(
+            {'update': [{'id': str(recipe.id), 'title': 'Changed'}]})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['updated'][0]['id'], recipe.id)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'Changed')
+
+    @override_settings(RECIPE_BULK_MAX_ITEMS=2)
+    def test_batch_size_is_limited(self):
+        """Test batches larger than RECIPE_BULK_MAX_ITEMS are rejected"""
+        recipe = create_recipe(user=self.user)
+        payload = {
+            'create': [recipe_payload(1), recipe_payload(2)],
+            'delete': [recipe.id],
+        }
+
+        res = self._post(payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(Recipe.objects.filter(id=recipe.id).exists())
+
+    def test_recipe_changed_twice_rejected(self):
+        """Test a recipe can't be both updated and deleted"""
+        recipe = create_recipe(user=self.user)
+        payload = {
+            'update': [{'id': recipe.id, 'title': 'Changed'}],
+            'delete': [recipe.id],
+        }
+
+        res = self._post(payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(Recipe.objects.filter(id=recipe.id).exists())
+
+    def test_content_version_bumped_once(self):
+        """Test the whole batch bumps the content version once"""
+        recipes = [create_recipe(user=self.user) for _ in range(3)]
+        before = ContentVersion.objects.get(user=self.user).version
+        payload = {
+            'create': [recipe_payload(1, tags=[{'name': 'Thai'}])],
+            'update': [{'id': recipes[0].id, 'tags': [{'name': 'Lao'}]}],
+            'delete': [recipes[1].id, recipes[2].id],
+        }
+
+        res = self._post(payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        after = ContentVersion.objects.get(user=self.user).version
+        self.assertEqual(after, before + 1)
+
+
+class RecipeBulkTransactionTests(TransactionTestCase):
+    """Test bulk requests outside of a test case transaction"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'atomic@example.com',
+            'testpass123'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_batch_is_atomic(self):
+        """Test a failure part way through rolls back the whole batch"""
+        recipe = create_recipe(user=self.user)
+        before = ContentVersion.objects.get(user=self.user).version
+        payload = {
+            'create': [recipe_payload(1, tags=[{'name': 'Thai'}])],
+            'update': [{'id': recipe.id, 'title': 'Changed'}],
+        }
+
+        with patch(
+            'django.db.models.query.QuerySet.bulk_update',
+            side_effect=RuntimeError
+        ):
+            with self.assertRaises(RuntimeError):
+                self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(list(Recipe.objects.all()), [recipe])
+        self.assertFalse(Tag.objects.exists())
+        self.assertEqual(
+            ContentVersion.objects.get(user=self.user).version, before)
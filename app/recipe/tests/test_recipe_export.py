@@ -0,0 +1,217 @@
+"""
+Tests for the streaming recipe export.
+"""
+import csv
+import io
+import json
+import tracemalloc
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings, tag
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import benchmark
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient
+)
+from recipe.serializers import RecipeDetailSerializer
+
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+def create_recipe(user, **params):
+    """Helper function to create a recipe"""
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.00'),
+    }
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def read_body(res):
+    """Consume a streaming response"""
+    return b''.join(res.streaming_content).decode()
+
+
+class PublicRecipeExportTests(TestCase):
+    """Test unauthenticated export requests"""
+
+    def test_auth_required(self):
+        """Test auth is required to export recipes"""
+        res = APIClient().get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateRecipeExportTests(TestCase):
+    """Test exporting recipes"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'export@example.com',
+            'testpass123'
+        )
+        self.client.force_authenticate(self.user)
+        self.thai = Tag.objects.create(user=self.user, name='Thai')
+        self.dinner = Tag.objects.create(user=self.user, name='Dinner')
+        rice = Ingredient.objects.create(user=self.user, name='Rice')
+        self.recipes = []
+        for i in range(5):
+            recipe = create_recipe(
+                user=self.user,
+                title=f'Recipe {i}',
+                description=f'Line one\nline "two" of {i}',
+            )
+            recipe.tags.add(*[self.thai, self.dinner][:i % 3])
+            recipe.ingredients.add(rice)
+            self.recipes.append(recipe)
+
+    def test_export_ndjson(self):
+        """Test exporting one JSON document per recipe"""
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        self.assertIn('recipes.ndjson', res['Content-Disposition'])
+        lines = read_body(res).splitlines()
+        serializer = RecipeDetailSerializer(self.recipes, many=True)
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            json.loads(json.dumps(serializer.data))
+        )
+
+    def test_export_without_values_reader(self):
+        """Test serializers that need instances export the same data"""
+        expected = read_body(self.client.get(EXPORT_URL))
+
+        with patch('recipe.export.ValuesReader.build', return_value=None):
+            res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(read_body(res), expected)
+
+    def test_export_csv(self):
+        """Test exporting a CSV file with tags flattened by name"""
+        res = self.client.get(EXPORT_URL, {'export_format': 'csv'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(read_body(res))))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['title'], 'Recipe 0')
+        self.assertEqual(rows[0]['tags'], '')
+        self.assertEqual(rows[2]['tags'], 'Thai;Dinner')
+        self.assertEqual(rows[2]['description'], 'Line one\nline "two" of 2')
+        self.assertEqual(rows[3]['ingredients'], 'Rice')
+
+    def test_export_empty_csv(self):
+        """Test an empty export still has a header"""
+        Recipe.objects.all().delete()
+
+        res = self.client.get(EXPORT_URL, {'export_format': 'csv'})
+
+        self.assertEqual(
+            read_body(res).splitlines()[0],
+            'id,title,time_minutes,price,link,tags,ingredients,'
+            'description,image,images'
+        )
+
+    def test_export_filters_and_fields(self):
+        """Test the list filters and sparse fields apply to the export"""
+        res = self.client.get(EXPORT_URL, {
+            'tags': self.dinner.id,
+            'fields': 'id,title',
+        })
+
+        lines = [json.loads(line) for line in read_body(res).splitlines()]
+        self.assertEqual(lines, [
+            {'id': recipe.id, 'title': recipe.title}
+            for recipe in self.recipes if recipe.tags.filter(
+                id=self.dinner.id).exists()
+        ])
+
+    def test_export_limited_to_user(self):
+        """Test other users' recipes aren't exported"""
+        other_user = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123'
+        )
+        create_recipe(user=other_user, title='Not mine')
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertNotIn('Not mine', read_body(res))
+
+    def test_invalid_format(self):
+        """Test an unknown export format is rejected"""
+        res = self.client.get(
+            EXPORT_URL,
+            {'export_format': 'xml'},
+            HTTP_ACCEPT='application/xml'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(RECIPE_EXPORT_CHUNK_SIZE=2)
+    def test_relations_prefetched_per_chunk(self):
+        """Test relations take one query per chunk, not per recipe"""
+        res = self.client.get(EXPORT_URL)
+
+        # The recipes come from one cursor, then each of the three
+        # chunks prefetches tags and ingredients.
+        with self.assertNumQueries(1 + 3 * 2):
+            body = read_body(res)
+        self.assertEqual(len(body.splitlines()), 5)
+
+
+# Small chunks so that every export below spans several of them.
+@override_settings(RECIPE_EXPORT_CHUNK_SIZE=200)
+class RecipeExportMemoryTests(TestCase):
+    """Test the export runs in constant memory"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def _peak_memory(self, count):
+        """Export `count` recipes and return the peak memory used"""
+        user = benchmark.create_benchmark_user(f'export{count}@example.com')
+        benchmark.seed_recipes(user, count)
+        self.client.force_authenticate(user)
+
+        tracemalloc.start()
+        try:
+            res = self.client.get(EXPORT_URL)
+            lines = sum(
+                chunk.count(b'\n') for chunk in res.streaming_content)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(lines, count)
+        return peak
+
+    def test_peak_memory_is_flat(self):
+        """Test exporting 10x more recipes doesn't use more memory"""
+        small = self._peak_memory(1000)
+        large = self._peak_memory(10000)
+
+        # Both exports hold one chunk at a time, allow for noise.
+        self.assertLess(large, small * 1.2)
+
+    @tag('slow')
+    def test_peak_memory_is_flat_at_scale(self):
+        """Test exporting 100k recipes uses as much memory as 1k"""
+        small = self._peak_memory(1000)
+        large = self._peak_memory(100000)
+
+        self.assertLess(large, small * 1.2)
@@ -0,0 +1,272 @@
+"""
+Tests for the resized variants of recipe images.
+"""
+import io
+import os
+import tempfile
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import ContentVersion, Recipe
+from recipe import images, views
+
+
+def image_upload_url(recipe_id):
+    """Return URL for recipe image upload"""
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+def detail_url(recipe_id):
+    """Return recipe detail URL"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def image_file(size=(2000, 1000), fmt='JPEG', mode='RGB'):
+    """Return an in-memory image to upload"""
+    f = io.BytesIO()
+    color = (255, 165, 0, 128) if mode == 'RGBA' else (255, 165, 0)
+    Image.new(mode, size, color).save(f, format=fmt)
+    f.name = f'photo.{fmt.lower()}'
+    f.seek(0)
+    return f
+
+
+@override_settings(RECIPE_IMAGE_WORKERS=0)
+class RecipeImageVariantTests(TestCase):
+    """Test making and serving image variants"""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'images@example.com',
+            'testpass123'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Curry',
+            time_minutes=10,
+            price=Decimal('5.00'),
+        )
+
+    def _upload(self, recipe=None, **params):
+        """Upload an image and run the work queued on commit"""
+        recipe = recipe or self.recipe
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(
+                image_upload_url(recipe.id),
+                {'image': image_file(**params)},
+                format='multipart',
+            )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        recipe.refresh_from_db()
+        return res
+
+    def test_original_served_until_ready(self):
+        """Test the upload response points every variant at the original"""
+        res = self._upload()
+
+        for variant in res.data['images'].values():
+            self.assertEqual(variant['jpeg'], res.data['image'])
+            self.assertEqual(variant['webp'], res.data['image'])
+            self.assertIsNone(variant['width'])
+
+    def test_variants_are_made(self):
+        """Test each variant is resized and encoded in each format"""
+        self._upload()
+
+        variants = self.recipe.image_variants['variants']
+        self.assertEqual(set(variants), {'thumbnail', 'medium', 'large'})
+        self.assertEqual(
+            (variants['thumbnail']['width'],
+             variants['thumbnail']['height']),
+            (160, 80)
+        )
+        self.assertEqual(variants['large']['width'], 1280)
+        for fmt, pil_format in [('jpeg', 'JPEG'), ('webp', 'WEBP')]:
+            with default_storage.open(variants['medium'][fmt]) as f:
+                image = Image.open(f)
+                self.assertEqual(image.format, pil_format)
+                self.assertEqual(image.size, (640, 320))
+
+    def test_variant_urls_served(self):
+        """Test the detail endpoint serves the variant URLs"""
+        self._upload()
+
+        res = self.client.get(detail_url(self.recipe.id))
+
+        thumbnail = res.data['images']['thumbnail']
+        self.assertTrue(thumbnail['webp'].startswith('http://testserver/'))
+        self.assertTrue(thumbnail['webp'].endswith('-thumbnail.webp'))
+        self.assertTrue(thumbnail['jpeg'].endswith('-thumbnail.jpg'))
+        self.assertEqual(thumbnail['width'], 160)
+
+    def test_small_images_not_enlarged(self):
+        """Test variants are never bigger than the original"""
+        self._upload(size=(300, 200))
+
+        variants = self.recipe.image_variants['variants']
+        self.assertEqual(variants['large']['width'], 300)
+        self.assertEqual(variants['thumbnail']['width'], 160)
+
+    def test_transparent_png(self):
+        """Test transparent images are flattened for JPEG only"""
+        self._upload(fmt='PNG', mode='RGBA')
+
+        variant = self.recipe.image_variants['variants']['thumbnail']
+        with default_storage.open(variant['jpeg']) as f:
+            self.assertEqual(Image.open(f).mode, 'RGB')
+        with default_storage.open(variant['webp']) as f:
+            self.assertEqual(Image.open(f).mode, 'RGBA')
+
+    def test_replaced_image_not_recorded(self):
+        """Test variants of an image replaced meanwhile are discarded"""
+        self._upload()
+        old_source = self.recipe.image.name
+        with self.captureOnCommitCallbacks(execute=False):
+            self.client.post(
+                image_upload_url(self.recipe.id),
+                {'image': image_file(size=(1000, 500))},
+                format='multipart',
+            )
+        self.recipe.refresh_from_db()
+
+        images.create_variants(self.recipe.id, self.user.id, old_source)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_variants['variants'], {})
+        stem = os.path.splitext(old_source)[0]
+        # The first upload's variants are still there, not a second set.
+        _, files = default_storage.listdir(os.path.dirname(old_source))
+        self.assertEqual(
+            len([name for name in files
+                 if name.startswith(os.path.basename(stem) + '-')]),
+            6
+        )
+
+    def test_update_keeps_variants_made_meanwhile(self):
+        """Test editing a recipe doesn't undo variants recorded meanwhile"""
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.client.post(
+                image_upload_url(self.recipe.id),
+                {'image': image_file()},
+                format='multipart',
+            )
+        get_object = views.RecipeViewSet.get_object
+
+        def make_variants_after_loading(view):
+            """Record the variants once the view has loaded the recipe"""
+            recipe = get_object(view)
+            for callback in callbacks:
+                callback()
+            return recipe
+
+        with patch.object(views.RecipeViewSet, 'get_object',
+                          make_variants_after_loading):
+            res = self.client.patch(
+                detail_url(self.recipe.id), {'title': 'Green curry'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.title, 'Green curry')
+        self.assertEqual(
+            set(self.recipe.image_variants['variants']),
+            {'thumbnail', 'medium', 'large'},
+        )
+
+    def test_make_missing_variants(self):
+        """Test the variants lost with a restarted worker are made"""
+        # The upload commits but its job is never run.
+        with self.captureOnCommitCallbacks(execute=False):
+            self.client.post(
+                image_upload_url(self.recipe.id),
+                {'image': image_file()},
+                format='multipart',
+            )
+        without_image = Recipe.objects.create(
+            user=self.user,
+            title='Soup',
+            time_minutes=5,
+            price=Decimal('1.00'),
+        )
+        out = io.StringIO()
+
+        call_command('make_missing_variants', stdout=out)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(
+            set(self.recipe.image_variants['variants']),
+            {'thumbnail', 'medium', 'large'},
+        )
+        without_image.refresh_from_db()
+        self.assertIsNone(without_image.image_variants)
+        self.assertIn('Made the variants of 1 images', out.getvalue())
+
+    def test_variants_bump_content_version(self):
+        """Test recording the variants invalidates cached responses"""
+        version = ContentVersion.objects.for_user(self.user).version
+
+        self._upload()
+
+        self.assertGreater(
+            ContentVersion.objects.for_user(self.user).version, version + 1)
+
+    def test_failure_is_logged(self):
+        """Test a failed resize leaves the original in place"""
+        with patch.object(images, 'save_variants', side_effect=OSError), \
+                self.assertLogs('recipe.images', 'ERROR'):
+            self._upload()
+
+        self.assertEqual(self.recipe.image_variants['variants'], {})
+
+    @override_settings(RECIPE_IMAGE_WORKERS=2)
+    def test_submitted_to_workers(self):
+        """Test the variants are made by the worker pool"""
+        with patch.object(images, 'executor') as executor:
+            self._upload()
+
+        executor.return_value.submit.assert_called_once_with(
+            images._work, self.recipe.id, self.user.id,
+            self.recipe.image.name,
+        )
+
+    def test_identical_images_shared(self):
+        """Test a photo uploaded to two recipes is stored once"""
+        other = Recipe.objects.create(
+            user=self.user,
+            title='Soup',
+            time_minutes=5,
+            price=Decimal('1.00'),
+        )
+        self._upload()
+
+        with patch.object(
+                images, 'save_variants', wraps=images.save_variants) as save:
+            self._upload(recipe=other)
+
+        self.assertEqual(other.image.name, self.recipe.image.name)
+        # The variants of the first upload are reused, not made again.
+        save.assert_not_called()
+        self.assertEqual(other.image_variants, self.recipe.image_variants)
+
+    def test_no_image(self):
+        """Test recipes without an image have no variants"""
+        res = self.client.get(detail_url(self.recipe.id))
+
+        self.assertIsNone(res.data['images'])
@@ -0,0 +1,195 @@
+"""
+Tests for searching recipes.
+"""
+from base64 import b64encode
+from decimal import Decimal
+from unittest.mock import patch
+from urllib.parse import urlencode
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from recipe.pagination import RecipeCursorPagination
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def create_recipe(user, **params):
+    """Helper function to create a recipe"""
+    defaults = {
+        'title': 'Sample recipe',
+        'description': '',
+        'time_minutes': 10,
+        'price': Decimal('5.00'),
+    }
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class RecipeSearchTests(TestCase):
+    """Test searching recipes by title and description"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'search@example.com',
+            'testpass123'
+        )
+        self.client.force_authenticate(self.user)
+
+    def _search_ids(self, terms, **params):
+        """Search recipes and return the ids on the first page"""
+        res = self.client.get(RECIPES_URL, {'search': terms, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [recipe['id'] for recipe in res.data['results']]
+
+    def test_search_matches_title_and_description(self):
+        """Test search finds words in titles and descriptions"""
+        in_title = create_recipe(user=self.user, title='Green curry')
+        in_description = create_recipe(
+            user=self.user,
+            title='Weeknight dinner',
+            description='A quick curry with rice',
+        )
+        create_recipe(user=self.user, title='Pancakes')
+
+        ids = self._search_ids('curry')
+
+        self.assertCountEqual(ids, [in_title.id, in_description.id])
+
+    def test_search_ranks_title_above_description(self):
+        """Test a title match is listed before a description match"""
+        in_description = create_recipe(
+            user=self.user,
+            title='Weeknight dinner',
+            description='Serve the curry with rice',
+        )
+        in_title = create_recipe(
+            user=self.user,
+            title='Curry',
+            description='Serve with rice',
+        )
+        newest = create_recipe(
+            user=self.user,
+            title='Soup',
+            description='Add a spoon of curry paste',
+        )
+
+        ids = self._search_ids('curry')
+
+        self.assertEqual(ids[0], in_title.id)
+        self.assertCountEqual(ids[1:], [in_description.id, newest.id])
+
+    def test_search_uses_stemming(self):
+        """Test plural forms match singular words"""
+        recipe = create_recipe(user=self.user, title='Roasted potatoes')
+
+        self.assertEqual(self._search_ids('potato'), [recipe.id])
+
+    def test_search_limited_to_user(self):
+        """Test search only returns the user's own recipes"""
+        other_user = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123'
+        )
+        create_recipe(user=other_user, title='Curry')
+
+        self.assertEqual(self._search_ids('curry'), [])
+
+    def test_search_vector_updated_on_save(self):
+        """Test editing a recipe updates what it can be found by"""
+        recipe = create_recipe(user=self.user, title='Pancakes')
+        recipe.title = 'Waffles'
+        recipe.save()
+
+        self.assertEqual(self._search_ids('waffles'), [recipe.id])
+        self.assertEqual(self._search_ids('pancakes'), [])
+
+    def test_search_pagination_covers_all_results(self):
+        """Test following cursors through equally ranked results"""
+        recipes = [
+            create_recipe(user=self.user, title=f'Curry {i}')
+            for i in range(5)
+        ]
+        recipes.append(create_recipe(user=self.user, title='Curry curry'))
+
+        ids = []
+        res = self.client.get(RECIPES_URL, {'search': 'curry', 'page_size': 2})
+        while True:
+            ids.extend(recipe['id'] for recipe in res.data['results'])
+            if res.data['next'] is None:
+                break
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(len(ids), len(recipes))
+        self.assertCountEqual(ids, [recipe.id for recipe in recipes])
+        # The title that repeats the word ranks first.
+        self.assertEqual(ids[0], recipes[-1].id)
+
+    def test_search_pagination_past_offset_cutoff(self):
+        """Test paging through more ties than DRF's offset cutoff"""
+        count = RecipeCursorPagination.offset_cutoff + 300
+        Recipe.objects.bulk_create(
+            Recipe(
+                user=self.user,
+                title='Chicken curry',
+                time_minutes=10,
+                price=Decimal('5.00'),
+            )
+            for _ in range(count)
+        )
+
+        pages = []
+        res = self.client.get(
+            RECIPES_URL, {'search': 'curry', 'page_size': 200})
+        while True:
+            pages.append([recipe['id'] for recipe in res.data['results']])
+            if res.data['next'] is None:
+                break
+            self.assertLess(len(pages), 10)
+            res = self.client.get(res.data['next'])
+        previous = self.client.get(res.data['previous'])
+
+        ids = [recipe_id for page in pages for recipe_id in page]
+        self.assertEqual(len(ids), count)
+        self.assertEqual(len(set(ids)), count)
+        self.assertEqual(
+            [recipe['id'] for recipe in previous.data['results']],
+            pages[-2])
+
+    def test_search_pagination_malformed_cursor(self):
+        """Test cursors with values of the wrong type are refused"""
+        create_recipe(user=self.user, title='Chicken curry')
+        positions = [
+            'not json',
+            '[0.5]',
+            '[{"a": 1}, 2]',
+            '[0.5, "2"]',
+            '[0.5, true]',
+            '[0.5, 2.5]',
+        ]
+
+        for position in positions:
+            cursor = b64encode(urlencode({'p': position}).encode()).decode()
+            res = self.client.get(
+                RECIPES_URL, {'search': 'curry', 'cursor': cursor})
+
+            self.assertEqual(
+                res.status_code, status.HTTP_404_NOT_FOUND, position)
+
+    @patch('recipe.views.connection')
+    def test_search_fallback_without_postgres(self, patched_connection):
+        """Test search falls back to substring matching"""
+        patched_connection.vendor = 'sqlite'
+        older = create_recipe(user=self.user, title='Green curry')
+        newer = create_recipe(
+            user=self.user, title='Rice', description='Goes with curry')
+        create_recipe(user=self.user, title='Pancakes')
+
+        self.assertEqual(self._search_ids('curry'), [newer.id, older.id])
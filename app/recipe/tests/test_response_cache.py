@@ -0,0 +1,195 @@
+"""
+Tests for the per-user response cache of the list endpoints.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient
+)
+from recipe.cache import response_cache_stats
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+def detail_url(recipe_id):
+    """Return recipe detail URL"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_recipe(user, **params):
+    """Helper function to create a recipe"""
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.00'),
+    }
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class ResponseCacheTests(TestCase):
+    """Test caching of rendered list responses"""
+
+    def setUp(self):
+        caches[settings.RESPONSE_CACHE_ALIAS].clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'cache@example.com',
+            'testpass123'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Thai')
+        self.ingredient = Ingredient.objects.create(
+            user=self.user,
+            name='Rice'
+        )
+        self.recipe = create_recipe(user=self.user)
+        self.recipe.tags.add(self.tag)
+
+    def _get(self, url, params=None):
+        """GET a URL, checking it succeeded"""
+        res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res
+
+    def _assert_fresh(self, url, params=None):
+        """Check a cached response matches a freshly built one"""
+        res = self._get(url, params)
+        with override_settings(RECIPE_RESPONSE_CACHE=False):
+            fresh = self._get(url, params)
+        self.assertEqual(res.content, fresh.content)
+        return res
+
+    def test_second_request_is_a_hit(self):
+        """Test the rendered bytes are served from the cache"""
+        miss = self._get(RECIPES_URL)
+
+        with self.assertNumQueries(1):
+            hit = self._get(RECIPES_URL)
+
+        self.assertEqual(miss['X-Cache'], 'MISS')
+        self.assertEqual(hit['X-Cache'], 'HIT')
+        self.assertEqual(hit.content, miss.content)
+        self.assertEqual(hit['Content-Type'], miss['Content-Type'])
+        self.assertEqual(
+            response_cache_stats(),
+            {'hits': 1, 'misses': 1}
+        )
+
+    def test_params_are_normalized(self):
+        """Test the order of query parameters doesn't matter"""
+        self._get(f'{RECIPES_URL}?tags={self.tag.id}&page_size=5')
+
+        res = self._get(f'{RECIPES_URL}?page_size=5&tags={self.tag.id}')
+
+        self.assertEqual(res['X-Cache'], 'HIT')
+
+    def test_keys_are_distinct(self):
+        """Test params, endpoints and media types get separate entries"""
+        self._get(RECIPES_URL)
+
+        for url, params in [
+            (RECIPES_URL, {'page_size': 5}),
+            (RECIPES_URL, {'fields': 'id'}),
+            (TAGS_URL, {}),
+            (INGREDIENTS_URL, {}),
+        ]:
+            with self.subTest(url=url, params=params):
+                self.assertEqual(self._get(url, params)['X-Cache'], 'MISS')
+
+        res = self.client.get(RECIPES_URL, HTTP_ACCEPT='text/html')
+        self.assertEqual(res['X-Cache'], 'MISS')
+
+    def test_users_get_their_own_entries(self):
+        """Test a user never sees another user's cached list"""
+        self._get(RECIPES_URL)
+        other = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123'
+        )
+        self.client.force_authenticate(other)
+
+        res = self._get(RECIPES_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.json()['results'], [])
+
+    def test_errors_are_not_cached(self):
+        """Test only successful responses are stored"""
+        self.client.get(RECIPES_URL, {'cursor': 'bogus'})
+
+        res = self.client.get(RECIPES_URL, {'cursor': 'bogus'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response_cache_stats()['misses'], 2)
+
+    @override_settings(RECIPE_RESPONSE_CACHE=False)
+    def test_cache_can_be_disabled(self):
+        """Test RECIPE_RESPONSE_CACHE=False bypasses the cache"""
+        self._get(RECIPES_URL)
+
+        res = self._get(RECIPES_URL)
+
+        self.assertFalse(res.has_header('X-Cache'))
+
+    def test_writes_are_never_stale(self):
+        """Test every kind of write is visible on the next list"""
+        payload = {'title': 'New', 'time_minutes': 5, 'price': '1.00'}
+        writes = [
+            lambda: self.client.post(RECIPES_URL, payload, format='json'),
+            lambda: self.client.patch(
+                detail_url(self.recipe.id), {'title': 'Renamed'}),
+            lambda: self.recipe.tags.remove(self.tag),
+            lambda: self.recipe.tags.add(self.tag),
+            lambda: self.recipe.ingredients.add(self.ingredient),
+            lambda: self.ingredient.recipe_set.clear(),
+            lambda: self.client.patch(
+                reverse('recipe:tag-detail', args=[self.tag.id]),
+                {'name': 'Lao'}
+            ),
+            lambda: Ingredient.objects.create(user=self.user, name='Lime'),
+            lambda: self.client.delete(
+                reverse('recipe:tag-detail', args=[self.tag.id])),
+            lambda: self.client.delete(detail_url(self.recipe.id)),
+        ]
+        urls = [
+            (RECIPES_URL, None),
+            (TAGS_URL, None),
+            (TAGS_URL, {'assigned_only': 1}),
+            (INGREDIENTS_URL, None),
+        ]
+        for write in writes:
+            for url, params in urls:
+                # Warm the cache, write, then compare with the database.
+                self._get(url, params)
+            write()
+            for url, params in urls:
+                with self.subTest(url=url, params=params):
+                    res = self._assert_fresh(url, params)
+                    self.assertEqual(res['X-Cache'], 'MISS')
+
+    def test_other_users_writes_keep_entries(self):
+        """Test writes by another user don't evict this user's entries"""
+        self._get(RECIPES_URL)
+        other = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123'
+        )
+
+        create_recipe(user=other)
+
+        self.assertEqual(self._get(RECIPES_URL)['X-Cache'], 'HIT')
@@ -0,0 +1,134 @@
+"""
+Tests for choosing the fields returned by the recipe API.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient
+)
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+def detail_url(recipe_id):
+    """Return recipe detail URL"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class SparseFieldsTests(TestCase):
+    """Test ?fields= and ?omit= on the recipe endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'fields@example.com',
+            'testpass123'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Curry',
+            description='Hot',
+            time_minutes=10,
+            price=Decimal('5.00'),
+        )
+        self.recipe.tags.add(Tag.objects.create(user=self.user, name='Thai'))
+        self.recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Rice'))
+
+    def test_list_fields(self):
+        """Test only the requested fields are returned"""
+        res = self.client.get(RECIPES_URL, {'fields': 'id,title,price'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data['results'],
+            [{'id': self.recipe.id, 'title': 'Curry', 'price': '5.00'}]
+        )
+
+    def test_list_fields_skip_relations_and_columns(self):
+        """Test unrequested relations and columns aren't queried"""
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(RECIPES_URL, {'fields': 'id,title,price'})
+
+        # The content version and recipes, no prefetch queries for tags
+        # and ingredients.
+        self.assertEqual(len(ctx), 2)
+        sql = ctx.captured_queries[1]['sql']
+        self.assertIn('"core_recipe"."title"', sql)
+        self.assertNotIn('"core_recipe"."time_minutes"', sql)
+        self.assertNotIn('"core_recipe"."link"', sql)
+
+    def test_list_omit(self):
+        """Test omitted fields are left out of the response and SQL"""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(RECIPES_URL, {'omit': 'tags,link'})
+
+        self.assertEqual(
+            set(res.data['results'][0]),
+            {'id', 'title', 'time_minutes', 'price', 'ingredients'}
+        )
+        # The content version, recipes and the ingredients prefetch.
+        self.assertEqual(len(ctx), 3)
+        self.assertNotIn('core_tag', ctx.captured_queries[2]['sql'])
+
+    def test_detail_fields(self):
+        """Test choosing fields on the detail endpoint"""
+        res = self.client.get(
+            detail_url(self.recipe.id),
+            {'fields': 'description,tags'}
+        )
+
+        self.assertEqual(
+            res.data,
+            {
+                'description': 'Hot',
+                'tags': [{'id': self.recipe.tags.get().id, 'name': 'Thai'}],
+            }
+        )
+
+    def test_unknown_fields_ignored(self):
+        """Test unknown field names don't cause an error"""
+        res = self.client.get(RECIPES_URL, {'fields': 'title,nope'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [{'title': 'Curry'}])
+
+    def test_fields_ignored_on_write(self):
+        """Test ?fields= doesn't drop fields when updating"""
+        url = f'{detail_url(self.recipe.id)}?fields=title'
+
+        res = self.client.patch(url, {'time_minutes': 25}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.time_minutes, 25)
+        self.assertIn('time_minutes', res.data)
+
+    def test_tag_and_ingredient_fields(self):
+        """Test choosing fields on the tag and ingredient lists"""
+        for url in [TAGS_URL, INGREDIENTS_URL]:
+            res = self.client.get(url, {'fields': 'name'})
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(list(res.data[0]), ['name'])
+
+    def test_omit_nested_fields_kept(self):
+        """Test ?omit= doesn't reach into nested serializers"""
+        res = self.client.get(RECIPES_URL, {'omit': 'name'})
+
+        self.assertEqual(
+            res.data['results'][0]['tags'][0]['name'], 'Thai')
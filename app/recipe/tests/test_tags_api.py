@@ -90,6 +90,21 @@ class PrivateTagsApiTests(TestCase):
         tag.refresh_from_db()
         self.assertEqual(tag.name, payload['name'])
 
+    def test_update_tag_to_existing_name(self):
+        """Test renaming a tag to a name already in use fails"""
+        Tag.objects.create(user=self.user, name='Dinner')
+        tag = Tag.objects.create(user=self.user, name='Lunch')
+        other_user = create_user(email='other@example.com')
+        Tag.objects.create(user=other_user, name='Brunch')
+
+        res = self.client.patch(detail_url(tag.id), {'name': 'Dinner'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # Other users' names and the tag's own name are fine.
+        for name in ['Brunch', 'Lunch']:
+            res = self.client.patch(detail_url(tag.id), {'name': name})
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
     def test_delete_tag(self):
         """Test deleting a tag"""
         tag = Tag.objects.create(user=self.user, name='Test Tag')
@@ -0,0 +1,147 @@
+"""
+Tests for serving list endpoints from values() rows.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import serializers
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient
+)
+from recipe.serializers import (
+    RecipeSerializer,
+    RecipeDetailSerializer,
+    TagSerializer,
+)
+from recipe.values import ValuesReader
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+# Both paths are requested with the same URL, which the response cache
+# would otherwise answer the second time.
+@override_settings(RECIPE_RESPONSE_CACHE=False)
+class ValuesReadPathTests(TestCase):
+    """Test the values() read path against the serializer output"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'values@example.com',
+            'testpass123'
+        )
+        self.client.force_authenticate(self.user)
+        tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ['Thai', 'Dinner', 'Quick', 'Vegan']
+        ]
+        ingredients = [
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ['Rice', 'Ginger', 'Basil']
+        ]
+        Ingredient.objects.create(user=self.user, name='Unused')
+        for i in range(12):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=f'Curry number {i}',
+                description='Spicy curry' if i % 3 else '',
+                time_minutes=i * 5,
+                price=Decimal('1.5') * i,
+                link='' if i % 2 else f'https://example.com/{i}',
+            )
+            # Add relations out of id order to check nested ordering.
+            recipe.tags.add(*reversed(tags[:i % 5]))
+            recipe.ingredients.add(*ingredients[i % 2:])
+
+    def _get_both(self, url, params=None):
+        """Return the response bodies of the default and values paths"""
+        with override_settings(RECIPE_VALUES_READ_PATH=False):
+            expected = self.client.get(url, params)
+        with override_settings(RECIPE_VALUES_READ_PATH=True):
+            actual = self.client.get(url, params)
+        self.assertEqual(actual.status_code, expected.status_code)
+        return expected.content, actual.content
+
+    def test_responses_are_identical(self):
+        """Test both paths return byte-identical responses"""
+        tag = Tag.objects.get(name='Thai')
+        ingredient = Ingredient.objects.get(name='Rice')
+        requests = [
+            (RECIPES_URL, {}),
+            (RECIPES_URL, {'page_size': 5}),
+            (RECIPES_URL, {'tags': tag.id, 'ingredients': ingredient.id}),
+            (RECIPES_URL, {'tags': tag.id, 'match': 'all'}),
+            (RECIPES_URL, {'search': 'curry', 'page_size': 4}),
+            (RECIPES_URL, {'fields': 'id,price,tags'}),
+            (RECIPES_URL, {'omit': 'ingredients'}),
+            (TAGS_URL, {}),
+            (TAGS_URL, {'assigned_only': 1}),
+            (INGREDIENTS_URL, {}),
+            (INGREDIENTS_URL, {'fields': 'name'}),
+        ]
+        for url, params in requests:
+            with self.subTest(url=url, params=params):
+                expected, actual = self._get_both(url, params)
+                self.assertEqual(actual, expected)
+
+    def test_following_pages_is_identical(self):
+        """Test every page matches when following the next links"""
+        url, params = RECIPES_URL, {'page_size': 5}
+        while url:
+            expected, actual = self._get_both(url, params)
+            self.assertEqual(actual, expected)
+            url = self.client.get(url, params).data['next']
+            params = None
+
+    @override_settings(RECIPE_VALUES_READ_PATH=True)
+    def test_query_count(self):
+        """Test one query for the page and one per nested relation"""
+        # Plus the content version lookup for conditional GET.
+        with self.assertNumQueries(4):
+            self.client.get(RECIPES_URL)
+        with self.assertNumQueries(2):
+            self.client.get(TAGS_URL)
+
+    def test_build_requires_plain_columns(self):
+        """Test serializers with instance-only fields aren't supported"""
+        class SummarySerializer(RecipeSerializer):
+            summary = serializers.SerializerMethodField()
+
+            class Meta(RecipeSerializer.Meta):
+                fields = RecipeSerializer.Meta.fields + ['summary']
+
+            def get_summary(self, obj):
+                return obj.title
+
+        self.assertIsNotNone(ValuesReader.build(RecipeSerializer()))
+        self.assertIsNotNone(ValuesReader.build(TagSerializer()))
+        self.assertIsNone(ValuesReader.build(SummarySerializer()))
+
+    def test_file_fields(self):
+        """Test image URLs match the serializer's"""
+        Recipe.objects.filter(title='Curry number 3').update(
+            image='uploads/recipe/curry.jpg')
+        request = Request(APIRequestFactory().get('/'))
+        serializer = RecipeDetailSerializer(context={'request': request})
+        reader = ValuesReader.build(serializer)
+        queryset = Recipe.objects.filter(user=self.user).order_by('id')
+
+        data = reader.to_representation(reader.rows(queryset))
+
+        expected = RecipeDetailSerializer(
+            queryset, many=True, context={'request': request}).data
+        self.assertEqual(data, expected)
+        self.assertEqual(
+            data[3]['image'],
+            'http://testserver/api/recipe/media/uploads/recipe/curry.jpg'
+        )
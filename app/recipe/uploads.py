@@ -0,0 +1,121 @@
+"""
+Chunked, resumable image uploads. Each numbered chunk is streamed from
+the request to its own file, so a retried chunk simply replaces it, and
+the chunks are joined and checked against the upload's SHA-256 when it
+is finalized.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+
+# Bytes read from the request and copied between files at a time.
+BLOCK_SIZE = 64 * 1024
+ASSEMBLED = 'assembled'
+
+
+class UploadError(ValueError):
+    """A chunk or a finalized upload doesn't match the upload session"""
+
+
+def uploads_root():
+    """Return the directory the chunks of every upload are kept in"""
+    return os.path.join(settings.MEDIA_ROOT, 'uploads', 'chunks')
+
+
+def upload_dir(upload):
+    """Return the directory the chunks of an upload are kept in"""
+    return os.path.join(uploads_root(), str(upload.id))
+
+
+def expiry():
+    """Return when an upload receiving a chunk now expires"""
+    return timezone.now() + timedelta(seconds=settings.RECIPE_UPLOAD_EXPIRY)
+
+
+def received_chunks(upload):
+    """Return the numbers of the chunks received so far"""
+    try:
+        names = os.listdir(upload_dir(upload))
+    except FileNotFoundError:
+        return []
+    return sorted(int(name) for name in names if name.isdigit())
+
+
+def write_chunk(upload, number, stream):
+    """
+    Copy chunk `number` of an upload from a file-like stream, reading at
+    most one block more than the chunk should hold.
+    """
+    if not 0 <= number < upload.chunk_count:
+        raise UploadError(
+            f'Chunks are numbered from 0 to {upload.chunk_count - 1}.')
+    expected = upload.chunk_length(number)
+    directory = upload_dir(upload)
+    os.makedirs(directory, exist_ok=True)
+
+    # Written under a temporary name, so a chunk interrupted half way
+    # is never mistaken for a received one.
+    with tempfile.NamedTemporaryFile(dir=directory, delete=False) as f:
+        try:
+            received = 0
+            while received <= expected:
+                block = stream.read(BLOCK_SIZE)
+                if not block:
+                    break
+                f.write(block)
+                received += len(block)
+            if received != expected:
+                raise UploadError(
+                    f'Chunk {number} must be {expected} bytes long.')
+        except BaseException:
+            f.close()
+            os.unlink(f.name)
+            raise
+    os.replace(f.name, os.path.join(directory, str(number)))
+
+
+def assemble(upload):
+    """
+    Join the chunks of an upload into one file, check its SHA-256 and
+    return its path.
+    """
+    missing = set(range(upload.chunk_count)) - set(received_chunks(upload))
+    if missing:
+        raise UploadError(
+            f'Missing chunks: {", ".join(map(str, sorted(missing)))}.')
+
+    directory = upload_dir(upload)
+    path = os.path.join(directory, ASSEMBLED)
+    digest = hashlib.sha256()
+    with open(path, 'wb') as out:
+        for number in range(upload.chunk_count):
+            with open(os.path.join(directory, str(number)), 'rb') as f:
+                for block in iter(lambda: f.read(BLOCK_SIZE), b''):
+                    digest.update(block)
+                    out.write(block)
+    if digest.hexdigest() != upload.sha256:
+        os.unlink(path)
+        raise UploadError('The file does not match its SHA-256.')
+    return path
+
+
+def discard(upload_id):
+    """Delete the chunks of an upload"""
+    shutil.rmtree(
+        os.path.join(uploads_root(), str(upload_id)), ignore_errors=True)
+
+
+class AssembledFile(File):
+    """
+    A finalized upload. Like a large multipart upload it is read from
+    its path when validated, rather than loaded into memory.
+    """
+
+    def temporary_file_path(self):
+        return self.file.name
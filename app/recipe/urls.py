@@ -11,9 +11,11 @@ router = DefaultRouter()
 router.register('recipes', views.RecipeViewSet)
 router.register('tags', views.TagViewSet)
 router.register('ingredients', views.IngredientViewSet)
+router.register('uploads', views.ImageUploadViewSet)
 
 app_name = 'recipe'
 
 urlpatterns = [
-    path('', include(router.urls))
+    path('', include(router.urls)),
+    path('media/<path:path>', views.RecipeMediaView.as_view(), name='media'),
 ]
@@ -0,0 +1,159 @@
+"""
+Read-only serialization straight from QuerySet.values() rows
+"""
+from collections import OrderedDict, defaultdict
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+
+from rest_framework import serializers
+
+
+def _column(model, field):
+    """Return the model field a serializer field reads, or None"""
+    if field.source == '*' or '.' in field.source:
+        return None
+    try:
+        model_field = model._meta.get_field(field.source)
+    except FieldDoesNotExist:
+        return None
+    # Relations represent objects, which values() doesn't return.
+    if model_field.is_relation or not model_field.concrete:
+        return None
+    return model_field
+
+
+def _to_representation(model_field, field, value):
+    """Represent a values() column like the model attribute would be"""
+    if value is None:
+        # Same None handling as Serializer.to_representation().
+        return None
+    if isinstance(model_field, models.FileField):
+        # values() returns the stored name, the serializer field expects
+        # the FieldFile the model attribute would hold.
+        value = model_field.attr_class(None, model_field, value)
+    return field.to_representation(value)
+
+
+class ValuesReader:
+    """
+    Serialize model rows without building model instances.
+
+    Columns are read with values() and passed to the serializer fields'
+    own to_representation(), so the output is the same as the
+    serializer's. Nested many-to-many serializers are filled in with
+    one query per relation for the whole page. Use ValuesReader.build()
+    to get a reader, it returns None for serializers that need model
+    instances.
+    """
+
+    def __init__(self, model, columns, relations):
+        self.model = model
+        # [(name, model field, field)] in the serializer's field order,
+        # with a model field of None for nested relations.
+        self.columns = columns
+        # {name: (model field, [(model field, field)])}
+        self.relations = relations
+
+    @classmethod
+    def build(cls, serializer):
+        """Return a reader for a model serializer, or None"""
+        model = serializer.Meta.model
+        columns = []
+        relations = {}
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.ListSerializer):
+                relation = cls._relation(model, field)
+                if relation is None:
+                    return None
+                relations[name] = relation
+                columns.append((name, None, field))
+                continue
+            column = _column(model, field)
+            if column is None:
+                return None
+            columns.append((name, column, field))
+        return cls(model, columns, relations)
+
+    @staticmethod
+    def _relation(model, field):
+        """Return (model field, child columns) for a nested many field"""
+        child = field.child
+        if not isinstance(child, serializers.ModelSerializer):
+            return None
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            return None
+        if not model_field.many_to_many or not model_field.concrete:
+            return None
+        child_columns = []
+        for child_field in child.fields.values():
+            if child_field.write_only:
+                continue
+            column = _column(child.Meta.model, child_field)
+            if column is None:
+                return None
+            child_columns.append((column, child_field))
+        return model_field, child_columns
+
+    def rows(self, queryset, extra=()):
+        """
+        Return the queryset as values() rows holding the columns this
+        reader needs, plus any `extra` names (e.g. pagination keys).
+        """
+        # In a stable order, so the SQL is the same from one process to
+        # the next.
+        names = dict.fromkeys(
+            column.name for _, column, _ in self.columns if column)
+        names.update(dict.fromkeys(extra))
+        names[self.model._meta.pk.name] = None
+        # values() can't be combined with prefetches, relations are
+        # loaded by to_representation() instead.
+        return queryset.prefetch_related(None).values(*names)
+
+    def _related(self, model_field, child_columns, pks):
+        """Return {pk: [representation]} for a many-to-many relation"""
+        through = model_field.remote_field.through
+        source = model_field.m2m_field_name()
+        target = model_field.m2m_reverse_field_name()
+        target_pk = model_field.related_model._meta.pk.name
+        lookups = [
+            f'{target}__{column.name}' for column, _ in child_columns
+        ]
+        links = through.objects.filter(
+            **{f'{source}_id__in': pks}
+        ).order_by(f'{target}__{target_pk}').values_list(
+            f'{source}_id', *lookups
+        )
+        related = defaultdict(list)
+        for pk, *values in links:
+            related[pk].append(OrderedDict(
+                (field.field_name, _to_representation(column, field, value))
+                for (column, field), value in zip(child_columns, values)
+            ))
+        return related
+
+    def to_representation(self, rows):
+        """Serialize a list of values() rows"""
+        rows = list(rows)
+        pk_name = self.model._meta.pk.name
+        pks = [row[pk_name] for row in rows]
+        related = {
+            name: self._related(model_field, child_columns, pks)
+            for name, (model_field, child_columns) in self.relations.items()
+        } if pks else {}
+
+        data = []
+        for row in rows:
+            ret = OrderedDict()
+            for name, column, field in self.columns:
+                if column is None:
+                    ret[name] = related[name].get(row[pk_name], [])
+                    continue
+                ret[name] = _to_representation(
+                    column, field, row[column.name])
+            data.append(ret)
+        return data
@@ -1,6 +1,10 @@
 """
 Views for the recipe API
 """
+import io
+import mimetypes
+from urllib.parse import quote
+
 from drf_spectacular.utils import (
     extend_schema_view,
     extend_schema,
@@ -8,6 +12,20 @@ from drf_spectacular.utils import (
     OpenApiExample,
     OpenApiTypes,)
 
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection, transaction
+from django.db.models import Count, Exists, F, FloatField, OuterRef, Q
+from django.db.models.functions import Cast
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    StreamingHttpResponse,
+)
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+
 from rest_framework import (
     viewsets,
     mixins,
@@ -15,21 +33,100 @@ from rest_framework import (
 )
 
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from rest_framework.authentication import TokenAuthentication
+from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 
+from core.authentication import (
+    AccessTokenAuthentication,
+    CachedTokenAuthentication,
+)
 from core.models import (
+    ImageUpload,
     Recipe,
     Tag,
     Ingredient
 )
-from recipe import serializers
+from core.signals import deferred_content_versions
+from core.storage import image_storage
+from recipe import serializers, uploads
+from recipe.cache import cache_response
+from recipe.conditional import conditional_get
+from recipe.export import (
+    CONTENT_TYPES,
+    ExportContentNegotiation,
+    csv_lines,
+    export_representations,
+    ndjson_lines,
+)
+from recipe.pagination import RecipeCursorPagination
+from recipe.prefetch import (
+    optimize_queryset,
+    prefetch_instance,
+    prefetch_instances,
+)
+from recipe.values import ValuesReader
+
+# ?fields= and ?omit= are supported by every read endpoint.
+SPARSE_FIELDS_PARAMETERS = [
+    OpenApiParameter(
+        name='fields',
+        description='Comma separated list of the only fields to return',
+        required=False,
+        type=str,
+        location='query',
+        examples=[
+            OpenApiExample(
+                name='Only return the id and title',
+                value='id,title'
+            )
+        ]
+    ),
+    OpenApiParameter(
+        name='omit',
+        description='Comma separated list of fields to leave out',
+        required=False,
+        type=str,
+        location='query',
+        examples=[
+            OpenApiExample(
+                name='Skip the nested tags and ingredients',
+                value='tags,ingredients'
+            )
+        ]
+    ),
+]
+
+
+class ValuesListMixin:
+    """
+    Build list responses from values() rows rather than model instances
+    when RECIPE_VALUES_READ_PATH is on and the serializer allows it.
+    """
+
+    def list(self, request, *args, **kwargs):
+        reader = None
+        if settings.RECIPE_VALUES_READ_PATH:
+            reader = ValuesReader.build(self.get_serializer())
+        if reader is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        # The paginator reads the ordering keys from each row.
+        ordering = [name.lstrip('-') for name in queryset.query.order_by]
+        rows = reader.rows(queryset, extra=ordering)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(
+                reader.to_representation(page))
+        return Response(reader.to_representation(rows))
 
 
 @extend_schema_view(
     list=extend_schema(
-        description='List all recipes for the authenticated user',
+        description='List recipes for the authenticated user, newest '
+                    'first, one page at a time',
         parameters=[
             OpenApiParameter(
                 name='tags',
@@ -56,17 +153,72 @@ from recipe import serializers
                         value='1,2'
                     )
                 ]
+            ),
+            OpenApiParameter(
+                name='search',
+                description='Search recipe titles and descriptions, '
+                            'best matches first',
+                required=False,
+                type=str,
+                location='query',
+                examples=[
+                    OpenApiExample(
+                        name='Search for curry recipes',
+                        value='green curry'
+                    )
+                ]
+            ),
+            OpenApiParameter(
+                name='match',
+                description='Return recipes with any (default) or all of '
+                            'the requested tags and ingredients',
+                required=False,
+                type=str,
+                location='query',
+                enum=['any', 'all'],
             )
-        ]
+        ] + SPARSE_FIELDS_PARAMETERS
+    ),
+    retrieve=extend_schema(parameters=SPARSE_FIELDS_PARAMETERS),
+    bulk=extend_schema(
+        description='Create, partially update and delete many recipes in '
+                    'one transaction. If any item is invalid nothing is '
+                    'changed and the errors are returned per item.',
+        request=serializers.RecipeBulkSerializer,
+        responses=serializers.RecipeBulkResultSerializer,
+    ),
+    upload_image=extend_schema(
+        responses=serializers.RecipeImageResultSerializer,
+    ),
+    export=extend_schema(
+        description='Download all of the authenticated user\'s recipes, '
+                    'streamed as NDJSON (one recipe per line) or CSV. '
+                    'Accepts the same filters as the list.',
+        parameters=[
+            OpenApiParameter(
+                name='export_format',
+                description='Format of the export',
+                required=False,
+                type=str,
+                location='query',
+                enum=list(CONTENT_TYPES),
+            )
+        ] + SPARSE_FIELDS_PARAMETERS,
+        responses={(200, media_type): OpenApiTypes.STR
+                   for media_type in CONTENT_TYPES.values()},
     ),
 )
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ValuesListMixin, viewsets.ModelViewSet):
     """Manage recipes in the database"""
     serializer_class = serializers.RecipeDetailSerializer
     # The authentication class is a list because we can have multiple
     # authentication classes.
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [
+        CachedTokenAuthentication,
+        AccessTokenAuthentication,
+    ]
     permission_classes = [IsAuthenticated]
+    pagination_class = RecipeCursorPagination
     queryset = Recipe.objects.all()
 
     def _params_to_ints(self, qs):
@@ -77,26 +229,85 @@ class RecipeViewSet(viewsets.ModelViewSet):
         # We can convert the map object to a list.
         return [int(str_id) for str_id in qs.split(',')]
 
+    @conditional_get
+    @cache_response
+    def list(self, request, *args, **kwargs):
+        """List recipes, or 304 if the client's copy is current"""
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get
+    def retrieve(self, request, *args, **kwargs):
+        """Retrieve a recipe, or 304 if the client's copy is current"""
+        return super().retrieve(request, *args, **kwargs)
+
+    def _filter_by_related(self, queryset, through, column, ids, match_all):
+        """Filter recipes on the ids of a many to many relation"""
+        # Query the through table directly: a JOIN on the relation would
+        # return a recipe once per matching row and need a DISTINCT.
+        links = through.objects.filter(**{f'{column}__in': ids})
+        if match_all:
+            # Group the links per recipe and keep the recipes that have
+            # one for every requested id (HAVING COUNT(...) = n).
+            matching = links.values('recipe_id').annotate(
+                matched=Count(column)
+            ).filter(matched=len(set(ids))).values('recipe_id')
+            return queryset.filter(id__in=matching)
+        # Correlated EXISTS: a recipe matches if any link exists.
+        return queryset.filter(
+            Exists(links.filter(recipe_id=OuterRef('pk')))
+        )
+
+    def _search(self, queryset, terms):
+        """Filter recipes on a search string, best matches first"""
+        if connection.vendor != 'postgresql':
+            # No tsvector support (e.g. SQLite), fall back to substring
+            # matching in the usual order.
+            return queryset.filter(
+                Q(title__icontains=terms) | Q(description__icontains=terms)
+            ).order_by('-id')
+        query = SearchQuery(terms, config='english', search_type='websearch')
+        # ts_rank returns a real; cast it so the value written into the
+        # pagination cursor compares exactly with the database value.
+        rank = Cast(SearchRank(F('search_vector'), query), FloatField())
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=rank
+        ).order_by('-search_rank', '-id')
+
     def get_queryset(self):
         """Return objects for the current authenticated user only"""
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
+        search = self.request.query_params.get('search')
+        match_all = self.request.query_params.get('match') == 'all'
         queryset = self.queryset
         if tags:
-            tag_ids = self._params_to_ints(tags)
-            # The double underscores allow us to filter on a field
-            # of a related model.
-            # We can also filter on multiple fields of a related model.
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            queryset = self._filter_by_related(
+                queryset,
+                Recipe.tags.through,
+                'tag_id',
+                self._params_to_ints(tags),
+                match_all
+            )
         if ingredients:
-            ingredient_ids = self._params_to_ints(ingredients)
-            # The double underscores allow us to filter on a field
-            # of a related model.
-            # We can also filter on multiple fields of a related model.
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
-        return queryset.filter(
-            user=self.request.user
-        ).order_by('-id').distinct()
+            queryset = self._filter_by_related(
+                queryset,
+                Recipe.ingredients.through,
+                'ingredient_id',
+                self._params_to_ints(ingredients),
+                match_all
+            )
+        queryset = queryset.filter(user=self.request.user)
+        if search:
+            queryset = self._search(queryset, search)
+        else:
+            queryset = queryset.order_by('-id')
+        if self.action == 'destroy':
+            # Nothing is serialized, so there is nothing to prefetch.
+            return queryset
+        # Load only what the serializer for this action reads, and fetch
+        # nested tags and ingredients in one query each instead of one
+        # query per recipe.
+        return optimize_queryset(queryset, self.get_serializer())
 
     def get_serializer_class(self):
         """Return appropriate serializer class"""
@@ -114,6 +325,129 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """Create a new recipe"""
         # The serializer will take care of adding the user to the data.
         serializer.save(user=self.request.user)
+        prefetch_instance(serializer.instance, serializer)
+
+    def update(self, request, *args, **kwargs):
+        """Update a recipe"""
+        # Same as UpdateModelMixin.update, except that the prefetch cache
+        # is refreshed rather than thrown away, so the response doesn't
+        # fall back to one query per nested relation.
+        partial = kwargs.pop('partial', False)
+        instance = self.get_object()
+        serializer = self.get_serializer(
+            instance,
+            data=request.data,
+            partial=partial
+        )
+        serializer.is_valid(raise_exception=True)
+        self.perform_update(serializer)
+        prefetch_instance(instance, serializer)
+        return Response(serializer.data)
+
+    def _bulk_updates(self, items):
+        """Return (serializer, errors) for the update items of a batch"""
+        ids = [item['id'] for item in items]
+        found = {
+            recipe.id: recipe
+            for recipe in self.get_queryset().filter(id__in=ids)
+        }
+        errors = [
+            {} if pk in found else {'id': ['Recipe not found.']}
+            for pk in ids
+        ]
+        valid = [i for i, pk in enumerate(ids) if pk in found]
+        serializer = self.get_serializer(
+            [found[ids[i]] for i in valid],
+            data=[items[i] for i in valid],
+            many=True,
+            partial=True
+        )
+        if not serializer.is_valid():
+            for i, item_errors in zip(valid, serializer.errors):
+                errors[i] = item_errors
+        return serializer, errors
+
+    @action(methods=['POST'], detail=False, url_path='bulk')
+    def bulk(self, request):
+        """Create, update and delete many recipes at once"""
+        bulk = serializers.RecipeBulkSerializer(data=request.data)
+        bulk.is_valid(raise_exception=True)
+        operations = bulk.validated_data
+
+        errors = {}
+        creating = self.get_serializer(data=operations['create'], many=True)
+        if not creating.is_valid():
+            errors['create'] = creating.errors
+        updating, update_errors = self._bulk_updates(operations['update'])
+        if any(update_errors):
+            errors['update'] = update_errors
+        to_delete = operations['delete']
+        existing = set(Recipe.objects.filter(
+            user=request.user,
+            id__in=to_delete
+        ).values_list('id', flat=True))
+        if len(existing) != len(to_delete):
+            errors['delete'] = [
+                [] if pk in existing else ['Recipe not found.']
+                for pk in to_delete
+            ]
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # One transaction and one content version bump for the batch.
+        with transaction.atomic(), deferred_content_versions():
+            if operations['create']:
+                creating.save(user=request.user)
+            if operations['update']:
+                updating.save()
+            if to_delete:
+                Recipe.objects.filter(
+                    user=request.user, id__in=to_delete).delete()
+
+        # Nested tags and ingredients for the response, in one query
+        # per relation for the whole batch.
+        prefetch_instances(
+            list(creating.instance or []) + list(updating.instance),
+            creating.child
+        )
+        return Response({
+            'created': creating.data,
+            'updated': updating.data,
+            'deleted': to_delete,
+        })
+
+    @action(
+        methods=['GET'],
+        detail=False,
+        url_path='export',
+        content_negotiation_class=ExportContentNegotiation
+    )
+    def export(self, request):
+        """Stream the user's recipes as NDJSON or CSV"""
+        # Not ?format=, which DRF uses to pick a renderer.
+        export_format = request.query_params.get('export_format', 'ndjson')
+        if export_format not in CONTENT_TYPES:
+            raise ValidationError({'export_format': [
+                f'Choose one of: {", ".join(CONTENT_TYPES)}.'
+            ]})
+        serializer = self.get_serializer()
+        chunks = export_representations(
+            self.filter_queryset(self.get_queryset()).order_by('id'),
+            serializer,
+            settings.RECIPE_EXPORT_CHUNK_SIZE
+        )
+        if export_format == 'csv':
+            content = csv_lines(chunks, list(serializer.fields))
+        else:
+            content = ndjson_lines(chunks)
+        response = StreamingHttpResponse(
+            content,
+            content_type=CONTENT_TYPES[export_format]
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="recipes.{export_format}"'
+        )
+        return response
 
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
@@ -129,7 +463,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
         if serializer.is_valid():
             serializer.save()
             return Response(
-                serializer.data,
+                {**serializer.data, 'bytes_saved': serializer.bytes_saved},
                 status=status.HTTP_200_OK
             )
 
@@ -148,17 +482,27 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 OpenApiTypes.INT, enum=[0, 1],
                 description='Filter by items assigned to recipes',
             )
-        ]
+        ] + SPARSE_FIELDS_PARAMETERS
     ),
 )
-class BaseRecipeAttrViewSet(mixins.DestroyModelMixin,
+class BaseRecipeAttrViewSet(ValuesListMixin,
+                            mixins.DestroyModelMixin,
                             mixins.UpdateModelMixin,
                             mixins.ListModelMixin,
                             viewsets.GenericViewSet):
     """Base viewset for user owned recipe attributes"""
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [
+        CachedTokenAuthentication,
+        AccessTokenAuthentication,
+    ]
     permission_classes = [IsAuthenticated]
 
+    @conditional_get
+    @cache_response
+    def list(self, request, *args, **kwargs):
+        """List objects, or 304 if the client's copy is current"""
+        return super().list(request, *args, **kwargs)
+
     def get_queryset(self):
         """Return objects for the current authenticated user only"""
         # The request object has a user object attached to it.
@@ -172,9 +516,10 @@ class BaseRecipeAttrViewSet(mixins.DestroyModelMixin,
             # of a related model.
             # We can also filter on multiple fields of a related model.
             queryset = queryset.filter(recipe__isnull=False)
-        return queryset.filter(
+        queryset = queryset.filter(
             user=self.request.user
         ).order_by('-name').distinct()
+        return optimize_queryset(queryset, self.get_serializer())
 
 
 class TagViewSet(BaseRecipeAttrViewSet):
@@ -187,3 +532,143 @@ class IngredientViewSet(BaseRecipeAttrViewSet):
     """Manage ingredients in the database"""
     serializer_class = serializers.IngredientSerializer
     queryset = Ingredient.objects.all().order_by('-name')
+
+
+@extend_schema_view(
+    create=extend_schema(
+        description='Start a chunked, resumable upload of a recipe image. '
+                    'PUT each chunk, then finalize the upload.',
+    ),
+    retrieve=extend_schema(
+        description='Show the chunks received so far, to resume an '
+                    'interrupted upload.',
+    ),
+    chunk=extend_schema(
+        description='Upload chunk `number` (from 0) of the file. Every '
+                    'chunk is chunk_size bytes long except the last one. '
+                    'A chunk sent again replaces the one received before.',
+        request={'application/octet-stream': OpenApiTypes.BINARY},
+    ),
+    finalize=extend_schema(
+        description='Check the file against its SHA-256 and make it the '
+                    'image of the recipe.',
+        request=None,
+        responses=serializers.RecipeImageResultSerializer,
+    ),
+)
+class ImageUploadViewSet(mixins.CreateModelMixin,
+                         mixins.RetrieveModelMixin,
+                         mixins.DestroyModelMixin,
+                         viewsets.GenericViewSet):
+    """Manage chunked recipe image uploads"""
+    serializer_class = serializers.ImageUploadSerializer
+    authentication_classes = [
+        CachedTokenAuthentication,
+        AccessTokenAuthentication,
+    ]
+    permission_classes = [IsAuthenticated]
+    queryset = ImageUpload.objects.all()
+
+    def get_queryset(self):
+        """Return the current user's uploads that haven't expired"""
+        return self.queryset.filter(
+            user=self.request.user,
+            expires_at__gt=timezone.now()
+        )
+
+    def perform_create(self, serializer):
+        """Start an upload for the current user"""
+        serializer.save(user=self.request.user)
+
+    def perform_destroy(self, instance):
+        """Abandon an upload and delete its chunks"""
+        upload_id = instance.id
+        instance.delete()
+        transaction.on_commit(lambda: uploads.discard(upload_id))
+
+    @action(methods=['PUT'], detail=True,
+            url_path=r'chunks/(?P<number>[0-9]+)')
+    def chunk(self, request, pk=None, number=None):
+        """Store a chunk of the file"""
+        upload = self.get_object()
+        # Read straight from the request, never held in memory whole.
+        stream = request.stream or io.BytesIO()
+        try:
+            uploads.write_chunk(upload, int(number), stream)
+        except uploads.UploadError as e:
+            raise ValidationError({'chunk': [str(e)]})
+        upload.expires_at = uploads.expiry()
+        upload.save(update_fields=['expires_at'])
+        return Response(self.get_serializer(upload).data)
+
+    @action(methods=['POST'], detail=True)
+    def finalize(self, request, pk=None):
+        """Attach the uploaded file to its recipe"""
+        with transaction.atomic():
+            # Locked, so an upload finalized twice at once is only
+            # assembled and attached once.
+            upload = get_object_or_404(
+                self.get_queryset().select_for_update(), pk=pk)
+            try:
+                path = uploads.assemble(upload)
+            except uploads.UploadError as e:
+                raise ValidationError({'upload': [str(e)]})
+            with open(path, 'rb') as f:
+                serializer = serializers.RecipeImageSerializer(
+                    upload.recipe,
+                    data={'image': uploads.AssembledFile(
+                        f, name=upload.filename)},
+                    context=self.get_serializer_context(),
+                )
+                serializer.is_valid(raise_exception=True)
+                serializer.save()
+            upload.delete()
+            transaction.on_commit(lambda: uploads.discard(pk))
+
+        return Response(
+            {**serializer.data, 'bytes_saved': serializer.bytes_saved},
+            status=status.HTTP_200_OK
+        )
+
+
+def _media_files(path):
+    """Return a filter for the recipes whose image or variants are `path`"""
+    query = Q(image=path)
+    for name in settings.RECIPE_IMAGE_VARIANTS:
+        for fmt in settings.RECIPE_IMAGE_FORMATS:
+            query |= Q(**{f'image_variants__variants__{name}__{fmt}': path})
+    return query
+
+
+class RecipeMediaView(APIView):
+    """
+    Serve a recipe image, or one of its variants, to the users whose
+    recipes use it
+    """
+    authentication_classes = [
+        CachedTokenAuthentication,
+        AccessTokenAuthentication,
+    ]
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(responses={(200, 'image/*'): OpenApiTypes.BINARY})
+    def get(self, request, path):
+        """Return the file, or have the proxy send it"""
+        # Identical files are stored once, so the file may belong to
+        # other users' recipes as well.
+        if not Recipe.objects.filter(
+                _media_files(path), user=request.user).exists():
+            raise Http404
+        content_type = (
+            mimetypes.guess_type(path)[0] or 'application/octet-stream')
+        location = settings.MEDIA_ACCEL_REDIRECT_LOCATION
+        if not location:
+            return FileResponse(
+                image_storage.open(path), content_type=content_type)
+
+        # nginx sends the file (and its cache headers), the body of this
+        # response is dropped.
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = (
+            location.rstrip('/') + '/' + quote(path))
+        return response
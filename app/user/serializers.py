@@ -6,6 +6,8 @@ from django.utils.translation import gettext_lazy as _
 
 from rest_framework import serializers
 
+from core import access_tokens
+
 
 class UserSerializers(serializers.ModelSerializer):
     """Serializer for the user object"""
@@ -24,13 +26,14 @@ class UserSerializers(serializers.ModelSerializer):
         """Update a user, setting the password correctly and return it"""
         # Remove the password from the validated data.
         password = validated_data.pop('password', None)
-        # Call the update method of the parent class.
-        user = super().update(instance, validated_data)
-        # Set the password if it was provided.
+        # Set the password if it was provided, it is saved along with
+        # the other fields. The access tokens issued with the old
+        # password are revoked.
         if password:
-            user.set_password(password)
-            user.save()
-        return user
+            instance.set_password(password)
+            instance.token_version += 1
+        # Call the update method of the parent class.
+        return super().update(instance, validated_data)
 
 
 class AuthTokenSerializer(serializers.Serializer):
@@ -54,3 +57,24 @@ class AuthTokenSerializer(serializers.Serializer):
 
         attrs['user'] = user
         return attrs
+
+
+class AccessTokenSerializer(serializers.Serializer):
+    """Serializer for a signed access token and its refresh token"""
+    access = serializers.CharField(read_only=True)
+    refresh = serializers.CharField(read_only=True)
+    token_type = serializers.CharField(read_only=True)
+    expires_in = serializers.IntegerField(read_only=True)
+
+
+class RefreshTokenSerializer(serializers.Serializer):
+    """Serializer for renewing an access token with a refresh token"""
+    refresh = serializers.CharField(write_only=True)
+
+    def validate(self, attrs):
+        """Validate and use up the refresh token"""
+        try:
+            attrs['user'] = access_tokens.use_refresh_token(attrs['refresh'])
+        except access_tokens.InvalidToken as exc:
+            raise serializers.ValidationError(str(exc), code='authorization')
+        return attrs
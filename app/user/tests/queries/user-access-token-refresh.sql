@@ -0,0 +1,3 @@
+SELECT "core_refreshtoken"."key_hash", "core_refreshtoken"."user_id", "core_refreshtoken"."token_version", "core_refreshtoken"."created_at", "core_refreshtoken"."expires_at", "core_user"."id", "core_user"."password", "core_user"."last_login", "core_user"."is_superuser", "core_user"."email", "core_user"."name", "core_user"."is_active", "core_user"."is_staff", "core_user"."token_version" FROM "core_refreshtoken" INNER JOIN "core_user" ON ("core_refreshtoken"."user_id" = "core_user"."id") WHERE ("core_refreshtoken"."expires_at" > ?::timestamptz AND "core_refreshtoken"."key_hash" = ?) ORDER BY "core_refreshtoken"."key_hash" ASC LIMIT ?
+DELETE FROM "core_refreshtoken" WHERE "core_refreshtoken"."key_hash" = ?
+INSERT INTO "core_refreshtoken" ("key_hash", "user_id", "token_version", "created_at", "expires_at") VALUES (?, ?, ?, ?::timestamptz, ?::timestamptz)
@@ -0,0 +1,2 @@
+SELECT "core_user"."id", "core_user"."password", "core_user"."last_login", "core_user"."is_superuser", "core_user"."email", "core_user"."name", "core_user"."is_active", "core_user"."is_staff", "core_user"."token_version" FROM "core_user" WHERE "core_user"."email" = ? LIMIT ?
+INSERT INTO "core_refreshtoken" ("key_hash", "user_id", "token_version", "created_at", "expires_at") VALUES (?, ?, ?, ?::timestamptz, ?::timestamptz)
@@ -0,0 +1,3 @@
+SELECT (...) AS "a" FROM "core_user" WHERE "core_user"."email" = ? LIMIT ?
+INSERT INTO "core_user" ("password", "last_login", "is_superuser", "email", "name", "is_active", "is_staff", "token_version") VALUES (?, NULL, false, ?, ?, true, false, ?) RETURNING "core_user"."id"
+INSERT INTO "core_contentversion" ("user_id", "version", "modified_at") VALUES (?, ?, ?::timestamptz)
@@ -0,0 +1,5 @@
+SELECT "authtoken_token"."key", "authtoken_token"."user_id", "authtoken_token"."created", "core_user"."id", "core_user"."last_login", "core_user"."is_superuser", "core_user"."email", "core_user"."name", "core_user"."is_active", "core_user"."is_staff", "core_user"."token_version" FROM "authtoken_token" INNER JOIN "core_user" ON ("authtoken_token"."user_id" = "core_user"."id") WHERE "authtoken_token"."key" = ? LIMIT ?
+SELECT "core_user"."id", "core_user"."password", "core_user"."last_login", "core_user"."is_superuser", "core_user"."email", "core_user"."name", "core_user"."is_active", "core_user"."is_staff", "core_user"."token_version" FROM "core_user" WHERE "core_user"."id" = ? LIMIT ?
+SELECT (...) AS "a" FROM "core_user" WHERE ("core_user"."email" = ? AND NOT ("core_user"."id" = ?)) LIMIT ?
+UPDATE "core_user" SET "password" = ?, "last_login" = NULL, "is_superuser" = false, "email" = ?, "name" = ?, "is_active" = true, "is_staff" = false, "token_version" = ? WHERE "core_user"."id" = ?
+SELECT "authtoken_token"."key" FROM "authtoken_token" WHERE "authtoken_token"."user_id" = ?
@@ -0,0 +1,5 @@
+SELECT "core_user"."id", "core_user"."password", "core_user"."last_login", "core_user"."is_superuser", "core_user"."email", "core_user"."name", "core_user"."is_active", "core_user"."is_staff", "core_user"."token_version" FROM "core_user" WHERE "core_user"."email" = ? LIMIT ?
+SELECT "authtoken_token"."key", "authtoken_token"."user_id", "authtoken_token"."created" FROM "authtoken_token" WHERE "authtoken_token"."user_id" = ? LIMIT ?
+SAVEPOINT "s?"
+INSERT INTO "authtoken_token" ("key", "user_id", "created") VALUES (?, ?, ?::timestamptz)
+RELEASE SAVEPOINT "s?"
@@ -0,0 +1,126 @@
+"""
+Query budgets of the user API actions.
+"""
+import os
+from itertools import count
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.access_tokens import create_refresh_token
+from core.tests.query_budget import QueryBudget, QueryBudgetMixin
+
+CREATE_USER_URL = reverse('user:create')
+TOKEN_URL = reverse('user:token')
+ME_URL = reverse('user:me')
+ACCESS_TOKEN_URL = reverse('user:access-token')
+REFRESH_URL = reverse('user:access-token-refresh')
+
+# The queries of each action, whatever the number of users.
+BUDGETS = {
+    'user-create': QueryBudget(3),
+    'user-token': QueryBudget(5),
+    'user-access-token': QueryBudget(2),
+    'user-access-token-refresh': QueryBudget(3),
+    # /me reads the user row again rather than the cached copy.
+    'user-me-retrieve': QueryBudget(2),
+    # The user is saved once with the new password, then the keys of its
+    # tokens are read to drop them from the authentication cache.
+    'user-me-update': QueryBudget(5),
+    'user-me-partial_update': QueryBudget(4),
+}
+
+
+class UserQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Test each action issues a bounded number of queries"""
+    snapshot_dir = os.path.join(os.path.dirname(__file__), 'queries')
+
+    def setUp(self):
+        self.numbers = count()
+
+    def _user(self, n):
+        """Create n users and return the last one"""
+        for _ in range(n):
+            user = get_user_model().objects.create_user(
+                f'budget{next(self.numbers)}@example.com',
+                'testpass123'
+            )
+        return user
+
+    def _client(self, user):
+        """Return a client authenticated with a token for `user`"""
+        token = Token.objects.create(user=user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return client
+
+    def test_create(self):
+        """Test creating a user"""
+        def prepare(n):
+            self._user(n)
+            payload = {
+                'email': f'new{next(self.numbers)}@example.com',
+                'password': 'testpass123',
+                'name': 'New user',
+            }
+            return lambda: self.client.post(CREATE_USER_URL, payload)
+
+        self.assertQueryBudget(
+            'user-create', BUDGETS['user-create'], prepare)
+
+    def test_token(self):
+        """Test creating a token"""
+        def prepare(n):
+            user = self._user(n)
+            payload = {'email': user.email, 'password': 'testpass123'}
+            return lambda: self.client.post(TOKEN_URL, payload)
+
+        self.assertQueryBudget('user-token', BUDGETS['user-token'], prepare)
+
+    def test_access_token(self):
+        """Test creating an access token"""
+        def prepare(n):
+            user = self._user(n)
+            payload = {'email': user.email, 'password': 'testpass123'}
+            return lambda: self.client.post(ACCESS_TOKEN_URL, payload)
+
+        self.assertQueryBudget(
+            'user-access-token', BUDGETS['user-access-token'], prepare)
+
+    def test_access_token_refresh(self):
+        """Test renewing an access token"""
+        def prepare(n):
+            payload = {'refresh': create_refresh_token(self._user(n))}
+            return lambda: self.client.post(REFRESH_URL, payload)
+
+        self.assertQueryBudget(
+            'user-access-token-refresh',
+            BUDGETS['user-access-token-refresh'],
+            prepare,
+        )
+
+    def test_me(self):
+        """Test retrieving and updating the authenticated user"""
+        actions = [
+            ('retrieve', 'get', lambda user: None),
+            ('update', 'put', lambda user: {
+                'email': user.email,
+                'password': 'newpass123',
+                'name': 'Name',
+            }),
+            ('partial_update', 'patch', lambda user: {'name': 'Name'}),
+        ]
+        for action, method, payload in actions:
+            def prepare(n):
+                user = self._user(n)
+                client = self._client(user)
+                return lambda: getattr(client, method)(
+                    ME_URL, payload(user), format='json')
+
+            name = f'user-me-{action}'
+            with self.subTest(name):
+                self.assertQueryBudget(name, BUDGETS[name], prepare)
@@ -10,5 +10,15 @@ app_name = 'user'
 urlpatterns = [
     path('create/', views.CreateUserView.as_view(), name='create'),
     path('token/', views.CreateTokenView.as_view(), name='token'),
+    path(
+        'access-token/',
+        views.CreateAccessTokenView.as_view(),
+        name='access-token'
+    ),
+    path(
+        'access-token/refresh/',
+        views.RefreshAccessTokenView.as_view(),
+        name='access-token-refresh'
+    ),
     path('me/', views.ManageUserView.as_view(), name='me')
 ]
@@ -1,11 +1,26 @@
 """
 Views for the user API
 """
-from rest_framework import generics, authentication, permissions
+from django.contrib.auth import get_user_model
+from django.utils.translation import gettext_lazy as _
+from drf_spectacular.utils import extend_schema
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
-from user.serializers import UserSerializers, AuthTokenSerializer
+from core import access_tokens
+from core.authentication import (
+    AccessTokenAuthentication,
+    CachedTokenAuthentication,
+)
+from user.serializers import (
+    AccessTokenSerializer,
+    AuthTokenSerializer,
+    RefreshTokenSerializer,
+    UserSerializers,
+)
 
 
 class CreateUserView(generics.CreateAPIView):
@@ -22,13 +37,47 @@ class CreateTokenView(ObtainAuthToken):
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
 
+class CreateAccessTokenView(generics.GenericAPIView):
+    """Create a signed access token and a refresh token for the user"""
+    serializer_class = AuthTokenSerializer
+
+    @extend_schema(responses=AccessTokenSerializer)
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        tokens = access_tokens.issue_tokens(serializer.validated_data['user'])
+        return Response(AccessTokenSerializer(tokens).data)
+
+
+class RefreshAccessTokenView(CreateAccessTokenView):
+    """Exchange a refresh token for a new access and refresh token"""
+    serializer_class = RefreshTokenSerializer
+
+
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """Manage the authenticated user"""
     serializer_class = UserSerializers
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (
+        CachedTokenAuthentication,
+        AccessTokenAuthentication,
+    )
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):
         """Retrieve and return the authenticated user"""
-        # The user is retrieved from the authentication class.
-        return self.request.user
+        # The authentication classes give a cached copy of the user, or
+        # only its id, so the row is loaded again before it's updated.
+        model = get_user_model()
+        try:
+            user = model.objects.get(pk=self.request.user.pk)
+        except model.DoesNotExist:
+            user = None
+        if user is None or not user.is_active:
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        # Access tokens are only checked against the token version when
+        # a shared cache is configured, the row is authoritative.
+        if isinstance(self.request.successful_authenticator,
+                      AccessTokenAuthentication) and \
+                user.token_version != self.request.auth['ver']:
+            raise AuthenticationFailed(_('Token revoked.'))
+        return user
@@ -1,8 +1,29 @@
 server {
     listen ${LISTEN_PORT};
 
-    location /static {
-        alias /vol/static;
+    # Only collected static files are public. Media is sent through
+    # /protected-media/, once the app has checked access to it.
+    location /static/static {
+        alias /vol/static/static;
+    }
+
+    # Only reachable through an X-Accel-Redirect from the app (see
+    # RecipeMediaView in app/recipe/views.py).
+    location /protected-media/ {
+        internal;
+        alias /vol/static/media/;
+        # Stored files are named after their content and never change.
+        add_header Cache-Control "private, max-age=31536000, immutable";
+    }
+
+    # Chunks of image uploads are passed on as they arrive, the app
+    # streams them to disk itself. Keep the size above
+    # RECIPE_UPLOAD_CHUNK_SIZE.
+    location ~ ^/api/recipe/uploads/[^/]+/chunks/ {
+        uwsgi_pass              ${APP_HOST}:${APP_PORT};
+        include                 /etc/nginx/uwsgi_params;
+        uwsgi_request_buffering off;
+        client_max_body_size    2M;
     }
 
     location / {
@@ -5,6 +5,11 @@ set -e
 python manage.py wait_for_db
 python manage.py collectstatic --noinput
 python manage.py migrate
+# Variants whose job was lost when the previous workers stopped.
+python manage.py make_missing_variants
 
-uwsgi --socket :9000 --workers 4 --master --enable-threads --module app.wsgi
+# Password hashes hold at most PASSWORD_HASHING_WORKERS +
+# PASSWORD_HASHING_QUEUE threads of a worker, the rest serve the other
+# endpoints.
+uwsgi --socket :9000 --workers 4 --threads 8 --master --enable-threads --module app.wsgi
 